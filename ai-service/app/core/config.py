@@ -19,5 +19,39 @@ class Settings:
 
     # API
     API_V1_STR: str = "/api"
+    # Larger results skip per-row Pydantic validation and are encoded with orjson directly
+    RESPONSE_VALIDATION_MAX_ROWS: int = int(os.getenv("RESPONSE_VALIDATION_MAX_ROWS", "1000"))
+    # Add a Server-Timing header with the per-stage breakdown to every response
+    # (clients can also ask for it per request with "X-Debug-Timing: 1")
+    SERVER_TIMING_ENABLED: bool = os.getenv("SERVER_TIMING_ENABLED", "false").lower() == "true"
+
+    # Models
+    # Load the revenue model into memory at startup instead of on the first forecast
+    WARMUP_MODELS: bool = os.getenv("WARMUP_MODELS", "true").lower() == "true"
+
+    # Speech-to-text (faster-whisper)
+    WHISPER_MODEL_SIZE: str = os.getenv("WHISPER_MODEL_SIZE", "base.en")
+    WHISPER_DEVICE: str = os.getenv("WHISPER_DEVICE", "cpu")
+    WHISPER_COMPUTE_TYPE: str = os.getenv("WHISPER_COMPUTE_TYPE", "int8")
+    # 0 lets CTranslate2 pick
+    WHISPER_CPU_THREADS: int = int(os.getenv("WHISPER_CPU_THREADS", "0"))
+    # Concurrent transcriptions sharing the one loaded model
+    WHISPER_WORKERS: int = int(os.getenv("WHISPER_WORKERS", "1"))
+    # Requests allowed to wait for a worker before new ones are rejected
+    WHISPER_QUEUE_SIZE: int = int(os.getenv("WHISPER_QUEUE_SIZE", "8"))
+    WHISPER_BEAM_SIZE: int = int(os.getenv("WHISPER_BEAM_SIZE", "5"))
+    # Skip silence with faster-whisper's Silero VAD before beam search
+    WHISPER_VAD_FILTER: bool = os.getenv("WHISPER_VAD_FILTER", "true").lower() == "true"
+    # Upload limits (413 when exceeded)
+    WHISPER_MAX_UPLOAD_MB: float = float(os.getenv("WHISPER_MAX_UPLOAD_MB", "25"))
+    WHISPER_MAX_DURATION_SECONDS: float = float(os.getenv("WHISPER_MAX_DURATION_SECONDS", "300"))
+    # Non-seekable uploads are buffered in memory up to this size, then spill to disk
+    WHISPER_SPOOL_MAX_BYTES: int = int(os.getenv("WHISPER_SPOOL_MAX_BYTES", str(4 * 1024 * 1024)))
+    # Streaming (/api/transcribe/stream): re-transcribe after this much new audio,
+    # and commit stable segments once the uncommitted window grows past WINDOW
+    WHISPER_STREAM_STEP_SECONDS: float = float(os.getenv("WHISPER_STREAM_STEP_SECONDS", "1.0"))
+    WHISPER_STREAM_WINDOW_SECONDS: float = float(os.getenv("WHISPER_STREAM_WINDOW_SECONDS", "15"))
+    # Load the model in the background at startup instead of on the first request
+    WHISPER_PRELOAD: bool = os.getenv("WHISPER_PRELOAD", "false").lower() == "true"
 
 settings = Settings()
@@ -0,0 +1,52 @@
+import time
+
+from starlette.datastructures import MutableHeaders
+from starlette.types import ASGIApp, Message, Receive, Scope, Send
+
+from app.core.config import settings
+from modules import tracing
+
+
+class TimingMiddleware:
+    """
+    Starts a per-request trace, records request duration by route and, when
+    enabled (SERVER_TIMING_ENABLED or an "X-Debug-Timing: 1" request header),
+    returns the stage breakdown as a Server-Timing header.
+
+    Plain ASGI rather than BaseHTTPMiddleware so the trace contextvar is shared
+    with the endpoint and streaming responses are passed through untouched.
+    """
+
+    def __init__(self, app: ASGIApp):
+        self.app = app
+
+    async def __call__(self, scope: Scope, receive: Receive, send: Send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        debug = any(k == b"x-debug-timing" and v.strip() in (b"1", b"true") for k, v in scope.get("headers", []))
+        expose = settings.SERVER_TIMING_ENABLED or debug
+        token = tracing.start_trace()
+        start = time.perf_counter()
+        status = 500
+
+        async def send_wrapper(message: Message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+                if expose:
+                    headers = MutableHeaders(scope=message)
+                    entries = tracing.current_trace()
+                    entries.append(("total", time.perf_counter() - start, ""))
+                    headers.append("Server-Timing", tracing.server_timing(entries))
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_wrapper)
+        finally:
+            # Route templates keep the label set small ("/api/chat/results/{token}")
+            route = scope.get("route")
+            tracing.observe_http(scope["method"], getattr(route, "path", "unmatched"), status,
+                                 time.perf_counter() - start)
+            tracing.end_trace(token)
@@ -1,14 +1,37 @@
+from contextlib import asynccontextmanager
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 
 from app.core.config import settings
 from app.core.logging import logger
-from app.routers import auth, chat, audio, system
+from app.core.middleware import TimingMiddleware
+from app.routers import auth, chat, audio, system, admin
+from modules.model_registry import revenue_model
+from modules.llm_client import async_llm_client
+from modules.executors import shutdown_executors
+from modules import db_manager
+from app.services.transcription import TranscriptionService
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Startup
+    if settings.WARMUP_MODELS:
+        revenue_model.warmup()
+    if settings.WHISPER_PRELOAD:
+        TranscriptionService.preload()
+
+    yield
+
+    # Shutdown
+    await async_llm_client.aclose()
+    shutdown_executors()
+    TranscriptionService.shutdown()
+    db_manager.close_connections()
 
 def create_app() -> FastAPI:
     logger.info("Initializing AI Service...")
     
-    app = FastAPI(title=settings.PROJECT_NAME)
+    app = FastAPI(title=settings.PROJECT_NAME, lifespan=lifespan)
 
     # CORS
     if settings.ENVIRONMENT == "production":
@@ -18,6 +41,7 @@ def create_app() -> FastAPI:
             allow_credentials=True,
             allow_methods=["GET", "POST", "PUT", "PATCH", "DELETE"],
             allow_headers=["Content-Type", "Authorization"],
+            expose_headers=["Server-Timing"],
         )
     else:
         app.add_middleware(
@@ -26,13 +50,17 @@ def create_app() -> FastAPI:
             allow_credentials=True,
             allow_methods=["*"],
             allow_headers=["*"],
+            expose_headers=["Server-Timing"],
         )
 
+    app.add_middleware(TimingMiddleware)
+
     # Routers
     app.include_router(system.router)
     app.include_router(auth.router)
     app.include_router(audio.router)
     app.include_router(chat.router)
+    app.include_router(admin.router)
 
     return app
 
@@ -1,5 +1,5 @@
-from pydantic import BaseModel, RootModel
-from typing import Dict, Any, List, Optional
+from pydantic import BaseModel, Field, RootModel
+from typing import Dict, Any, List, Literal, Optional
 
 # --- JSON Utility Models ---
 class DataFrameRow(RootModel):
@@ -8,6 +8,13 @@ class DataFrameRow(RootModel):
 class DataFrameData(BaseModel):
     rows: List[DataFrameRow]
 
+class ColumnarData(BaseModel):
+    """Column-oriented result: values[i] holds every value of columns[i]."""
+    format: Literal["columnar"] = "columnar"
+    columns: List[str]
+    values: List[List[Any]]
+    row_count: int
+
 # --- Auth Models ---
 class LoginRequest(BaseModel):
     user_id: str
@@ -24,22 +31,40 @@ class ChatRequest(BaseModel):
     message: str
     model_type: str
     user_role: str
+    # "columnar" returns data as ColumnarData instead of one dict per row
+    response_format: Literal["rows", "columnar"] = "rows"
+    # Chart width in pixels; long time series are downsampled to about one point per pixel
+    chart_width: int | None = Field(default=None, ge=100, le=10000)
+    # Skip downsampling and return every row
+    full_resolution: bool = False
+    # Build the Plotly-compatible chart spec (plot_json); skipped unless requested
+    include_plot_json: bool = False
+    # Lets POST /stop cancel this request (in-flight LLM calls and SQL are aborted)
+    conversation_id: str | None = None
+    # Fair-share key for the LLM scheduler (falls back to conversation_id, then the client address)
+    user_id: str | None = None
 
 class ChatResponse(BaseModel):
     role: str = "assistant"
     type: str = "data"
     content: str
     intent: str
-    data: DataFrameData | None = None
+    data: DataFrameData | ColumnarData | None = None
     sql: str | None = None
     insight: Dict[str, Any] | None = None
     plot_json: str | None = None
+    # Set when the result had more than MAX_INLINE_ROWS rows (see /api/chat/results/{token})
+    pagination: Dict[str, Any] | None = None
+    # Set when a time series was downsampled (method, point counts, full-resolution link)
+    downsampling: Dict[str, Any] | None = None
 
 # --- Legacy Models ---
 class LegacyChatRequest(BaseModel):
     """Request format expected by ai-service-2 clients"""
     conversation_id: str
     message: str
+    # Opt-in downsampling: without a chart width every inline row is returned
+    chart_width: int | None = Field(default=None, ge=100, le=10000)
 
 class LegacyChatResponse(BaseModel):
     """Response format expected by ai-service-2 clients"""
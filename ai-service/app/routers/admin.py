@@ -0,0 +1,72 @@
+from fastapi import APIRouter, Depends, HTTPException
+from fastapi.security import HTTPBasic, HTTPBasicCredentials
+from app.models.api import LoginRequest
+from app.services.auth import AuthService
+from modules.sql_cache import sql_cache
+from modules.result_cache import result_cache
+from modules.cancellation import cancellation_registry
+from modules.single_flight import single_flight
+from modules.llm_scheduler import llm_scheduler
+from modules import db_manager
+
+router = APIRouter(prefix="/api/admin")
+_basic = HTTPBasic(auto_error=False)
+
+
+def require_admin(credentials: HTTPBasicCredentials | None = Depends(_basic)):
+    """
+    Admits requests carrying the admin login (HTTP Basic), checked by the same
+    AuthService as POST /api/login. Guards endpoints that expose or drop other
+    users' cached questions, SQL and results.
+    """
+    if credentials is not None:
+        ok, _ = AuthService.authenticate(
+            LoginRequest(user_id=credentials.username, password=credentials.password, role="admin")
+        )
+        if ok:
+            return
+    raise HTTPException(status_code=401, detail="Admin credentials required.", headers={"WWW-Authenticate": "Basic"})
+
+@router.get("/sql-cache", dependencies=[Depends(require_admin)])
+def get_sql_cache():
+    """
+    Returns SQL generation cache metrics and its entries (most recently used first).
+    """
+    return {"stats": sql_cache.stats(), "entries": sql_cache.entries()}
+
+@router.delete("/sql-cache", dependencies=[Depends(require_admin)])
+def flush_sql_cache():
+    """Drops every cached NL -> SQL translation."""
+    removed = sql_cache.clear()
+    return {"message": "SQL cache flushed", "removed": removed}
+
+@router.get("/result-cache", dependencies=[Depends(require_admin)])
+def get_result_cache():
+    """Returns SELECT result cache metrics (size in bytes, hit ratio, invalidations)."""
+    return result_cache.stats()
+
+@router.delete("/result-cache", dependencies=[Depends(require_admin)])
+def flush_result_cache(table: str | None = None):
+    """Invalidates cached results reading from `table`, or all of them."""
+    removed = result_cache.invalidate(table)
+    return {"message": "Result cache invalidated", "removed": removed}
+
+@router.get("/db-pool")
+def get_db_pool():
+    """Returns PostgreSQL pool utilization (in use, idle, waiters, wait times, timeouts)."""
+    return db_manager.pool_stats()
+
+@router.get("/cancellations")
+def get_cancellations():
+    """Returns how many chat turns are currently registered for POST /stop."""
+    return cancellation_registry.stats()
+
+@router.get("/coalescing")
+def get_coalescing():
+    """Returns request coalescing counters (shared executions, coalesced and in-flight requests)."""
+    return single_flight.stats()
+
+@router.get("/llm-queue")
+def get_llm_queue():
+    """Returns LLM scheduler state (running / queued calls by priority, rejections, timeouts)."""
+    return llm_scheduler.stats()
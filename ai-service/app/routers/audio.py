@@ -1,12 +1,26 @@
-from fastapi import APIRouter, UploadFile, File, HTTPException
-from app.services.transcription import TranscriptionService
+import asyncio
+import json
+import logging
+from typing import Literal
+
+from fastapi import APIRouter, UploadFile, File, HTTPException, WebSocket, WebSocketDisconnect
+from app.core.config import settings
+from app.services.chat import ChatService
+from app.services.transcription import (
+    TranscriptionService, TranscriptionQueueFull, AudioTooLarge, StreamingTranscriber
+)
+from modules.executors import cpu_executor, run_blocking
+from modules.cancellation import cancellation_registry
+from modules.llm_scheduler import user_scope
 
 router = APIRouter(prefix="/api")
+logger = logging.getLogger("AI_SERVICE")
 
 @router.post("/transcribe")
 async def transcribe_audio(file: UploadFile = File(...)):
     """
     Receives an audio file (blob) and transcribes it using local Whisper.
+    Transcription runs on the dedicated worker pool, off the event loop.
     """
     if not TranscriptionService.is_available():
         raise HTTPException(
@@ -14,8 +28,109 @@ async def transcribe_audio(file: UploadFile = File(...)):
             detail="Speech-to-text service unavailable. Install faster-whisper to enable."
         )
 
+    # Reject oversized uploads before they take a queue slot
+    if file.size is not None and file.size > settings.WHISPER_MAX_UPLOAD_MB * 1024 * 1024:
+        raise HTTPException(status_code=413, detail=f"Upload exceeds the {settings.WHISPER_MAX_UPLOAD_MB:g} MB limit")
+
     try:
-        text = TranscriptionService.transcribe(file.file)
-        return {"text": text}
+        return await TranscriptionService.transcribe_async(file.file)
+    except AudioTooLarge as e:
+        raise HTTPException(status_code=413, detail=str(e))
+    except TranscriptionQueueFull as e:
+        raise HTTPException(status_code=503, detail=str(e), headers={"Retry-After": "1"})
     except Exception as e:
         return {"error": str(e)}
+
+
+async def _send_partial(websocket: WebSocket, stream: StreamingTranscriber):
+    try:
+        await websocket.send_json(await stream.partial())
+    except TranscriptionQueueFull:
+        pass  # workers are busy; the next chunk will trigger another pass
+
+
+async def _run_chat(text: str, model_type: str, user_role: str, conversation_id: str | None, cancel_event) -> str:
+    with user_scope(conversation_id):
+        response_data, df = await ChatService.process_chat_async(text, model_type, user_role, cancel_event=cancel_event)
+    body = await run_blocking(cpu_executor, ChatService.render_response_json, response_data, df)
+    return '{"type":"chat","response":' + body.decode() + "}"
+
+
+@router.websocket("/transcribe/stream")
+async def transcribe_stream(
+    websocket: WebSocket,
+    sample_rate: int = 16000,
+    encoding: Literal["pcm_s16le", "pcm_f32le"] = "pcm_s16le",
+    chat: bool = False,
+    model_type: str = "",
+    user_role: str | None = None,
+    conversation_id: str | None = None,
+):
+    """
+    Streaming transcription for voice queries.
+
+    The client sends mono PCM audio as binary frames (`encoding` at `sample_rate`)
+    while recording, then the text frame {"type": "stop"}. The server answers with
+    {"type": "partial", "text", "committed"} about once per
+    WHISPER_STREAM_STEP_SECONDS of audio, then {"type": "final", "text", ...}.
+    With chat=true the final transcript goes straight into the chat pipeline and
+    its response follows as {"type": "chat", "response": ChatResponse}. Chat needs
+    the caller's `user_role` in the handshake, as ChatRequest does; POST /stop with
+    the same `conversation_id` aborts the turn, as does closing the socket.
+    """
+    await websocket.accept()
+    if chat and not user_role:
+        await websocket.send_json({"type": "error", "detail": "user_role is required when chat=true."})
+        await websocket.close(code=1008)  # policy violation
+        return
+    if not TranscriptionService.is_available():
+        await websocket.send_json({"type": "error", "detail": "Speech-to-text service unavailable."})
+        await websocket.close(code=1011)
+        return
+
+    stream = StreamingTranscriber(sample_rate=sample_rate, encoding=encoding)
+    pending = None
+    chat_task = None
+    cancel_token = None
+    try:
+        while True:
+            message = await websocket.receive()
+            if message["type"] == "websocket.disconnect":
+                raise WebSocketDisconnect(message.get("code", 1000))
+            if message.get("bytes"):
+                if stream.feed(message["bytes"]) and (pending is None or pending.done()):
+                    pending = asyncio.create_task(_send_partial(websocket, stream))
+                if stream.duration > settings.WHISPER_MAX_DURATION_SECONDS:
+                    break  # transcribe what we have and stop listening
+            elif message.get("text") and json.loads(message["text"]).get("type") == "stop":
+                break
+
+        if pending:
+            await pending
+        final = await stream.finish()
+
+        # Start the chat pipeline before sending the transcript so the two overlap
+        if chat and final["text"]:
+            cancel_token = cancellation_registry.start(conversation_id)
+            chat_task = asyncio.create_task(
+                _run_chat(final["text"], model_type, user_role, conversation_id, cancel_token)
+            )
+        await websocket.send_json(final)
+        if chat_task:
+            await websocket.send_text(await chat_task)
+        await websocket.close()
+    except WebSocketDisconnect:
+        if pending:
+            pending.cancel()
+    except TranscriptionQueueFull as e:
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1013)  # try again later
+    except Exception as e:
+        logger.error(f"Streaming transcription error: {e}")
+        await websocket.send_json({"type": "error", "detail": str(e)})
+        await websocket.close(code=1011)
+    finally:
+        if cancel_token is not None:
+            if chat_task is not None and not chat_task.done():
+                cancel_token.set()  # nobody is left to read the answer
+            cancellation_registry.release(conversation_id, cancel_token)
@@ -1,42 +1,54 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query, Request
+from fastapi.responses import Response, StreamingResponse
 from app.models.api import ChatRequest, ChatResponse, DataFrameData, LegacyChatRequest, LegacyChatResponse
 from app.services.chat import ChatService
-from modules.compatibility_layer import LegacyResponseFormatter, sanitize_dataframe_for_json
-import threading
+from app.core.config import settings
+from modules.compatibility_layer import LegacyResponseFormatter, dumps_json
+from modules import db_manager
+from modules.result_pages import continuation_registry, paged_sql, MAX_INLINE_ROWS, MAX_PAGE_ROWS, MAX_EXPORT_ROWS
+from modules.executors import cpu_executor, run_blocking
+from modules.cancellation import cancellation_registry
+from modules.llm_scheduler import LLMQueueFull, llm_scheduler, user_scope, iterate_as
+from typing import Literal
 import json
 import logging
-import numpy as np
-
-# This import is key for legacy support - we need to handle cancellations
-# For now, we'll implement a simple cancellation store here or in the service
-# Since cancellation was global in main, we can keep a simple store here.
 
 router = APIRouter()
 logger = logging.getLogger("AI_SERVICE")
 
-cancellation_tokens: dict[str, threading.Event] = {}
 
-def get_cancel_event(convo_id: str) -> threading.Event:
-    if not convo_id:
-        return threading.Event()
-    if convo_id not in cancellation_tokens:
-        cancellation_tokens[convo_id] = threading.Event()
-    return cancellation_tokens[convo_id]
+def _fair_share_key(request: ChatRequest, http_request: Request) -> str | None:
+    # Who the LLM scheduler attributes this request's Ollama calls to
+    return request.user_id or request.conversation_id or (http_request.client.host if http_request.client else None)
+
+
+def _overloaded(e: LLMQueueFull) -> HTTPException:
+    return HTTPException(status_code=429, detail=str(e), headers={"Retry-After": str(e.retry_after)})
+
 
 @router.post("/api/chat", response_model=ChatResponse)
-async def chat_handler(request: ChatRequest):
+async def chat_handler(request: ChatRequest, http_request: Request):
+    # POST /stop with the same conversation_id aborts this turn
+    cancel_token = cancellation_registry.start(request.conversation_id)
     try:
-        response_data, df = ChatService.process_chat(
-            request.message, 
-            request.model_type, 
-            request.user_role
-        )
-
-        data_rows = []
-        if not df.empty:
-            # Handle NaN/Inf
-            df_safe = df.replace([np.inf, -np.inf], np.nan).fillna(0)
-            data_rows = df_safe.to_dict('records')
+        with user_scope(_fair_share_key(request, http_request)):
+            response_data, df = await ChatService.process_chat_async(
+                request.message, 
+                request.model_type, 
+                request.user_role,
+                chart_width=request.chart_width,
+                full_resolution=request.full_resolution,
+                include_plot_json=request.include_plot_json,
+                cancel_event=cancel_token
+            )
+
+        if request.response_format == "columnar" or len(df) > settings.RESPONSE_VALIDATION_MAX_ROWS:
+            # Large / columnar results bypass per-row Pydantic models and go straight to orjson
+            body = await run_blocking(cpu_executor, ChatService.render_response_json, response_data, df, request.response_format)
+            return Response(content=body, media_type="application/json")
+
+        # Row conversion is CPU-bound for large results; keep it off the event loop
+        data_rows = await run_blocking(cpu_executor, ChatService.encode_rows, response_data, df)
 
         return ChatResponse(
             role="assistant", # Default from model
@@ -46,12 +58,131 @@ async def chat_handler(request: ChatRequest):
             data=DataFrameData(rows=data_rows),
             sql=response_data.get("sql"),
             insight=response_data.get("insight"),
-            plot_json=response_data.get("plot_json")
+            plot_json=response_data.get("plot_json"),
+            pagination=response_data.get("pagination"),
+            downsampling=response_data.get("downsampling")
         )
 
+    except LLMQueueFull as e:
+        raise _overloaded(e)
     except Exception as e:
         logger.error(f"Chat Handler Error: {e}")
         raise HTTPException(status_code=500, detail=f"Internal Server Error: {str(e)}")
+    finally:
+        cancellation_registry.release(request.conversation_id, cancel_token)
+
+
+@router.post("/api/chat/stream")
+def chat_stream_handler(request: ChatRequest, http_request: Request):
+    """
+    Server-Sent Events variant of /api/chat. Emits intent, SQL, row count and
+    summary tokens as they become available, then a final "done" event.
+    A client disconnect (or POST /stop) cancels the remaining stages.
+    Answers 429 up front when the LLM queue is already full.
+    """
+    user = _fair_share_key(request, http_request)
+    try:
+        llm_scheduler.check_admission(user=user)
+    except LLMQueueFull as e:
+        raise _overloaded(e)
+    cancel_token = cancellation_registry.start(request.conversation_id)
+
+    def event_source():
+        try:
+            for event in iterate_as(user, ChatService.process_chat_stream(
+                request.message,
+                request.model_type,
+                request.user_role,
+                chart_width=request.chart_width,
+                full_resolution=request.full_resolution,
+                include_plot_json=request.include_plot_json,
+                cancel_event=cancel_token
+            )):
+                yield ChatService.format_sse(event)
+        except LLMQueueFull as e:
+            yield ChatService.format_sse({"event": "error", "content": str(e), "retry_after": e.retry_after})
+        except Exception as e:
+            logger.error(f"Chat Stream Error: {e}")
+            yield ChatService.format_sse({"event": "error", "content": f"Internal Server Error: {str(e)}"})
+        finally:
+            # Reached on completion and when the client goes away (generator closed)
+            cancel_token.cancel()
+            cancellation_registry.release(request.conversation_id, cancel_token)
+
+    return StreamingResponse(
+        event_source(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def _registered_query(token: str):
+    entry = continuation_registry.get(token)
+    if entry is None:
+        raise HTTPException(status_code=404, detail="Result token is unknown or has expired")
+    return entry
+
+
+@router.get("/api/chat/results/{token}")
+def get_result_page(
+    token: str,
+    offset: int = Query(0, ge=0),
+    limit: int = Query(MAX_INLINE_ROWS, ge=1, le=MAX_PAGE_ROWS),
+    response_format: Literal["rows", "columnar"] = "rows"
+):
+    """
+    Returns one page of a result that was too large to inline in /api/chat,
+    using the continuation token from the chat response's "pagination" field.
+    """
+    entry = _registered_query(token)
+    try:
+        # One extra row tells whether another page exists
+        result = db_manager.run_select_columnar(paged_sql(entry.sql, limit + 1, offset), entry.params)
+    except Exception as e:
+        logger.error(f"Result Page Error: {e}")
+        raise HTTPException(status_code=500, detail=f"SQL Execution Failed: {str(e)}")
+
+    has_more = len(result) > limit
+    page = result.head(limit)
+    body = {
+        "data": page.to_wire() if response_format == "columnar" else {"rows": page.to_records()},
+        "offset": offset,
+        "returned_rows": len(page),
+        "has_more": has_more,
+        "next_page": f"/api/chat/results/{token}?offset={offset + len(page)}&limit={limit}" if has_more else None
+    }
+    return Response(content=dumps_json(body), media_type="application/json")
+
+
+@router.get("/api/chat/results/{token}/export")
+def export_results(token: str):
+    """
+    Streams the complete result as NDJSON (one JSON object per row) through a
+    server-side cursor, so the export never has to fit in memory.
+    Capped at MAX_EXPORT_ROWS rows when that is set.
+    """
+    entry = _registered_query(token)
+
+    def ndjson():
+        sent = 0
+        stream = db_manager.stream_select(entry.sql, entry.params)
+        try:
+            for columns, rows in stream:
+                if MAX_EXPORT_ROWS:
+                    rows = rows[:MAX_EXPORT_ROWS - sent]
+                if rows:
+                    yield b"".join(dumps_json(dict(zip(columns, row))) + b"\n" for row in rows)
+                    sent += len(rows)
+                if MAX_EXPORT_ROWS and sent >= MAX_EXPORT_ROWS:
+                    break
+        finally:
+            stream.close()
+
+    return StreamingResponse(
+        ndjson(),
+        media_type="application/x-ndjson",
+        headers={"Content-Disposition": f'attachment; filename="results-{token[:8]}.ndjson"'}
+    )
 
 
 # --- LEGACY SUPPORT ---
@@ -59,50 +190,50 @@ async def chat_handler(request: ChatRequest):
 @router.post("/chat", response_model=LegacyChatResponse)
 async def legacy_chat_endpoint(request: LegacyChatRequest):
     convo_id = request.conversation_id
-    if convo_id in cancellation_tokens:
-        cancellation_tokens[convo_id].clear()
-    
-    cancel_event = get_cancel_event(convo_id)
-    
-    # We can't easily pass cancellation down to sync modules without refactoring them too,
-    # but we can check it before/after steps.
-    # For this refactor, we will rely on ChatService but wrap it slightly or just accept
-    # that we aren't fully replicating the granular cancellation inside the monolithic function 
-    # unless we move that logic into Service entirely.
-    # The ChatService.process_chat is currently atomic.
-    
-    if cancel_event.is_set():
-         return LegacyChatResponse(content=json.dumps({"text": "Cancelled", "type": "error"}))
+    # Each turn gets a fresh token; POST /stop aborts its in-flight LLM call or query
+    cancel_token = cancellation_registry.start(convo_id)
 
     try:
         # Default legacy params
-        response_data, df = ChatService.process_chat(request.message, "local", "admin")
-
-        if cancel_event.is_set():
+        with user_scope(convo_id):
+            response_data, df = await ChatService.process_chat_async(
+                request.message, "local", "admin",
+                chart_width=request.chart_width,
+                full_resolution=request.chart_width is None,
+                cancel_event=cancel_token
+            )
+
+        if response_data.get("type") == "cancelled":
              return LegacyChatResponse(content=json.dumps({"text": "Cancelled", "type": "error"}))
         
         # Format for legacy
         # We need to map the structured ChatResponse back to the string blob
         
-        data_rows = sanitize_dataframe_for_json(df)
+        data_rows = await run_blocking(cpu_executor, ChatService.encode_rows, response_data, df)
         
-        legacy_formatted = LegacyResponseFormatter.convert_to_legacy_format(
+        legacy_formatted = await run_blocking(
+            cpu_executor,
+            LegacyResponseFormatter.convert_to_legacy_format,
             content=response_data.get("content", ""),
             intent=response_data.get("intent", ""),
             data=data_rows,
             insight=response_data.get("insight"),
             sql=response_data.get("sql"),
-            response_type=response_data.get("type", "data")
+            response_type=response_data.get("type", "data"),
+            pagination=response_data.get("pagination"),
+            downsampling=response_data.get("downsampling")
         )
 
         return LegacyChatResponse(**legacy_formatted)
 
+    except LLMQueueFull as e:
+        raise _overloaded(e)
     except Exception as e:
         return LegacyChatResponse(content=json.dumps({"text": str(e), "type": "error"}))
+    finally:
+        cancellation_registry.release(convo_id, cancel_token)
 
 @router.post("/stop")
 def stop_generation(payload: dict = Body(...)):
-    convo_id = payload.get("conversation_id")
-    if convo_id and convo_id in cancellation_tokens:
-        cancellation_tokens[convo_id].set()
-    return {"message": "Stop signal received"}
+    cancelled = cancellation_registry.cancel(payload.get("conversation_id"))
+    return {"message": "Stop signal received", "cancelled": cancelled}
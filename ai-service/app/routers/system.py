@@ -1,8 +1,22 @@
 from fastapi import APIRouter
+from fastapi.responses import PlainTextResponse
 from app.core.config import settings
+from modules.model_registry import revenue_model
+from modules import tracing
+from app.services.transcription import TranscriptionService
 
 router = APIRouter(prefix="/api")
 
 @router.get("/health")
 def get_health():
     return {"status": "ok", "service": settings.PROJECT_NAME}
+
+@router.get("/models/status")
+def get_models_status():
+    """Reports load and inference timings of resident models."""
+    return {"revenue_model": revenue_model.stats(), "whisper": TranscriptionService.stats()}
+
+@router.get("/metrics", response_class=PlainTextResponse)
+def get_metrics():
+    """Stage, Ollama and HTTP timings in the Prometheus text format."""
+    return PlainTextResponse(tracing.render_prometheus(), media_type="text/plain; version=0.0.4")
@@ -1,9 +1,6 @@
-import json
+import asyncio
 import pandas as pd
-import numpy as np
-import plotly.express as px
-from typing import Dict, Any, Tuple
-from datetime import datetime
+from typing import Dict, Any, Iterator, List, Tuple
 
 # Import existing modules
 # We need to ensure the python path fits, but since `modules` is in the root of `ai-service`, 
@@ -19,115 +16,478 @@ current_dir = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__
 if current_dir not in sys.path:
     sys.path.append(current_dir)
 
-from modules import llm_router, db_manager, forecasting_engine
+from modules import llm_router, db_manager, forecasting_engine, query_planner, downsampling, tracing
+from modules.executors import cpu_executor, db_executor, run_blocking
+from modules.cancellation import OperationCancelled, raise_if_cancelled
+from modules.single_flight import single_flight, request_key
+from modules.compatibility_layer import sanitize_dataframe_for_json, dumps_json
+from modules.db.columnar import ColumnarResult
+from modules.result_pages import continuation_registry
+from modules.chart_spec import chart_spec_json
 from app.core.logging import logger
 
-class CustomEncoder(json.JSONEncoder):
-    """
-    Handles serialization of NumPy/Pandas objects.
-    """
-    def default(self, obj):
-        if isinstance(obj, (np.integer, np.floating)):
-            return obj.item()
-        if isinstance(obj, np.ndarray):
-            return obj.tolist()
-        if isinstance(obj, (pd.Timestamp, datetime)):
-            return obj.isoformat()
-        return json.JSONEncoder.default(self, obj)
-
 class ChatService:
     @staticmethod
+    @tracing.traced("plot_json")
     def generate_plotly_json(df: pd.DataFrame, insight: Dict[str, Any]) -> str | None:
-        vt = insight.get("visualization_type")
-        x_col = insight.get("x_column")
-        y_col = insight.get("y_column")
+        """
+        Plotly-compatible figure JSON for line / bar insights, built from the
+        data arrays without importing plotly (see modules.chart_spec).
+        """
+        try:
+            return chart_spec_json(df, insight)
+        except Exception as e:
+            logger.error(f"Plot generation failed: {e}")
+            return None
+
+    @staticmethod
+    def _error(content: str, intent: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        return {
+            "type": "error",
+            "content": content,
+            "intent": intent
+        }, pd.DataFrame()
+
+    @staticmethod
+    def _cancelled(intent: str = "") -> Tuple[Dict[str, Any], pd.DataFrame]:
+        return {
+            "type": "cancelled",
+            "content": "Request cancelled",
+            "intent": intent
+        }, pd.DataFrame()
+
+    @classmethod
+    def _check_access(cls, intent: str, user_role: str):
+        # RBAC Check
+        if user_role == "employee" and intent == "REVENUE_FORECAST":
+            return cls._error(
+                "Authorization Failed: Employees are restricted from accessing Revenue Forecasting data.",
+                intent
+            )
+        return None
+
+    @staticmethod
+    def _forecast_insight(df: pd.DataFrame, msg: str) -> Dict[str, Any]:
+        # A single day renders as a bar, a date range as a trend line
+        return {
+            "summary": msg,
+            "visualization_type": "line" if len(df) > 1 else "bar",
+            "x_column": "date",
+            "y_column": "predicted_revenue"
+        }
+
+    @staticmethod
+    def _apply_plan_visualization(insight: Dict[str, Any], plan: Dict[str, Any] | None, df: pd.DataFrame) -> Dict[str, Any]:
+        # The planner's chart suggestion fills in when the analysis did not pick a chart
+        if not plan or not plan.get("visualization") or insight.get("visualization_type") in ("line", "bar"):
+            return insight
+        vis = plan["visualization"]
+        if vis["visualization_type"] in ("line", "bar") and vis["x_column"] in df.columns and vis["y_column"] in df.columns:
+            insight = {**insight, **vis}
+        return insight
+
+    @staticmethod
+    def _data_response(intent: str, generated_sql: str, insight: Dict[str, Any], plot_output_json: str | None,
+                       pagination: Dict[str, Any] | None = None,
+                       downsampled: Dict[str, Any] | None = None) -> Dict[str, Any]:
+        return {
+            "type": "data",
+            "content": insight.get("summary", "Data retrieved successfully."),
+            "intent": intent,
+            "sql": generated_sql,
+            "insight": insight,
+            "plot_json": plot_output_json,
+            "pagination": pagination,
+            "downsampling": downsampled
+        }
+
+    @staticmethod
+    @tracing.traced("downsample")
+    def _downsample(df: pd.DataFrame, insight: Dict[str, Any], generated_sql: str, pagination: Dict[str, Any] | None,
+                    chart_width: int | None, full_resolution: bool) -> Tuple[pd.DataFrame, Dict[str, Any] | None]:
+        # Line charts with more points than pixels are reduced before charting and transport
+        if full_resolution or not downsampling.DOWNSAMPLE_ENABLED or insight.get("visualization_type") != "line":
+            return df, None
+        x_col, y_col = insight.get("x_column"), insight.get("y_column")
+        if x_col not in df.columns or y_col not in df.columns:
+            return df, None
+
+        reduced = None
+        if downsampling.DOWNSAMPLE_SQL_PUSHDOWN and generated_sql:
+            reduced = downsampling.downsample_in_sql(generated_sql, x_col, y_col, chart_width)
+        if reduced is None:
+            reduced = downsampling.downsample_dataframe(df, x_col, y_col, chart_width)
+        df, info = reduced
 
-        if df.empty or not x_col or not y_col:
+        if info and generated_sql:
+            # Full-resolution rows stay reachable through the paging endpoint
+            token = pagination["continuation_token"] if pagination else continuation_registry.register(generated_sql)
+            info["full_resolution"] = f"/api/chat/results/{token}?offset=0"
+        return df, info
+
+    @staticmethod
+    def _pagination(generated_sql: str, returned_rows: int, truncated: bool) -> Dict[str, Any] | None:
+        # Only the first MAX_INLINE_ROWS rows are inline; the rest is reachable through a token
+        if not truncated:
             return None
+        token = continuation_registry.register(generated_sql)
+        return {
+            "continuation_token": token,
+            "returned_rows": returned_rows,
+            "has_more": True,
+            "next_page": f"/api/chat/results/{token}?offset={returned_rows}",
+            "export": f"/api/chat/results/{token}/export"
+        }
+
+    @staticmethod
+    def _rows_are_final(df: pd.DataFrame, pagination: Dict[str, Any] | None, chart_width: int | None,
+                        full_resolution: bool) -> bool:
+        # True when _downsample cannot replace df, whatever chart the analysis picks
+        if full_resolution or not downsampling.DOWNSAMPLE_ENABLED:
+            return True
+        if downsampling.DOWNSAMPLE_SQL_PUSHDOWN and pagination:
+            # Pushdown reduces the full (untruncated) result, not df
+            return False
+        return len(df) <= downsampling.target_points(chart_width)
+
+    @staticmethod
+    def _preencode(df: pd.DataFrame) -> Tuple[pd.DataFrame, ColumnarResult, List[Any]]:
+        result = ColumnarResult.from_dataframe(df)
+        return df, result, result.json_columns()
+
+    @classmethod
+    def _encoded(cls, response_data: Dict[str, Any], df: pd.DataFrame) -> Tuple[ColumnarResult, List[Any]]:
+        # Rows encoded while the analysis ran, if they belong to this very DataFrame
+        pre = response_data.get("_encoded")
+        if pre is not None and pre[0] is df:
+            return pre[1], pre[2]
+        _, result, values = cls._preencode(df)
+        return result, values
+
+    @classmethod
+    @tracing.traced("encode_rows")
+    def encode_rows(cls, response_data: Dict[str, Any], df: pd.DataFrame) -> List[Dict[str, Any]]:
+        """sanitize_dataframe_for_json for a process_chat_async response, reusing its pre-encoded rows."""
+        if df.empty:
+            return []
+        result, values = cls._encoded(response_data, df)
+        return result.to_records(values)
 
+    @classmethod
+    def process_chat(cls, user_query: str, model_type: str, user_role: str,
+                     chart_width: int | None = None, full_resolution: bool = False,
+                     include_plot_json: bool = False, cancel_event=None) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        """
+        Returns a tuple: (response_dict, dataframe)
+        plot_json is only built when include_plot_json is set.
+        Setting `cancel_event` aborts the in-flight LLM call or query and
+        returns a "cancelled" response. Identical concurrent requests share
+        one execution (see modules.single_flight).
+        """
+        key = request_key(user_query, user_role, model_type, chart_width, full_resolution, include_plot_json)
         try:
-            if x_col not in df.columns or y_col not in df.columns:
-                return None
+            response, df = single_flight.do(
+                key,
+                lambda token: cls._process_chat(user_query, model_type, user_role, chart_width, full_resolution,
+                                                include_plot_json, token),
+                cancel_event
+            )
+            return dict(response), df
+        except OperationCancelled:
+            logger.info("Chat request cancelled")
+            return cls._cancelled()
+
+    @classmethod
+    def _process_chat(cls, user_query: str, model_type: str, user_role: str, chart_width: int | None,
+                      full_resolution: bool, include_plot_json: bool, cancel_event) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        # 1. Intent Classification (one combined LLM call in single-shot planner mode)
+        if query_planner.PLANNER_ENABLED:
+            plan = query_planner.plan_query(user_query, model_type=model_type, cancel_event=cancel_event)
+        else:
+            plan = None
+        intent = plan["intent"] if plan else llm_router.classify_intent(
+            user_query, model_type=model_type, cancel_event=cancel_event
+        )
+
+        denied = cls._check_access(intent, user_role)
+        if denied:
+            return denied
+
+        df = pd.DataFrame()
+        generated_sql = ""
+        pagination = None
+        insight = {}
 
-            if vt == "line":
-                fig = px.line(df, x=x_col, y=y_col, template="plotly_dark")
-            elif vt == "bar":
-                fig = px.bar(df, x=x_col, y=y_col, template="plotly_dark")
+        # 2. Routing Logic
+        if intent == "REVENUE_FORECAST":
+            if plan:
+                df, msg = forecasting_engine.predict_revenue_for_dates(plan["dates"])
             else:
-                return None
+                df, msg = forecasting_engine.predict_revenue_for_date(user_query, cancel_event)
+            if df.empty:
+                return cls._error(f"Forecasting Failed: {msg}", intent)
 
-            return json.dumps(fig.to_dict(), cls=CustomEncoder)
-        except Exception as e:
-            logger.error(f"Plot generation failed: {e}")
-            return None
+            insight = cls._forecast_insight(df, msg)
+        else:
+            # SQL_QUERY
+            if plan:
+                generated_sql = plan["sql"]
+            else:
+                generated_sql, raw_llm_response = llm_router.generate_sql(
+                    user_query, model_type=model_type, cancel_event=cancel_event
+                )
+            if generated_sql.startswith("-- SYSTEM ERROR"):
+                return cls._error(generated_sql.replace("-- SYSTEM ERROR: ", ""), intent)
+
+            try:
+                df, truncated = db_manager.run_select_limited(generated_sql, cancel_event=cancel_event)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                return cls._error(f"SQL Execution Failed: {str(e)}", intent)
+            pagination = cls._pagination(generated_sql, len(df), truncated)
+
+            # Analyze
+            insight = llm_router.analyze_data(df, user_query, model_type=model_type, cancel_event=cancel_event)
+            insight = cls._apply_plan_visualization(insight, plan, df)
+
+        raise_if_cancelled(cancel_event)
+        df, downsampled = cls._downsample(df, insight, generated_sql, pagination, chart_width, full_resolution)
+
+        # Generate Plotly JSON (only for clients that asked for it)
+        plot_output_json = cls.generate_plotly_json(df, insight) if include_plot_json else None
+
+        return cls._data_response(intent, generated_sql, insight, plot_output_json, pagination, downsampled), df
 
     @classmethod
-    def process_chat(cls, user_query: str, model_type: str, user_role: str) -> Tuple[Dict[str, Any], pd.DataFrame]:
+    async def process_chat_async(cls, user_query: str, model_type: str, user_role: str,
+                                 chart_width: int | None = None, full_resolution: bool = False,
+                                 include_plot_json: bool = False, cancel_event=None) -> Tuple[Dict[str, Any], pd.DataFrame]:
         """
+        asyncio-native version of process_chat. LLM calls are awaited on the
+        async client and blocking DB / serialization work runs on bounded
+        executors, so one slow conversation never stalls the event loop.
+
         Returns a tuple: (response_dict, dataframe)
         """
-        # 1. Intent Classification
-        intent = llm_router.classify_intent(user_query, model_type=model_type)
+        key = request_key(user_query, user_role, model_type, chart_width, full_resolution, include_plot_json)
+        try:
+            response, df = await single_flight.do_async(
+                key,
+                lambda token: cls._process_chat_async(user_query, model_type, user_role, chart_width,
+                                                      full_resolution, include_plot_json, token),
+                cancel_event
+            )
+            return dict(response), df
+        except OperationCancelled:
+            logger.info("Chat request cancelled")
+            return cls._cancelled()
 
-        # RBAC Check
-        if user_role == "employee" and intent == "REVENUE_FORECAST":
-            return {
-                "type": "error",
-                "content": "Authorization Failed: Employees are restricted from accessing Revenue Forecasting data.",
-                "intent": intent
-            }, pd.DataFrame()
+    @classmethod
+    async def _process_chat_async(cls, user_query: str, model_type: str, user_role: str, chart_width: int | None,
+                                  full_resolution: bool, include_plot_json: bool,
+                                  cancel_event) -> Tuple[Dict[str, Any], pd.DataFrame]:
+        # 1. Intent Classification (one combined LLM call in single-shot planner mode)
+        if query_planner.PLANNER_ENABLED:
+            plan = await query_planner.plan_query_async(user_query, model_type=model_type, cancel_event=cancel_event)
+        else:
+            plan = None
+        intent = plan["intent"] if plan else await llm_router.classify_intent_async(
+            user_query, model_type=model_type, cancel_event=cancel_event
+        )
+
+        denied = cls._check_access(intent, user_role)
+        if denied:
+            return denied
 
         df = pd.DataFrame()
         generated_sql = ""
+        pagination = None
         insight = {}
+        encoded = None
 
         # 2. Routing Logic
         if intent == "REVENUE_FORECAST":
-            df, msg = forecasting_engine.predict_revenue_for_date(user_query)
+            if plan:
+                df, msg = await run_blocking(db_executor, forecasting_engine.predict_revenue_for_dates, plan["dates"])
+            else:
+                df, msg = await forecasting_engine.predict_revenue_for_date_async(user_query, cancel_event)
             if df.empty:
-                return {
-                    "type": "error",
-                    "content": f"Forecasting Failed: {msg}",
-                    "intent": intent
-                }, pd.DataFrame()
-
-            insight = {
-                "summary": msg,
-                "visualization_type": "bar",
-                "x_column": "date",
-                "y_column": "predicted_revenue"
-            }
+                return cls._error(f"Forecasting Failed: {msg}", intent)
+
+            insight = cls._forecast_insight(df, msg)
         else:
             # SQL_QUERY
-            generated_sql, raw_llm_response = llm_router.generate_sql(user_query, model_type=model_type)
+            if plan:
+                generated_sql = plan["sql"]
+            else:
+                generated_sql, raw_llm_response = await llm_router.generate_sql_async(
+                    user_query, model_type=model_type, cancel_event=cancel_event
+                )
             if generated_sql.startswith("-- SYSTEM ERROR"):
-                 return {
-                    "type": "error",
-                    "content": generated_sql.replace("-- SYSTEM ERROR: ", ""),
-                    "intent": intent
-                }, pd.DataFrame()
+                return cls._error(generated_sql.replace("-- SYSTEM ERROR: ", ""), intent)
 
             try:
-                df = db_manager.run_select_query(generated_sql)
+                df, truncated = await db_manager.run_select_limited_async(generated_sql, cancel_event=cancel_event)
+            except OperationCancelled:
+                raise
             except Exception as e:
-                return {
-                    "type": "error",
-                    "content": f"SQL Execution Failed: {str(e)}",
-                    "intent": intent
-                }, pd.DataFrame()
+                return cls._error(f"SQL Execution Failed: {str(e)}", intent)
+            pagination = cls._pagination(generated_sql, len(df), truncated)
 
-            # Analyze
-            insight = llm_router.analyze_data(df, user_query, model_type=model_type)
+            # Analyze; rows that downsampling cannot replace are encoded meanwhile
+            analysis = llm_router.analyze_data_async(df, user_query, model_type=model_type, cancel_event=cancel_event)
+            if cls._rows_are_final(df, pagination, chart_width, full_resolution):
+                insight, encoded = await asyncio.gather(analysis, run_blocking(cpu_executor, cls._preencode, df))
+            else:
+                insight = await analysis
+            insight = cls._apply_plan_visualization(insight, plan, df)
 
-        # Generate Plotly JSON
-        plot_output_json = cls.generate_plotly_json(df, insight)
+        raise_if_cancelled(cancel_event)
 
-        return {
-            "type": "data",
-            "content": insight.get("summary", "Data retrieved successfully."),
-            "intent": intent,
-            "sql": generated_sql,
-            "insight": insight,
-            "plot_json": plot_output_json
-        }, df
+        # May query the database when SQL pushdown is enabled
+        df, downsampled = await run_blocking(
+            db_executor, cls._downsample, df, insight, generated_sql, pagination, chart_width, full_resolution
+        )
+
+        # Generate Plotly JSON (only for clients that asked for it)
+        plot_output_json = (
+            await run_blocking(cpu_executor, cls.generate_plotly_json, df, insight) if include_plot_json else None
+        )
 
+        response = cls._data_response(intent, generated_sql, insight, plot_output_json, pagination, downsampled)
+        if encoded is not None:
+            response["_encoded"] = encoded
+        return response, df
+
+    @classmethod
+    def process_chat_stream(cls, user_query: str, model_type: str, user_role: str,
+                            chart_width: int | None = None, full_resolution: bool = False,
+                            include_plot_json: bool = False, cancel_event=None) -> Iterator[Dict[str, Any]]:
+        """
+        Same pipeline as process_chat, but yields progress events as each stage completes:
+        start -> intent -> (sql) -> rows -> insight -> token* -> done, or error at any point
+        (cancelled when `cancel_event` is set). The final "done" event carries the full
+        response, including data rows.
+        """
+        try:
+            yield from cls._process_chat_stream(user_query, model_type, user_role, chart_width, full_resolution,
+                                                include_plot_json, cancel_event)
+        except OperationCancelled:
+            logger.info("Chat stream cancelled")
+            yield {"event": "cancelled", "content": "Request cancelled"}
+
+    @classmethod
+    def _process_chat_stream(cls, user_query: str, model_type: str, user_role: str, chart_width: int | None,
+                             full_resolution: bool, include_plot_json: bool, cancel_event) -> Iterator[Dict[str, Any]]:
+        yield {"event": "start"}
+
+        # 1. Intent Classification
+        if query_planner.PLANNER_ENABLED:
+            plan = query_planner.plan_query(user_query, model_type=model_type, cancel_event=cancel_event)
+        else:
+            plan = None
+        intent = plan["intent"] if plan else llm_router.classify_intent(
+            user_query, model_type=model_type, cancel_event=cancel_event
+        )
+        yield {"event": "intent", "intent": intent}
+
+        denied = cls._check_access(intent, user_role)
+        if denied:
+            yield {"event": "error", "content": denied[0]["content"], "intent": intent}
+            return
+
+        generated_sql = ""
+        pagination = None
+
+        # 2. Routing Logic
+        if intent == "REVENUE_FORECAST":
+            if plan:
+                df, msg = forecasting_engine.predict_revenue_for_dates(plan["dates"])
+            else:
+                df, msg = forecasting_engine.predict_revenue_for_date(user_query, cancel_event)
+            if df.empty:
+                yield {"event": "error", "content": f"Forecasting Failed: {msg}", "intent": intent}
+                return
+            yield {"event": "rows", "row_count": len(df)}
+
+            insight = cls._forecast_insight(df, msg)
+            yield {"event": "insight", "insight": insight}
+            yield {"event": "token", "text": msg}
+        else:
+            # SQL_QUERY
+            if plan:
+                generated_sql = plan["sql"]
+            else:
+                generated_sql, raw_llm_response = llm_router.generate_sql(
+                    user_query, model_type=model_type, cancel_event=cancel_event
+                )
+            if generated_sql.startswith("-- SYSTEM ERROR"):
+                yield {"event": "error", "content": generated_sql.replace("-- SYSTEM ERROR: ", ""), "intent": intent}
+                return
+            yield {"event": "sql", "sql": generated_sql}
+
+            try:
+                df, truncated = db_manager.run_select_limited(generated_sql, cancel_event=cancel_event)
+            except OperationCancelled:
+                raise
+            except Exception as e:
+                yield {"event": "error", "content": f"SQL Execution Failed: {str(e)}", "intent": intent}
+                return
+            pagination = cls._pagination(generated_sql, len(df), truncated)
+            yield {"event": "rows", "row_count": len(df), "truncated": truncated}
+
+            # Chart choice comes from the data shape so the summary can start streaming right away
+            local = llm_router.analyze_locally(df, user_query)
+            insight = local or llm_router.suggest_visualization(df) or {"visualization_type": "table"}
+            insight = cls._apply_plan_visualization(insight, plan, df)
+            yield {"event": "insight", "insight": insight}
+
+            if local:
+                yield {"event": "token", "text": local["summary"]}
+            else:
+                summary_parts = []
+                for token in llm_router.stream_summary(df, user_query, model_type=model_type, cancel_event=cancel_event):
+                    summary_parts.append(token)
+                    yield {"event": "token", "text": token}
+                # A cancelled summary stream just ends early
+                raise_if_cancelled(cancel_event)
+                insight["summary"] = "".join(summary_parts).strip() or "Data retrieved successfully."
+
+        df, downsampled = cls._downsample(df, insight, generated_sql, pagination, chart_width, full_resolution)
+        response = cls._data_response(
+            intent, generated_sql, insight,
+            cls.generate_plotly_json(df, insight) if include_plot_json else None,
+            pagination, downsampled
+        )
+        response["role"] = "assistant"
+        response["data"] = {"rows": sanitize_dataframe_for_json(df)}
+        yield {"event": "done", "response": response}
+
+    @staticmethod
+    @tracing.traced("encode_json")
+    def render_response_json(response_data: Dict[str, Any], df: pd.DataFrame, response_format: str = "rows") -> bytes:
+        """
+        Encodes a ChatResponse-shaped body with orjson, skipping Pydantic
+        validation. Used for columnar responses and large row sets.
+        """
+        result, values = ChatService._encoded(response_data, df)
+        data = result.to_wire(values) if response_format == "columnar" else {"rows": result.to_records(values)}
+        return dumps_json({
+            "role": "assistant",
+            "type": response_data.get("type", "data"),
+            "content": response_data.get("content", ""),
+            "intent": response_data.get("intent", ""),
+            "data": data,
+            "sql": response_data.get("sql"),
+            "insight": response_data.get("insight"),
+            "plot_json": response_data.get("plot_json"),
+            "pagination": response_data.get("pagination"),
+            "downsampling": response_data.get("downsampling")
+        })
+
+    @staticmethod
+    def format_sse(event: Dict[str, Any]) -> str:
+        """Encodes one pipeline event as a Server-Sent Events frame."""
+        payload = dumps_json(event).decode()
+        return f"event: {event.get('event', 'message')}\ndata: {payload}\n\n"
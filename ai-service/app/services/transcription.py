@@ -1,43 +1,419 @@
-import os
-import shutil
+import io
+import time
 import tempfile
+import importlib.util
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, BinaryIO, Dict, List, Optional
+
+import numpy as np
+
+from app.core.config import settings
 from app.core.logging import logger
+from modules.executors import run_blocking
 
-try:
-    from faster_whisper import WhisperModel
-    print("Loading Local Whisper Model...")
-    # NOTE: In a real app, you might want to load this lazily or in a separate worker
-    stt_model = WhisperModel("base.en", device="cpu", compute_type="int8")
-    print("Whisper Model Loaded.")
-except ImportError:
+WHISPER_INSTALLED = importlib.util.find_spec("faster_whisper") is not None
+if not WHISPER_INSTALLED:
     logger.warning("faster_whisper not installed. Speech-to-text will be unavailable.")
-    stt_model = None
-except Exception as e:
-    logger.error(f"Could not load Whisper model: {e}")
-    stt_model = None
+
+
+# faster-whisper models expect 16 kHz mono PCM
+SAMPLING_RATE = 16000
+STAGES = ("decode_audio", "vad", "beam_search")
+
+
+class TranscriptionQueueFull(Exception):
+    """Raised when every transcription worker is busy and the wait queue is full."""
+
+
+class AudioTooLarge(ValueError):
+    """Raised when an upload exceeds WHISPER_MAX_UPLOAD_MB or WHISPER_MAX_DURATION_SECONDS."""
+
+
+def _buffer_upload(file_obj: BinaryIO, max_bytes: int) -> BinaryIO:
+    """
+    Returns a seekable buffer holding the upload, rejecting it past max_bytes.
+
+    Seekable uploads (Starlette already spools UploadFile) are used as they are;
+    anything else is copied into a SpooledTemporaryFile that stays in memory up
+    to WHISPER_SPOOL_MAX_BYTES and only then spills to disk.
+    """
+    if file_obj.seekable():
+        size = file_obj.seek(0, io.SEEK_END)
+        if size > max_bytes:
+            raise AudioTooLarge(f"Upload is {size / 1048576:.1f} MB; the limit is {max_bytes / 1048576:.1f} MB")
+        file_obj.seek(0)
+        return file_obj
+
+    spool = tempfile.SpooledTemporaryFile(max_size=settings.WHISPER_SPOOL_MAX_BYTES)
+    size = 0
+    while chunk := file_obj.read(64 * 1024):
+        size += len(chunk)
+        if size > max_bytes:
+            spool.close()
+            raise AudioTooLarge(f"Upload exceeds the {max_bytes / 1048576:.1f} MB limit")
+        spool.write(chunk)
+    spool.seek(0)
+    return spool
+
+
+class _WhisperState:
+    """
+    Owns the single WhisperModel and the bounded worker pool that uses it.
+
+    The model is loaded lazily on first use (or in the background at startup
+    with WHISPER_PRELOAD), so workers that never transcribe never pay for it.
+    CTranslate2 releases the GIL while decoding, so WHISPER_WORKERS threads
+    share one model instead of each process holding its own copy.
+    """
+
+    def __init__(self):
+        self.model = None
+        self.status = "not_loaded" if WHISPER_INSTALLED else "unavailable"
+        self.error = None
+        self.load_seconds = None
+        self._load_lock = threading.Lock()
+        self._lock = threading.Lock()
+        self._executor = ThreadPoolExecutor(max_workers=settings.WHISPER_WORKERS, thread_name_prefix="stt-worker")
+        self._pending = 0
+        self._active = 0
+        self._counters = {"completed": 0, "failed": 0, "rejected": 0, "total_seconds": 0.0, "total_wait_seconds": 0.0}
+        self._stage_seconds = dict.fromkeys(STAGES, 0.0)
+        self._audio_seconds = 0.0
+
+    def get_model(self):
+        if self.model is not None:
+            return self.model
+        with self._load_lock:
+            if self.model is None:
+                if not WHISPER_INSTALLED:
+                    raise Exception("Service unavailable")
+                self.status = "loading"
+                start = time.perf_counter()
+                try:
+                    from faster_whisper import WhisperModel
+
+                    logger.info(
+                        f"Loading Whisper model '{settings.WHISPER_MODEL_SIZE}' "
+                        f"({settings.WHISPER_DEVICE}, {settings.WHISPER_COMPUTE_TYPE})..."
+                    )
+                    self.model = WhisperModel(
+                        settings.WHISPER_MODEL_SIZE,
+                        device=settings.WHISPER_DEVICE,
+                        compute_type=settings.WHISPER_COMPUTE_TYPE,
+                        cpu_threads=settings.WHISPER_CPU_THREADS,
+                        num_workers=settings.WHISPER_WORKERS,
+                    )
+                except Exception as e:
+                    self.status, self.error = "failed", str(e)
+                    logger.error(f"Could not load Whisper model: {e}")
+                    raise
+                self.load_seconds = round(time.perf_counter() - start, 3)
+                self.status, self.error = "ready", None
+                logger.info(f"Whisper model loaded in {self.load_seconds}s")
+        return self.model
+
+    def preload(self):
+        """Starts loading the model on a worker thread without blocking startup."""
+        if WHISPER_INSTALLED and self.model is None:
+            self._executor.submit(self._preload)
+
+    def _preload(self):
+        try:
+            self.get_model()
+        except Exception:
+            pass  # status / error already recorded
+
+    def acquire_slot(self):
+        with self._lock:
+            if self._pending >= settings.WHISPER_WORKERS + settings.WHISPER_QUEUE_SIZE:
+                self._counters["rejected"] += 1
+                raise TranscriptionQueueFull(
+                    f"Transcription queue is full ({self._pending} requests in flight)"
+                )
+            self._pending += 1
+
+    def run(self, fn, enqueued_at: float, *args):
+        """Runs on a worker thread; records queue wait and execution metrics."""
+        started = time.perf_counter()
+        with self._lock:
+            self._active += 1
+            self._counters["total_wait_seconds"] += started - enqueued_at
+        ok = False
+        try:
+            result = fn(*args)
+            ok = True
+            return result
+        finally:
+            with self._lock:
+                self._active -= 1
+                self._pending -= 1
+                self._counters["completed" if ok else "failed"] += 1
+                self._counters["total_seconds"] += time.perf_counter() - started
+
+    def record_stages(self, timings: Dict[str, float], audio_seconds: float):
+        with self._lock:
+            for stage, seconds in timings.items():
+                self._stage_seconds[stage] += seconds
+            self._audio_seconds += audio_seconds
+
+    async def submit(self, fn, *args):
+        self.acquire_slot()
+        try:
+            return await run_blocking(self._executor, self.run, fn, time.perf_counter(), *args)
+        except RuntimeError:
+            # Executor already shut down: the slot was never handed to a worker
+            with self._lock:
+                self._pending -= 1
+            raise
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            done = self._counters["completed"] + self._counters["failed"]
+            return {
+                "status": self.status,
+                "error": self.error,
+                "model_size": settings.WHISPER_MODEL_SIZE,
+                "device": settings.WHISPER_DEVICE,
+                "compute_type": settings.WHISPER_COMPUTE_TYPE,
+                "load_seconds": self.load_seconds,
+                "workers": settings.WHISPER_WORKERS,
+                "queue_capacity": settings.WHISPER_QUEUE_SIZE,
+                "active": self._active,
+                "queue_depth": self._pending - self._active,
+                "completed": self._counters["completed"],
+                "failed": self._counters["failed"],
+                "rejected": self._counters["rejected"],
+                "avg_seconds": round(self._counters["total_seconds"] / done, 4) if done else 0.0,
+                "avg_wait_seconds": round(self._counters["total_wait_seconds"] / done, 4) if done else 0.0,
+                "avg_stage_seconds": {
+                    stage: round(total / done, 4) if done else 0.0 for stage, total in self._stage_seconds.items()
+                },
+                "audio_seconds": round(self._audio_seconds, 2),
+                # Processing time per second of audio (< 1 is faster than real time)
+                "real_time_factor": round(
+                    sum(self._stage_seconds.values()) / self._audio_seconds, 4
+                ) if self._audio_seconds else None,
+            }
+
+    def shutdown(self):
+        self._executor.shutdown(wait=False, cancel_futures=True)
+
+
+_whisper = _WhisperState()
+
 
 class TranscriptionService:
     @staticmethod
     def is_available() -> bool:
-        return stt_model is not None
+        return WHISPER_INSTALLED and _whisper.status != "failed"
+
+    @staticmethod
+    def preload():
+        _whisper.preload()
+
+    @staticmethod
+    def stats() -> Dict[str, Any]:
+        return _whisper.stats()
 
     @staticmethod
-    def transcribe(file_obj) -> str:
-        if not stt_model:
-            raise Exception("Service unavailable")
+    def shutdown():
+        _whisper.shutdown()
 
-        # Save the uploaded file to a temporary file
-        temp_audio_path = ""
+    @staticmethod
+    def transcribe(file_obj: BinaryIO) -> Dict[str, Any]:
+        """
+        Blocking transcription; runs on the calling thread.
+
+        The upload is decoded straight from its buffer to 16 kHz float32 PCM
+        (no temp-file round trip) and the array is handed to the model.
+
+        Returns:
+            {"text", "duration", "timings_ms": {decode_audio, vad, beam_search}}
+
+        Raises:
+            AudioTooLarge: when the upload or its decoded duration is over the limit
+        """
+        from faster_whisper import decode_audio
+
+        model = _whisper.get_model()
+        timings = {}
+
+        start = time.perf_counter()
+        buffer = _buffer_upload(file_obj, int(settings.WHISPER_MAX_UPLOAD_MB * 1024 * 1024))
         try:
-            with tempfile.NamedTemporaryFile(delete=False, suffix=".wav") as temp_audio:
-                shutil.copyfileobj(file_obj, temp_audio)
-                temp_audio_path = temp_audio.name
-            
-            # Transcribe
-            segments, info = stt_model.transcribe(temp_audio_path, beam_size=5)
-            text = " ".join([segment.text for segment in segments]).strip()
-            
-            return text
+            audio = decode_audio(buffer, sampling_rate=SAMPLING_RATE)
         finally:
-            if temp_audio_path and os.path.exists(temp_audio_path):
-                os.remove(temp_audio_path)
+            if buffer is not file_obj:
+                buffer.close()
+        timings["decode_audio"] = time.perf_counter() - start
+
+        duration = len(audio) / SAMPLING_RATE
+        if duration > settings.WHISPER_MAX_DURATION_SECONDS:
+            raise AudioTooLarge(
+                f"Audio is {duration:.0f}s long; the limit is {settings.WHISPER_MAX_DURATION_SECONDS:.0f}s"
+            )
+
+        # transcribe() runs VAD, feature extraction and language detection up front;
+        # beam search only happens while the segment generator is consumed.
+        start = time.perf_counter()
+        segments, info = model.transcribe(
+            audio, beam_size=settings.WHISPER_BEAM_SIZE, vad_filter=settings.WHISPER_VAD_FILTER
+        )
+        timings["vad"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        text = " ".join([segment.text for segment in segments]).strip()
+        timings["beam_search"] = time.perf_counter() - start
+
+        _whisper.record_stages(timings, duration)
+        return {
+            "text": text,
+            "duration": round(duration, 2),
+            "timings_ms": {stage: round(seconds * 1000, 1) for stage, seconds in timings.items()},
+        }
+
+    @staticmethod
+    def transcribe_pcm(audio: np.ndarray, beam_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """
+        Blocking transcription of 16 kHz float32 PCM already in memory.
+
+        Returns:
+            [{"start", "end", "text"}] with times in seconds from the start of `audio`
+        """
+        model = _whisper.get_model()
+        timings = {}
+
+        start = time.perf_counter()
+        segments, info = model.transcribe(
+            audio, beam_size=beam_size or settings.WHISPER_BEAM_SIZE, vad_filter=settings.WHISPER_VAD_FILTER
+        )
+        timings["vad"] = time.perf_counter() - start
+
+        start = time.perf_counter()
+        result = [{"start": seg.start, "end": seg.end, "text": seg.text.strip()} for seg in segments]
+        timings["beam_search"] = time.perf_counter() - start
+
+        _whisper.record_stages(timings, len(audio) / SAMPLING_RATE)
+        return result
+
+    @staticmethod
+    async def transcribe_pcm_async(audio: np.ndarray, beam_size: Optional[int] = None) -> List[Dict[str, Any]]:
+        """transcribe_pcm on the dedicated worker pool (may raise TranscriptionQueueFull)."""
+        return await _whisper.submit(TranscriptionService.transcribe_pcm, audio, beam_size)
+
+    @staticmethod
+    async def transcribe_async(file_obj: BinaryIO) -> Dict[str, Any]:
+        """
+        Queues a transcription on the dedicated worker pool.
+
+        Raises:
+            TranscriptionQueueFull: when the workers and the wait queue are all taken
+            AudioTooLarge: when the upload or its decoded duration is over the limit
+        """
+        return await _whisper.submit(TranscriptionService.transcribe, file_obj)
+
+
+class StreamingTranscriber:
+    """
+    Incremental transcription of raw PCM arriving in chunks (one WebSocket session).
+
+    Audio that is not committed yet forms a sliding window. Each partial pass
+    re-transcribes the window greedily (beam size 1). Once the window is longer
+    than WHISPER_STREAM_WINDOW_SECONDS, every segment except the last is
+    treated as stable: it is committed and the window slides past it, so a pass
+    never costs more than about one window of audio.
+    """
+
+    ENCODINGS = {"pcm_s16le": np.dtype("<i2"), "pcm_f32le": np.dtype("<f4")}
+
+    def __init__(self, sample_rate: int = SAMPLING_RATE, encoding: str = "pcm_s16le"):
+        if encoding not in self.ENCODINGS:
+            raise ValueError(f"Unsupported encoding '{encoding}'; use one of {sorted(self.ENCODINGS)}")
+        self.sample_rate = sample_rate
+        self.dtype = self.ENCODINGS[encoding]
+        self.segments: List[Dict[str, Any]] = []
+        self._window = np.zeros(0, dtype=np.float32)
+        self._window_start = 0.0  # seconds of audio committed before the window
+        self._pending_bytes = b""
+        self._new_samples = 0
+        self._tail_text = ""
+
+    @property
+    def duration(self) -> float:
+        return self._window_start + len(self._window) / SAMPLING_RATE
+
+    @property
+    def text(self) -> str:
+        return " ".join(s["text"] for s in self.segments if s["text"]).strip()
+
+    def feed(self, chunk: bytes) -> bool:
+        """
+        Appends a chunk of audio. Returns True when enough new audio arrived
+        for another partial pass.
+        """
+        data = self._pending_bytes + chunk
+        usable = len(data) - len(data) % self.dtype.itemsize
+        self._pending_bytes = data[usable:]
+        samples = np.frombuffer(data[:usable], dtype=self.dtype).astype(np.float32)
+        if self.dtype.kind == "i":
+            samples /= 32768.0
+        if self.sample_rate != SAMPLING_RATE and len(samples):
+            n_out = int(round(len(samples) * SAMPLING_RATE / self.sample_rate))
+            samples = np.interp(
+                np.arange(n_out) * (self.sample_rate / SAMPLING_RATE), np.arange(len(samples)), samples
+            ).astype(np.float32)
+
+        self._window = np.concatenate([self._window, samples])
+        self._new_samples += len(samples)
+        return self._new_samples >= settings.WHISPER_STREAM_STEP_SECONDS * SAMPLING_RATE
+
+    def _commit(self, segments: List[Dict[str, Any]]) -> List[Dict[str, Any]]:
+        """Moves segments out of the window; returns them with absolute times."""
+        committed = [
+            {"start": round(self._window_start + s["start"], 2), "end": round(self._window_start + s["end"], 2),
+             "text": s["text"]}
+            for s in segments
+        ]
+        cut = min(len(self._window), int(segments[-1]["end"] * SAMPLING_RATE))
+        self._window = self._window[cut:]
+        self._window_start += cut / SAMPLING_RATE
+        self.segments.extend(committed)
+        return committed
+
+    async def partial(self) -> Dict[str, Any]:
+        """
+        Re-transcribes the current window.
+
+        Returns:
+            {"type": "partial", "text", "committed": [segments that became final]}
+        """
+        self._new_samples = 0
+        audio = self._window  # feed() replaces the array, so this snapshot stays intact
+        segments = await TranscriptionService.transcribe_pcm_async(audio, beam_size=1)
+
+        committed = []
+        if len(audio) / SAMPLING_RATE > settings.WHISPER_STREAM_WINDOW_SECONDS:
+            if len(segments) > 1:
+                committed = self._commit(segments[:-1])
+                segments = segments[-1:]
+            elif len(audio) / SAMPLING_RATE > 2 * settings.WHISPER_STREAM_WINDOW_SECONDS and segments:
+                # One unbroken segment filling two windows: commit it rather than grow forever
+                committed = self._commit(segments)
+                segments = []
+
+        self._tail_text = " ".join(s["text"] for s in segments if s["text"])
+        return {"type": "partial", "text": f"{self.text} {self._tail_text}".strip(), "committed": committed}
+
+    async def finish(self) -> Dict[str, Any]:
+        """
+        Transcribes what is left of the window with the full beam and commits it.
+
+        Returns:
+            {"type": "final", "text", "duration", "segments"}
+        """
+        if len(self._window):
+            segments = await TranscriptionService.transcribe_pcm_async(self._window)
+            if segments:
+                self._commit(segments)
+        return {"type": "final", "text": self.text, "duration": round(self.duration, 2), "segments": self.segments}
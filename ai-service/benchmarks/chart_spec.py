@@ -0,0 +1,108 @@
+"""
+Chart serialization benchmark.
+
+Compares the previous plot_json path (plotly.express figure with the
+"plotly_dark" template, serialized via fig.to_dict() + json.dumps) with the
+compact spec from modules.chart_spec: payload size and CPU time per call,
+plus the one-off cost of importing plotly in a fresh interpreter.
+
+Usage (from ai-service/):
+    python -m benchmarks.chart_spec [--rows 100 1000 10000 50000] [--repeat 5]
+"""
+
+import argparse
+import json
+import subprocess
+import sys
+import time
+from datetime import datetime
+
+import numpy as np
+import pandas as pd
+
+from modules.chart_spec import chart_spec_json
+
+
+class _PlotlyEncoder(json.JSONEncoder):
+    # Same encoder the plotly path used in ChatService
+    def default(self, obj):
+        if isinstance(obj, (np.integer, np.floating)):
+            return obj.item()
+        if isinstance(obj, np.ndarray):
+            return obj.tolist()
+        if isinstance(obj, (pd.Timestamp, datetime)):
+            return obj.isoformat()
+        return json.JSONEncoder.default(self, obj)
+
+
+def plotly_json(df, insight):
+    import plotly.express as px
+
+    fn = px.line if insight["visualization_type"] == "line" else px.bar
+    fig = fn(df, x=insight["x_column"], y=insight["y_column"], template="plotly_dark")
+    return json.dumps(fig.to_dict(), cls=_PlotlyEncoder)
+
+
+def sample_frame(rows: int) -> pd.DataFrame:
+    rng = np.random.default_rng(42)
+    return pd.DataFrame({
+        "date_time": pd.date_range("2025-01-01", periods=rows, freq="h"),
+        "total_load": rng.random(rows) * 1000,
+    })
+
+
+def time_call(fn, repeat: int):
+    fn()  # warm-up
+    samples = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        out = fn()
+        samples.append(time.perf_counter() - start)
+    return float(np.median(samples)), out
+
+
+def import_cost(module: str) -> float:
+    # pandas / numpy are loaded first: every worker has them anyway
+    code = f"import time, numpy, pandas; s = time.perf_counter(); import {module}; print(time.perf_counter() - s)"
+    out = subprocess.run([sys.executable, "-c", code], capture_output=True, text=True, check=True)
+    return float(out.stdout.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[100, 1000, 10000, 50000])
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    try:
+        import plotly.express  # noqa: F401
+        has_plotly = True
+    except ImportError:
+        has_plotly = False
+        print("plotly not installed: only the compact spec is measured\n")
+
+    if has_plotly:
+        print(f"import plotly.express: {import_cost('plotly.express') * 1000:.0f} ms (fresh interpreter, pandas preloaded)")
+    print(f"import modules.chart_spec: {import_cost('modules.chart_spec') * 1000:.0f} ms (fresh interpreter, pandas preloaded)\n")
+
+    header = f"{'rows':>8} {'chart':>5} | {'plotly ms':>10} {'plotly KB':>10} | {'spec ms':>8} {'spec KB':>8} | {'speedup':>7} {'size':>6}"
+    print(header)
+    print("-" * len(header))
+    for rows in args.rows:
+        df = sample_frame(rows)
+        for chart in ("line", "bar"):
+            insight = {"visualization_type": chart, "x_column": "date_time", "y_column": "total_load"}
+            spec_t, spec_out = time_call(lambda: chart_spec_json(df, insight), args.repeat)
+            if has_plotly:
+                plotly_t, plotly_out = time_call(lambda: plotly_json(df, insight), args.repeat)
+                print(
+                    f"{rows:>8} {chart:>5} | {plotly_t * 1000:>10.1f} {len(plotly_out) / 1024:>10.1f} | "
+                    f"{spec_t * 1000:>8.1f} {len(spec_out) / 1024:>8.1f} | "
+                    f"{plotly_t / spec_t:>6.1f}x {len(spec_out) / len(plotly_out):>6.0%}"
+                )
+            else:
+                print(f"{rows:>8} {chart:>5} | {'-':>10} {'-':>10} | {spec_t * 1000:>8.1f} {len(spec_out) / 1024:>8.1f} |")
+
+
+if __name__ == "__main__":
+    main()
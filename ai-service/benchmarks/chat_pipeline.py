@@ -0,0 +1,274 @@
+"""
+Chat pipeline benchmark.
+
+Runs the full chat pipeline against a fake Ollama server (benchmarks.fake_ollama)
+and a seeded meter_loads dataset (benchmarks.dataset) at several sizes, and
+reports p50 / p95 / p99 latency, throughput and memory for:
+
+- sql        db_manager.run_select_limited for the generated query (one stage)
+- serialize  ChatService.render_response_json of that result (one stage)
+- pipeline   ChatService.process_chat from a thread pool
+- async      ChatService.process_chat_async on one event loop
+- http       POST /api/chat against uvicorn on a local port
+
+at each concurrency level. SQL / result caches and request coalescing are
+disabled unless --with-caches is given, so every request pays for every stage.
+
+Usage (from ai-service/):
+    python -m benchmarks.chat_pipeline [--rows 10000 100000 1000000] [--concurrency 1 4 16]
+        [--requests 50] [--backend sqlite|postgresql] [--latency-ms sql=150 ...] [--json out.json]
+"""
+
+import argparse
+import asyncio
+import contextlib
+import json
+import logging
+import os
+import resource
+import socket
+import sys
+import tempfile
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict, List
+
+import numpy as np
+
+from benchmarks.dataset import seed_postgres, seed_sqlite
+from benchmarks.fake_ollama import AGGREGATE_SQL, FakeOllama, parse_latency
+
+QUERIES = [
+    "show me the total load over time",
+    "what was the load for meter 1003",
+]
+MODEL_TYPE = "local"
+USER_ROLE = "admin"
+
+
+def rss_mb() -> float:
+    """Current resident set size (Linux /proc), falling back to the peak."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE") / 1024 ** 2
+    except (OSError, ValueError):
+        return peak_rss_mb()
+
+
+def peak_rss_mb() -> float:
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / 1024 ** 2 if sys.platform == "darwin" else peak / 1024
+
+
+def summarize(name: str, latencies: List[float], wall: float, errors: int, rss_before: float) -> Dict[str, Any]:
+    arr = np.asarray(latencies) * 1000 if latencies else np.zeros(1)
+    return {
+        "scenario": name,
+        "requests": len(latencies),
+        "errors": errors,
+        "p50_ms": round(float(np.percentile(arr, 50)), 2),
+        "p95_ms": round(float(np.percentile(arr, 95)), 2),
+        "p99_ms": round(float(np.percentile(arr, 99)), 2),
+        "throughput_rps": round(len(latencies) / wall, 2) if wall else 0.0,
+        "rss_growth_mb": round(rss_mb() - rss_before, 1),
+        "peak_rss_mb": round(peak_rss_mb(), 1),
+    }
+
+
+def run_threaded(name: str, fn: Callable[[int], Any], requests: int, concurrency: int) -> Dict[str, Any]:
+    latencies, errors = [], 0
+    lock = threading.Lock()
+
+    def one(i):
+        nonlocal errors
+        start = time.perf_counter()
+        try:
+            fn(i)
+            with lock:
+                latencies.append(time.perf_counter() - start)
+        except Exception:
+            with lock:
+                errors += 1
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as pool:
+        list(pool.map(one, range(requests)))
+    return summarize(name, latencies, time.perf_counter() - start, errors, rss_before)
+
+
+def run_async(name: str, fn: Callable[..., Any], requests: int, concurrency: int,
+              context: Callable[[], Any] = contextlib.nullcontext) -> Dict[str, Any]:
+    """Runs fn(i) (or fn(i, ctx) with a `context` async manager) on one event loop."""
+    latencies, errors = [], 0
+
+    async def driver():
+        slots = asyncio.Semaphore(concurrency)
+        async with context() as ctx:
+
+            async def one(i):
+                nonlocal errors
+                async with slots:
+                    start = time.perf_counter()
+                    try:
+                        await (fn(i) if ctx is None else fn(i, ctx))
+                        latencies.append(time.perf_counter() - start)
+                    except Exception:
+                        errors += 1
+
+            await asyncio.gather(*(one(i) for i in range(requests)))
+
+    rss_before = rss_mb()
+    start = time.perf_counter()
+    asyncio.run(driver())
+    return summarize(name, latencies, time.perf_counter() - start, errors, rss_before)
+
+
+async def post_chat(client, message: str) -> bytes:
+    r = await client.post("/api/chat", json={"message": message, "model_type": MODEL_TYPE, "user_role": USER_ROLE})
+    r.raise_for_status()
+    return r.content
+
+
+class LocalServer:
+    """uvicorn serving app.main:app on a free local port, in a background thread."""
+
+    def __init__(self, app):
+        import uvicorn
+
+        with socket.socket() as s:
+            s.bind(("127.0.0.1", 0))
+            self.port = s.getsockname()[1]
+        self.server = uvicorn.Server(uvicorn.Config(app, host="127.0.0.1", port=self.port, log_level="warning"))
+        self.thread = threading.Thread(target=self.server.run, name="bench-uvicorn", daemon=True)
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}"
+
+    def __enter__(self):
+        self.thread.start()
+        while not self.server.started:
+            time.sleep(0.05)
+        return self
+
+    def __exit__(self, *exc):
+        self.server.should_exit = True
+        self.thread.join(timeout=10)
+
+
+def configure_environment(args, fake: FakeOllama):
+    # Must run before any app / modules import: settings are read at import time
+    os.environ["OLLAMA_API"] = fake.url
+    os.environ["DB_TYPE"] = args.backend
+    os.environ["WARMUP_MODELS"] = "false"
+    os.environ["PLANNER_MODE"] = args.planner
+    if not args.with_caches:
+        os.environ["SQL_CACHE_ENABLED"] = "false"
+        os.environ["RESULT_CACHE_ENABLED"] = "false"
+        os.environ["SINGLE_FLIGHT_ENABLED"] = "false"
+    logging.getLogger("AI_SERVICE").setLevel(logging.WARNING)
+
+
+def use_dataset(args, rows: int, workdir: str):
+    from modules.db import close_database, config
+
+    if args.backend == "sqlite":
+        config.SQLITE_DB_PATH = seed_sqlite(os.path.join(workdir, f"bench_{rows}.db"), rows, args.meters)
+        close_database()
+    elif args.force_seed:
+        seed_postgres(rows, args.meters)
+
+
+def print_table(results: List[Dict[str, Any]]):
+    header = (f"{'rows':>8} {'conc':>4} {'scenario':>10} | {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} | "
+              f"{'req/s':>8} {'err':>4} | {'rss +MB':>8} {'peak MB':>8} | llm calls/req")
+    print(header)
+    print("-" * len(header))
+    for r in results:
+        calls = " ".join(f"{k}={v}" for k, v in sorted(r.get("llm_calls_per_request", {}).items())) or "-"
+        print(
+            f"{r['rows']:>8} {r['concurrency']:>4} {r['scenario']:>10} | "
+            f"{r['p50_ms']:>9.1f} {r['p95_ms']:>9.1f} {r['p99_ms']:>9.1f} | "
+            f"{r['throughput_rps']:>8.1f} {r['errors']:>4} | {r['rss_growth_mb']:>8.1f} {r['peak_rss_mb']:>8.1f} | {calls}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000])
+    parser.add_argument("--meters", type=int, default=10)
+    parser.add_argument("--concurrency", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--requests", type=int, default=50, help="requests per scenario and concurrency level")
+    parser.add_argument("--backend", choices=["sqlite", "postgresql"], default="sqlite")
+    parser.add_argument("--force-seed", action="store_true",
+                        help="PostgreSQL only: replace meter_loads in the configured database (destructive)")
+    parser.add_argument("--scenarios", nargs="+", default=["sql", "serialize", "pipeline", "async", "http"])
+    parser.add_argument("--planner", choices=["off", "single_shot"], default="off", help="PLANNER_MODE for the run")
+    parser.add_argument("--latency-ms", nargs="*", help="fake LLM latency: kind=ms pairs or one value for all")
+    parser.add_argument("--token-ms", type=float, default=5)
+    parser.add_argument("--with-caches", action="store_true", help="keep the SQL / result caches and request coalescing enabled")
+    parser.add_argument("--json", metavar="PATH", help="also write the results as JSON")
+    args = parser.parse_args()
+
+    fake = FakeOllama(latency_ms=parse_latency(args.latency_ms), token_ms=args.token_ms).start()
+    configure_environment(args, fake)
+
+    import httpx
+    from app.main import app
+    from app.services.chat import ChatService
+    from modules import db_manager
+
+    print(f"Fake Ollama: {fake.url} latency ms {fake.latency_ms}; backend: {args.backend}; "
+          f"caches: {'on' if args.with_caches else 'off'}\n")
+
+    def query(i: int) -> str:
+        return QUERIES[i % len(QUERIES)]
+
+    results = []
+    with tempfile.TemporaryDirectory(prefix="ai-bench-") as workdir, LocalServer(app) as server:
+        for rows in args.rows:
+            use_dataset(args, rows, workdir)
+            frame, _ = db_manager.run_select_limited(AGGREGATE_SQL)
+            response_data = {"type": "data", "intent": "SQL_QUERY", "content": "", "sql": AGGREGATE_SQL}
+
+            scenarios = {
+                "sql": ("threaded", lambda i: db_manager.run_select_limited(AGGREGATE_SQL)),
+                "serialize": ("threaded", lambda i: ChatService.render_response_json(response_data, frame)),
+                "pipeline": ("threaded", lambda i: ChatService.process_chat(query(i), MODEL_TYPE, USER_ROLE)),
+                "async": ("async", lambda i: ChatService.process_chat_async(query(i), MODEL_TYPE, USER_ROLE)),
+            }
+
+            for concurrency in args.concurrency:
+                for name in args.scenarios:
+                    fake.reset_calls()
+                    if name == "http":
+                        result = run_async(name, lambda i, client: post_chat(client, query(i)), args.requests,
+                                           concurrency, lambda: httpx.AsyncClient(base_url=server.url, timeout=300))
+                    elif name in scenarios:
+                        mode, fn = scenarios[name]
+                        result = (run_threaded if mode == "threaded" else run_async)(name, fn, args.requests, concurrency)
+                    else:
+                        parser.error(f"unknown scenario {name!r}")
+                    calls = fake.reset_calls()
+                    result.update({
+                        "rows": rows,
+                        "concurrency": concurrency,
+                        "llm_calls_per_request": {k: round(v / args.requests, 2) for k, v in calls.items()},
+                    })
+                    results.append(result)
+                    print(f"  rows={rows} concurrency={concurrency} {name}: p50 {result['p50_ms']} ms, "
+                          f"{result['throughput_rps']} req/s, {result['errors']} errors")
+        print()
+        print_table(results)
+
+    fake.stop()
+    if args.json:
+        with open(args.json, "w") as f:
+            json.dump({"args": vars(args), "results": results}, f, indent=2)
+        print(f"\nWrote {args.json}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,115 @@
+"""
+Seeded meter_loads datasets for benchmarks.
+
+`rows` readings are spread over `meters` meters at hourly resolution, with a
+daily cycle plus seeded noise, so every run at the same size sees the same data.
+
+Usage (from ai-service/):
+    python -m benchmarks.dataset --sqlite /tmp/bench.db --rows 100000
+"""
+
+import argparse
+import os
+import sqlite3
+from typing import Iterator, List, Tuple
+
+import numpy as np
+import pandas as pd
+
+START = "2025-01-01"
+FIRST_METER_ID = 1001
+BATCH_ROWS = 50_000
+
+
+def generate(rows: int, meters: int = 10, seed: int = 42) -> Iterator[List[Tuple[int, str, float]]]:
+    """Yields batches of (meter_id, date_time, forecasted_load) rows."""
+    rng = np.random.default_rng(seed)
+    hours = max(1, rows // meters)
+    timestamps = pd.date_range(START, periods=hours, freq="h")
+    daily = 1.0 + 0.5 * np.sin((timestamps.hour.to_numpy() - 6) / 24 * 2 * np.pi)
+    stamps = timestamps.strftime("%Y-%m-%d %H:%M:%S").tolist()
+
+    for meter in range(meters):
+        base = rng.uniform(5, 50)
+        loads = np.round(base * daily * rng.normal(1.0, 0.08, hours), 3).tolist()
+        meter_id = FIRST_METER_ID + meter
+        for start in range(0, hours, BATCH_ROWS):
+            end = min(start + BATCH_ROWS, hours)
+            yield [(meter_id, stamps[i], loads[i]) for i in range(start, end)]
+
+
+def seed_sqlite(path: str, rows: int, meters: int = 10, seed: int = 42) -> str:
+    """(Re)creates a SQLite database at `path` holding the seeded dataset."""
+    from modules.db.sqlite_db import SCHEMA
+
+    if os.path.exists(path):
+        os.remove(path)
+    conn = sqlite3.connect(path)
+    try:
+        for statement in SCHEMA:
+            conn.execute(statement)
+        for batch in generate(rows, meters, seed):
+            conn.executemany("INSERT INTO meter_loads VALUES (?, ?, ?)", batch)
+        conn.executemany(
+            "INSERT INTO meter_users VALUES (?, ?)",
+            [(f"user{FIRST_METER_ID + i}", FIRST_METER_ID + i) for i in range(meters)],
+        )
+        conn.execute("CREATE INDEX IF NOT EXISTS idx_meter_loads_date_time ON meter_loads (date_time)")
+        conn.commit()
+    finally:
+        conn.close()
+    return path
+
+
+def seed_postgres(rows: int, meters: int = 10, seed: int = 42):
+    """
+    Replaces the contents of meter_loads / meter_users in the configured
+    PostgreSQL database (DB_* settings). Destructive: point DB_NAME at a
+    benchmark database.
+    """
+    from psycopg2.extras import execute_values
+    from modules.db import get_database
+
+    db = get_database()
+    conn = db.get_connection()
+    try:
+        with conn.cursor() as cursor:
+            cursor.execute("CREATE TABLE IF NOT EXISTS meter_users (username VARCHAR PRIMARY KEY, meter_id INTEGER)")
+            cursor.execute(
+                "CREATE TABLE IF NOT EXISTS meter_loads "
+                "(meter_id INTEGER, date_time TIMESTAMPTZ, forecasted_load DOUBLE PRECISION)"
+            )
+            cursor.execute("TRUNCATE meter_loads, meter_users")
+            for batch in generate(rows, meters, seed):
+                execute_values(cursor, "INSERT INTO meter_loads VALUES %s", batch, page_size=5000)
+            execute_values(
+                cursor, "INSERT INTO meter_users VALUES %s",
+                [(f"user{FIRST_METER_ID + i}", FIRST_METER_ID + i) for i in range(meters)],
+            )
+            cursor.execute("CREATE INDEX IF NOT EXISTS idx_meter_loads_date_time ON meter_loads (date_time)")
+            cursor.execute("ANALYZE meter_loads")
+        conn.commit()
+    finally:
+        db.release_connection(conn)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, default=100_000)
+    parser.add_argument("--meters", type=int, default=10)
+    parser.add_argument("--seed", type=int, default=42)
+    target = parser.add_mutually_exclusive_group(required=True)
+    target.add_argument("--sqlite", metavar="PATH", help="write a SQLite database to PATH")
+    target.add_argument("--postgres", action="store_true", help="replace meter_loads in the configured PostgreSQL database")
+    args = parser.parse_args()
+
+    if args.sqlite:
+        seed_sqlite(args.sqlite, args.rows, args.meters, args.seed)
+        print(f"Seeded {args.rows} rows into {args.sqlite}")
+    else:
+        seed_postgres(args.rows, args.meters, args.seed)
+        print(f"Seeded {args.rows} rows into PostgreSQL")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,207 @@
+"""
+Fake Ollama server for benchmarks.
+
+Serves POST /api/generate with deterministic answers for each prompt the
+service sends (intent classification, SQL generation, single-shot planning,
+data analysis and the streamed summary) after a configurable delay, so the
+rest of the pipeline can be measured without a GPU or model variance.
+
+Usage (from ai-service/):
+    python -m benchmarks.fake_ollama --port 11500 --latency-ms sql=150 analysis=120
+    OLLAMA_API=http://127.0.0.1:11500/api/generate uvicorn app.main:app
+"""
+
+import argparse
+import json
+import re
+import threading
+import time
+from collections import Counter
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Optional, Tuple
+
+# Simulated generation time per prompt kind, before the first byte
+DEFAULT_LATENCY_MS = {"intent": 60, "sql": 150, "plan": 200, "analysis": 120, "summary": 40, "other": 50}
+# Delay between streamed tokens
+DEFAULT_TOKEN_MS = 5
+
+AGGREGATE_SQL = "SELECT date_time, SUM(forecasted_load) as total_load FROM meter_loads GROUP BY date_time ORDER BY date_time"
+METER_SQL = "SELECT date_time, forecasted_load FROM meter_loads WHERE meter_id = {meter} ORDER BY date_time"
+
+
+def _query(prompt: str) -> str:
+    match = re.search(r"Query:\s*(.*)", prompt)
+    return match.group(1).strip() if match else ""
+
+
+def _sql_for(query: str) -> str:
+    meter = re.search(r"meter\s+(\d+)", query, re.IGNORECASE)
+    return METER_SQL.format(meter=int(meter.group(1))) if meter else AGGREGATE_SQL
+
+
+def _columns(prompt: str):
+    match = re.search(r"Columns and Types:\s*(\{.*?\})", prompt)
+    return re.findall(r"'([^']+)':", match.group(1)) if match else []
+
+
+def classify_prompt(prompt: str) -> str:
+    if "intent classifier" in prompt:
+        return "intent"
+    if "Expert SQL Generator" in prompt:
+        return "sql"
+    if "Query Planner" in prompt:
+        return "plan"
+    if "Data Analyst" in prompt:
+        return "analysis" if "JSON Output Only" in prompt else "summary"
+    return "other"
+
+
+def answer(prompt: str) -> Tuple[str, str]:
+    """Returns (prompt kind, response text) for one prompt."""
+    kind = classify_prompt(prompt)
+    query = _query(prompt)
+
+    if kind == "intent":
+        intent = "REVENUE_FORECAST" if "revenue" in query.lower() else "SQL_QUERY"
+        return kind, json.dumps({"intent": intent})
+    if kind == "sql":
+        return kind, f"```sql\n{_sql_for(query)}\n```"
+    if kind == "plan":
+        x, y = ("date_time", "forecasted_load") if "meter" in query.lower() else ("date_time", "total_load")
+        return kind, json.dumps({
+            "intent": "SQL_QUERY",
+            "sql": _sql_for(query),
+            "dates": [],
+            "visualization": {"type": "line", "x_column": x, "y_column": y},
+        })
+    if kind == "analysis":
+        columns = _columns(prompt)
+        x = next((c for c in columns if "date" in c or "time" in c), columns[0] if columns else "date_time")
+        y = next((c for c in columns if c != x), x)
+        return kind, json.dumps({
+            "summary": f"{y} varies over {x} with a clear daily cycle.",
+            "visualization_type": "line",
+            "x_column": x,
+            "y_column": y,
+        })
+    if kind == "summary":
+        return kind, "Load peaks in the early evening and drops overnight across the period."
+    return kind, "OK"
+
+
+class FakeOllama:
+    """
+    Threaded fake Ollama HTTP server. Runs in a daemon thread; `url` is the
+    value to use for OLLAMA_API.
+    """
+
+    def __init__(self, host: str = "127.0.0.1", port: int = 0, latency_ms: Optional[Dict[str, float]] = None,
+                 token_ms: float = DEFAULT_TOKEN_MS):
+        self.latency_ms = {**DEFAULT_LATENCY_MS, **(latency_ms or {})}
+        self.token_ms = token_ms
+        self.calls = Counter()
+        self._lock = threading.Lock()
+        self._server = ThreadingHTTPServer((host, port), self._handler())
+        self._server.daemon_threads = True
+        self._thread = None
+
+    @property
+    def url(self) -> str:
+        host, port = self._server.server_address[:2]
+        return f"http://{host}:{port}/api/generate"
+
+    def _record(self, kind: str):
+        with self._lock:
+            self.calls[kind] += 1
+
+    def reset_calls(self) -> Dict[str, int]:
+        with self._lock:
+            calls, self.calls = dict(self.calls), Counter()
+        return calls
+
+    def _handler(self):
+        fake = self
+
+        class Handler(BaseHTTPRequestHandler):
+            protocol_version = "HTTP/1.1"  # keep-alive, like Ollama
+
+            def log_message(self, *args):
+                pass
+
+            def do_POST(self):
+                body = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                kind, text = answer(body.get("prompt", ""))
+                fake._record(kind)
+                time.sleep(fake.latency_ms.get(kind, fake.latency_ms["other"]) / 1000)
+
+                model = body.get("model", "fake")
+                tokens = re.findall(r"\S+\s*", text)
+                if body.get("stream", True):
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/x-ndjson")
+                    self.send_header("Transfer-Encoding", "chunked")
+                    self.end_headers()
+                    for token in tokens:
+                        time.sleep(fake.token_ms / 1000)
+                        self._chunk({"model": model, "response": token, "done": False})
+                    self._chunk({"model": model, "response": "", "done": True,
+                                 "prompt_eval_count": len(body.get("prompt", "").split()), "eval_count": len(tokens)})
+                    self.wfile.write(b"0\r\n\r\n")
+                else:
+                    payload = json.dumps({
+                        "model": model, "response": text, "done": True,
+                        "prompt_eval_count": len(body.get("prompt", "").split()), "eval_count": len(tokens),
+                    }).encode()
+                    self.send_response(200)
+                    self.send_header("Content-Type", "application/json")
+                    self.send_header("Content-Length", str(len(payload)))
+                    self.end_headers()
+                    self.wfile.write(payload)
+
+            def _chunk(self, obj):
+                data = json.dumps(obj).encode() + b"\n"
+                self.wfile.write(f"{len(data):x}\r\n".encode() + data + b"\r\n")
+                self.wfile.flush()
+
+        return Handler
+
+    def start(self) -> "FakeOllama":
+        self._thread = threading.Thread(target=self._server.serve_forever, name="fake-ollama", daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self._server.shutdown()
+        self._server.server_close()
+
+
+def parse_latency(values) -> Dict[str, float]:
+    """Parses ["sql=150", "analysis=80"] (or a bare "100" for every kind)."""
+    latency = {}
+    for value in values or []:
+        if "=" in value:
+            kind, ms = value.split("=", 1)
+            latency[kind.strip()] = float(ms)
+        else:
+            latency = {kind: float(value) for kind in DEFAULT_LATENCY_MS}
+    return latency
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=11500)
+    parser.add_argument("--latency-ms", nargs="*", help="kind=ms pairs (intent, sql, plan, analysis, summary) or one value for all")
+    parser.add_argument("--token-ms", type=float, default=DEFAULT_TOKEN_MS)
+    args = parser.parse_args()
+
+    server = FakeOllama(args.host, args.port, parse_latency(args.latency_ms), args.token_ms)
+    print(f"Fake Ollama listening on {server.url} (latency ms: {server.latency_ms})")
+    try:
+        server._server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
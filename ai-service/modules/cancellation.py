@@ -0,0 +1,162 @@
+"""
+Cancellation Module
+
+Cooperative cancellation for chat turns.
+
+A `CancellationToken` is a `threading.Event` (so it still works wherever a
+`cancel_event` was accepted before) that also runs callbacks when it is set.
+Blocking stages register a callback that aborts their in-flight work:
+
+- Ollama calls close their HTTP connection, which stops the generation
+- PostgreSQL queries call `connection.cancel()` (the pg_cancel_backend request)
+- SQLite queries call `connection.interrupt()`
+
+and then raise `OperationCancelled`, releasing their pooled resources on the
+way out. `CancellationRegistry` maps conversation ids to the token of their
+running turn for the /stop endpoint, with TTL cleanup.
+"""
+
+import os
+import time
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+CANCEL_TOKEN_TTL_SECONDS = float(os.getenv("CANCEL_TOKEN_TTL_SECONDS", "3600"))
+CANCEL_TOKEN_MAX_ENTRIES = int(os.getenv("CANCEL_TOKEN_MAX_ENTRIES", "10000"))
+
+
+class OperationCancelled(Exception):
+    """Raised by a stage that stopped because its cancellation token was set."""
+
+
+class CancellationToken(threading.Event):
+    """
+    Event that runs registered callbacks (once, on the cancelling thread) when set.
+    """
+
+    def __init__(self):
+        super().__init__()
+        self._callbacks: Dict[int, Callable[[], Any]] = {}
+        self._callback_lock = threading.Lock()
+        self._next_id = 0
+
+    def set(self):
+        with self._callback_lock:
+            if self.is_set():
+                return
+            super().set()
+            callbacks, self._callbacks = list(self._callbacks.values()), {}
+        for callback in callbacks:
+            try:
+                callback()
+            except Exception as e:
+                logger.warning(f"Cancellation callback failed: {e}")
+
+    cancel = set
+
+    @property
+    def cancelled(self) -> bool:
+        return self.is_set()
+
+    def add_callback(self, callback: Callable[[], Any]) -> Optional[int]:
+        """Registers `callback`; runs it right away if the token is already set."""
+        with self._callback_lock:
+            if not self.is_set():
+                handle = self._next_id
+                self._next_id += 1
+                self._callbacks[handle] = callback
+                return handle
+        callback()
+        return None
+
+    def remove_callback(self, handle: Optional[int]):
+        if handle is not None:
+            with self._callback_lock:
+                self._callbacks.pop(handle, None)
+
+
+def raise_if_cancelled(cancel_event: Optional[threading.Event]):
+    """
+    Raises:
+        OperationCancelled: when `cancel_event` is set
+    """
+    if cancel_event is not None and cancel_event.is_set():
+        raise OperationCancelled("Request cancelled by user")
+
+
+@contextmanager
+def on_cancel(cancel_event: Optional[threading.Event], callback: Callable[[], Any]):
+    """
+    Runs `callback` if the token is cancelled while the block executes.
+    Plain threading.Event objects cannot call back; they are only polled.
+    """
+    handle = cancel_event.add_callback(callback) if isinstance(cancel_event, CancellationToken) else None
+    try:
+        yield
+    finally:
+        if handle is not None:
+            cancel_event.remove_callback(handle)
+
+
+class CancellationRegistry:
+    """
+    Thread-safe conversation id -> token map. Each new turn gets a fresh
+    token; finished turns are released, and forgotten ones expire after
+    CANCEL_TOKEN_TTL_SECONDS (oldest dropped first past the entry cap).
+    """
+
+    def __init__(self, ttl_seconds: float = CANCEL_TOKEN_TTL_SECONDS, max_entries: int = CANCEL_TOKEN_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._tokens: "OrderedDict[str, tuple]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def _prune(self, now: float):
+        while self._tokens:
+            convo_id, (_, created_at) = next(iter(self._tokens.items()))
+            if now - created_at <= self.ttl_seconds and len(self._tokens) <= self.max_entries:
+                break
+            del self._tokens[convo_id]
+
+    def start(self, convo_id: Optional[str]) -> CancellationToken:
+        """Returns a fresh token for a new turn of `convo_id` (untracked when there is no id)."""
+        token = CancellationToken()
+        if convo_id:
+            now = time.time()
+            with self._lock:
+                self._tokens.pop(convo_id, None)
+                self._tokens[convo_id] = (token, now)
+                self._prune(now)
+        return token
+
+    def cancel(self, convo_id: Optional[str]) -> bool:
+        """Cancels the running turn of `convo_id`. Returns False when there is none."""
+        with self._lock:
+            entry = self._tokens.pop(convo_id, None) if convo_id else None
+        if entry is None:
+            return False
+        entry[0].cancel()
+        return True
+
+    def release(self, convo_id: Optional[str], token: CancellationToken):
+        """Forgets a finished turn (unless a newer turn already replaced it)."""
+        if not convo_id:
+            return
+        with self._lock:
+            entry = self._tokens.get(convo_id)
+            if entry is not None and entry[0] is token:
+                del self._tokens[convo_id]
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            self._prune(time.time())
+            return {"active": len(self._tokens), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+
+# Shared instance used by the chat routes and /stop
+cancellation_registry = CancellationRegistry()
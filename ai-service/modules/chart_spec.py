@@ -0,0 +1,82 @@
+"""
+Chart Spec Module
+
+Builds Plotly-compatible figure JSON ({"data": [...], "layout": {...}})
+directly from the result columns, without importing plotly. Only the trace
+arrays and the handful of layout keys the chart needs are emitted, instead of
+the full "plotly_dark" template that plotly.express embeds in every figure.
+The output renders with Plotly.js `Plotly.newPlot(el, spec.data, spec.layout)`.
+"""
+
+import base64
+from typing import Any, Dict, Optional
+
+import numpy as np
+import pandas as pd
+
+from modules.compatibility_layer import dumps_json
+
+# The parts of the plotly_dark template that affect a single-trace chart
+DARK_LAYOUT = {
+    "paper_bgcolor": "rgb(17,17,17)",
+    "plot_bgcolor": "rgb(17,17,17)",
+    "font": {"color": "#f2f5fa"},
+    "colorway": ["#636efa"],
+    "margin": {"t": 60},
+    "hovermode": "closest",
+}
+AXIS_STYLE = {"gridcolor": "#283442", "linecolor": "#506784", "zerolinecolor": "#283442", "automargin": True}
+TRACE_COLOR = "#636efa"
+
+
+def _axis_values(values: pd.Series):
+    """
+    Column values for a trace. Numeric columns use Plotly.js typed arrays
+    ({"dtype": "f8", "bdata": base64}), the same encoding plotly.py emits,
+    which is far smaller than JSON numbers; NaN stays NaN (a gap).
+    """
+    if pd.api.types.is_datetime64_any_dtype(values) and getattr(values.dt, "tz", None) is None:
+        return values.to_numpy(dtype="datetime64[us]")
+    if pd.api.types.is_numeric_dtype(values) and not pd.api.types.is_bool_dtype(values):
+        arr = np.ascontiguousarray(values.to_numpy(dtype="<f8", na_value=np.nan))
+        return {"dtype": "f8", "bdata": base64.b64encode(arr.tobytes()).decode("ascii")}
+    return values.astype(object).where(values.notna(), None).tolist()
+
+
+def build_chart_spec(df: pd.DataFrame, insight: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+    """
+    Returns a {"data", "layout"} figure dict for line / bar insights,
+    or None when the insight does not describe a chart of this data.
+    """
+    vt = insight.get("visualization_type")
+    x_col = insight.get("x_column")
+    y_col = insight.get("y_column")
+
+    if df.empty or vt not in ("line", "bar") or x_col not in df.columns or y_col not in df.columns:
+        return None
+
+    trace = {
+        "type": "scatter" if vt == "line" else "bar",
+        "x": _axis_values(df[x_col]),
+        "y": _axis_values(df[y_col]),
+        "name": str(y_col),
+        "hovertemplate": f"{x_col}=%{{x}}<br>{y_col}=%{{y}}<extra></extra>",
+    }
+    if vt == "line":
+        trace["mode"] = "lines"
+        trace["line"] = {"color": TRACE_COLOR}
+    else:
+        trace["marker"] = {"color": TRACE_COLOR}
+
+    layout = {
+        **DARK_LAYOUT,
+        "xaxis": {**AXIS_STYLE, "title": {"text": str(x_col)}},
+        "yaxis": {**AXIS_STYLE, "title": {"text": str(y_col)}},
+    }
+    return {"data": [trace], "layout": layout}
+
+
+def chart_spec_json(df: pd.DataFrame, insight: Dict[str, Any]) -> Optional[str]:
+    """build_chart_spec encoded as a JSON string (the plot_json response field)."""
+    spec = build_chart_spec(df, insight)
+    return dumps_json(spec).decode() if spec else None
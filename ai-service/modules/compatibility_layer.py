@@ -7,9 +7,14 @@ Maintains separation of concerns by isolating format conversion logic.
 
 import json
 from typing import Dict, Any, List, Optional
+import orjson
 import pandas as pd
 import numpy as np
 from datetime import datetime, date
+from decimal import Decimal
+
+from modules.db.columnar import ColumnarResult
+from modules import tracing
 
 
 class LegacyResponseFormatter:
@@ -35,7 +40,9 @@ class LegacyResponseFormatter:
         sql: Optional[str] = None,
         insight: Optional[Dict[str, Any]] = None,
         plot_json: Optional[str] = None,
-        response_type: str = "data"
+        response_type: str = "data",
+        pagination: Optional[Dict[str, Any]] = None,
+        downsampling: Optional[Dict[str, Any]] = None
     ) -> Dict[str, str]:
         """
         Converts ai-services-3 response to ai-service-2 format.
@@ -48,6 +55,8 @@ class LegacyResponseFormatter:
             insight: Analysis insight dict
             plot_json: Plotly JSON string
             response_type: Response type from ai-services-3
+            pagination: Continuation links when the rows were capped at MAX_INLINE_ROWS
+            downsampling: Downsampling metadata when the rows were reduced for charting
             
         Returns:
             Dict with single "content" key containing JSON string
@@ -138,6 +147,13 @@ class LegacyResponseFormatter:
                 "extras": {}
             }
         
+        # Tell the client when "data" is not the complete result
+        if response_payload["data"]:
+            if pagination:
+                response_payload["extras"]["pagination"] = pagination
+            if downsampling:
+                response_payload["extras"]["downsampling"] = downsampling
+
         # Convert to JSON string (ai-service-2 expects content as JSON string)
         return {
             "content": json.dumps(response_payload, cls=NumpyEncoder)
@@ -160,9 +176,12 @@ class NumpyEncoder(json.JSONEncoder):
         return super().default(obj)
 
 
+@tracing.traced("encode_rows")
 def sanitize_dataframe_for_json(df: pd.DataFrame) -> List[Dict[str, Any]]:
     """
     Converts DataFrame to list of dicts with proper JSON serialization.
+    inf / NaN / missing values become 0. Conversion is done column by column
+    on NumPy arrays instead of through DataFrame.replace / fillna.
     
     Args:
         df: Pandas DataFrame
@@ -173,8 +192,30 @@ def sanitize_dataframe_for_json(df: pd.DataFrame) -> List[Dict[str, Any]]:
     if df.empty:
         return []
     
-    # Replace inf and NaN values
-    df = df.replace([np.inf, -np.inf], np.nan).fillna(0)
-    
-    # Convert to records
-    return df.to_dict('records')
+    return ColumnarResult.from_dataframe(df).to_records()
+
+
+def _orjson_default(obj):
+    if isinstance(obj, (pd.Timestamp, datetime, date)):
+        return obj.isoformat()
+    if isinstance(obj, np.generic):
+        return obj.item()
+    if isinstance(obj, Decimal):
+        return float(obj)
+    if isinstance(obj, np.ndarray):
+        return obj.tolist()
+    if pd.isna(obj):
+        return None
+    raise TypeError(f"Object of type {type(obj).__name__} is not JSON serializable")
+
+
+def dumps_json(obj: Any) -> bytes:
+    """
+    Fast JSON encoding (orjson) that understands NumPy arrays and scalars,
+    pandas timestamps and ColumnarResult.to_wire() payloads.
+    """
+    return orjson.dumps(
+        obj,
+        default=_orjson_default,
+        option=orjson.OPT_SERIALIZE_NUMPY | orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS,
+    )
@@ -1,4 +1,12 @@
 from .database_base import Database
 from .postgres_db import PostgresDatabase
+from .sqlite_db import SQLiteDatabase
+from .columnar import ColumnarResult
+from .pool import ThreadSafeConnectionPool, PoolTimeoutError
+from .factory import create_database, get_database, close_database
 
-__all__ = ["Database", "PostgresDatabase"]
+__all__ = [
+    "Database", "PostgresDatabase", "SQLiteDatabase", "ColumnarResult",
+    "ThreadSafeConnectionPool", "PoolTimeoutError",
+    "create_database", "get_database", "close_database",
+]
@@ -0,0 +1,167 @@
+"""
+Columnar result container.
+
+Stores a query result as one NumPy array per column instead of a DataFrame of
+Python objects, which keeps cached results compact and cheap to size.
+"""
+
+import math
+import numbers
+from datetime import date, datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+from typing import Any, Dict, List, Optional, Sequence
+
+
+class ColumnarResult:
+    """
+    Immutable column-oriented query result.
+    """
+
+    __slots__ = ("columns", "arrays", "nbytes")
+
+    def __init__(self, columns: List[str], arrays: List[np.ndarray]):
+        self.columns = list(columns)
+        self.arrays = arrays
+        self.nbytes = sum(_array_nbytes(a) for a in arrays)
+
+    def __len__(self) -> int:
+        return len(self.arrays[0]) if self.arrays else 0
+
+    @classmethod
+    def from_dataframe(cls, df: pd.DataFrame) -> "ColumnarResult":
+        arrays = []
+        for col in df.columns:
+            values = df[col].to_numpy()
+            if values.dtype == object and len(values) and all(isinstance(v, str) for v in values):
+                # Fixed-width unicode is far smaller than an array of str objects
+                values = values.astype(str)
+            arrays.append(values)
+        return cls([str(c) for c in df.columns], arrays)
+
+    @classmethod
+    def from_rows(cls, columns: Sequence[str], rows: Sequence[tuple]) -> "ColumnarResult":
+        """
+        Builds a result straight from DB-API rows (e.g. cursor.fetchall()),
+        without going through pandas.
+        """
+        if rows:
+            arrays = [_column_array(values) for values in zip(*rows)]
+        else:
+            arrays = [np.array([], dtype=object) for _ in columns]
+        return cls([str(c) for c in columns], arrays)
+
+    @classmethod
+    def from_cursor(cls, cursor) -> "ColumnarResult":
+        """Fetches every remaining row of an executed DB-API cursor."""
+        columns = [d[0] for d in cursor.description or ()]
+        return cls.from_rows(columns, cursor.fetchall())
+
+    def head(self, n: int) -> "ColumnarResult":
+        """First `n` rows (array views, no copy)."""
+        if n >= len(self):
+            return self
+        return ColumnarResult(self.columns, [a[:n] for a in self.arrays])
+
+    def json_columns(self) -> List[Any]:
+        """
+        Column values made JSON-safe with the same rules as
+        sanitize_dataframe_for_json (NaN / inf / missing -> 0).
+        Numeric columns stay NumPy arrays so orjson can serialize them natively.
+        """
+        return [_json_column(arr) for arr in self.arrays]
+
+    def to_records(self, values: Optional[List[Any]] = None) -> List[Dict[str, Any]]:
+        """
+        JSON-safe row dicts (the classic "rows" response shape).
+        `values` may pass json_columns() computed ahead of time.
+        """
+        values = self.json_columns() if values is None else values
+        cols = [c.tolist() if isinstance(c, np.ndarray) else c for c in values]
+        return [dict(zip(self.columns, row)) for row in zip(*cols)]
+
+    def to_wire(self, values: Optional[List[Any]] = None) -> Dict[str, Any]:
+        """Column-oriented response shape: one value list per column."""
+        values = self.json_columns() if values is None else values
+        return {"format": "columnar", "columns": self.columns, "values": values, "row_count": len(self)}
+
+    def to_dataframe(self) -> pd.DataFrame:
+        # Copy so callers can never mutate a shared (cached) result
+        data = {}
+        for col, arr in zip(self.columns, self.arrays):
+            data[col] = arr.astype(object) if arr.dtype.kind == "U" else arr.copy()
+        return pd.DataFrame(data, columns=self.columns)
+
+
+def _array_nbytes(arr: np.ndarray) -> int:
+    if arr.dtype != object:
+        return int(arr.nbytes)
+    # Object arrays hold pointers; estimate the referenced objects from a sample
+    sample = arr[:100]
+    per_item = sum(len(str(v)) + 49 for v in sample) / len(sample) if len(sample) else 0
+    return int(arr.nbytes + per_item * len(arr))
+
+
+def _column_array(values: tuple) -> np.ndarray:
+    """
+    Picks a compact dtype for one column of DB-API values, using the first
+    non-NULL value the way pandas' coerce_float does for read_sql_query.
+    """
+    sample = next((v for v in values if v is not None), None)
+    has_null = sample is None or any(v is None for v in values)
+
+    if isinstance(sample, bool):
+        return np.array(values, dtype=object if has_null else bool)
+    if isinstance(sample, numbers.Integral) and not has_null:
+        try:
+            return np.array(values, dtype=np.int64)
+        except (TypeError, ValueError, OverflowError):
+            return np.array(values, dtype=object)
+    if isinstance(sample, (numbers.Real, Decimal)):
+        try:
+            # NULL becomes NaN, Decimal becomes float
+            return np.array(values, dtype=np.float64)
+        except (TypeError, ValueError):
+            return np.array(values, dtype=object)
+    if isinstance(sample, str) and not has_null:
+        return np.array(values, dtype=str)
+    return np.array(values, dtype=object)
+
+
+def _json_column(arr: np.ndarray):
+    kind = arr.dtype.kind
+    if kind == "f":
+        return np.where(np.isfinite(arr), arr, 0.0)
+    if kind in "iub":
+        return arr
+    if kind == "M":
+        if np.isnat(arr).any():
+            return [0 if v is None else v for v in arr.astype("datetime64[us]").tolist()]
+        # Microsecond precision so tolist() yields datetime objects, not integers
+        return arr.astype("datetime64[us]")
+    if kind == "U":
+        return arr.tolist()
+    return [_json_value(v) for v in arr]
+
+
+def _json_value(v):
+    if v is None or v is pd.NaT:
+        return 0
+    if isinstance(v, float):
+        return v if math.isfinite(v) else 0
+    if isinstance(v, np.generic):
+        return _json_value(v.item())
+    if isinstance(v, Decimal):
+        return float(v) if v.is_finite() else 0
+    if isinstance(v, (datetime, date)):
+        return v
+    if isinstance(v, (str, int)):
+        return v
+    try:
+        if pd.isna(v):
+            return 0
+    except (TypeError, ValueError):
+        pass
+    return v
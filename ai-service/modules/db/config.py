@@ -0,0 +1,36 @@
+"""
+Database configuration, read once from the service's .env file.
+"""
+
+import os
+from dotenv import load_dotenv
+
+# Paths
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+ENV_PATH = os.path.join(BASE_DIR, ".env")
+
+# Load environment variables from the root .env file
+if os.path.exists(ENV_PATH):
+    load_dotenv(ENV_PATH)
+else:
+    load_dotenv() # Fallback
+
+# "postgresql" or "sqlite"
+DB_TYPE = os.getenv("DB_TYPE", "postgresql").lower()
+DB_HOST = os.getenv("DB_HOST", "localhost")
+DB_PORT = os.getenv("DB_PORT", "5432")
+DB_NAME = os.getenv("DB_NAME", "chatbot_db")
+DB_USER = os.getenv("DB_USER", "postgres")
+DB_PASSWORD = os.getenv("DB_PASSWORD", "rishav123")
+
+# Rows per round trip when streaming results through a (server-side) cursor
+DB_FETCH_SIZE = int(os.getenv("DB_FETCH_SIZE", "2000"))
+
+# SQLite
+SQLITE_DB_PATH = os.path.join(BASE_DIR, os.getenv("SQLITE_DB_PATH", "data/data.db"))
+SQLITE_JOURNAL_MODE = os.getenv("SQLITE_JOURNAL_MODE", "WAL")
+SQLITE_SYNCHRONOUS = os.getenv("SQLITE_SYNCHRONOUS", "NORMAL")
+# Negative values are KiB (SQLite convention): -65536 = 64 MB page cache per connection
+SQLITE_CACHE_SIZE = int(os.getenv("SQLITE_CACHE_SIZE", "-65536"))
+SQLITE_MMAP_SIZE = int(os.getenv("SQLITE_MMAP_SIZE", str(256 * 1024 * 1024)))
+SQLITE_BUSY_TIMEOUT_MS = int(os.getenv("SQLITE_BUSY_TIMEOUT_MS", "5000"))
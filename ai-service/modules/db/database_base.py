@@ -1,16 +1,57 @@
 from abc import ABC, abstractmethod
 import pandas as pd
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
+from .columnar import ColumnarResult
+from .config import DB_FETCH_SIZE
+from ..cancellation import raise_if_cancelled
 
 class Database(ABC):
+    # SQL dialect name, matches the DB_TYPE setting ("postgresql" / "sqlite")
+    dialect: str = ""
+
+    @abstractmethod
+    def get_connection(self):
+        pass
+
+    @abstractmethod
+    def release_connection(self, conn):
+        pass
+
     @abstractmethod
     def run_select_query(self, sql: str, params: Optional[tuple] = None) -> pd.DataFrame:
         pass
 
+    def run_select_columnar(self, sql: str, params: Optional[tuple] = None) -> ColumnarResult:
+        """Runs a SELECT and returns its rows as NumPy columns."""
+        return ColumnarResult.from_dataframe(self.run_select_query(sql, params))
+
+    def stream_select(self, sql: str, params: Optional[tuple] = None, fetch_size: int = DB_FETCH_SIZE,
+                      cancel_event=None, dedicated: bool = False) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Yields (columns, rows) batches of at most `fetch_size` rows, so callers
+        can stop early or forward rows without materializing the whole result.
+        Backends override this with a real cursor; close() the generator to stop.
+        Setting `cancel_event` aborts the running statement (OperationCancelled).
+        `dedicated` asks for a connection not bound to the calling thread, for
+        generators resumed elsewhere (streaming responses).
+        """
+        raise_if_cancelled(cancel_event)
+        result = self.run_select_columnar(sql, params)
+        rows = list(zip(*(a.tolist() for a in result.arrays)))
+        for start in range(0, max(len(rows), 1), fetch_size):
+            raise_if_cancelled(cancel_event)
+            yield result.columns, rows[start:start + fetch_size]
+
     @abstractmethod
     def execute_query(self, sql: str, params: Optional[tuple] = None) -> int:
         pass
 
+    def initialize_schema(self):
+        """Creates missing tables. Backends whose schema is managed externally do nothing."""
+
+    def pool_stats(self) -> dict:
+        return {}
+
     @abstractmethod
     def close(self):
         pass
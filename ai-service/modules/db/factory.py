@@ -0,0 +1,51 @@
+"""
+Backend factory.
+
+Builds the Database implementation selected by DB_TYPE and keeps one shared
+instance for the process.
+"""
+
+import threading
+from typing import Optional
+
+from .database_base import Database
+from . import config
+
+_database: Optional[Database] = None
+_lock = threading.Lock()
+
+
+def create_database(db_type: Optional[str] = None) -> Database:
+    """
+    Builds a new backend for `db_type` (defaults to the DB_TYPE setting).
+
+    Raises:
+        ValueError: for an unknown database type
+    """
+    db_type = (db_type or config.DB_TYPE).lower()
+    if db_type == "postgresql":
+        from .postgres_db import PostgresDatabase
+        return PostgresDatabase(config.DB_HOST, config.DB_PORT, config.DB_NAME, config.DB_USER, config.DB_PASSWORD)
+    if db_type == "sqlite":
+        from .sqlite_db import SQLiteDatabase
+        return SQLiteDatabase(config.SQLITE_DB_PATH)
+    raise ValueError(f"Unsupported DB_TYPE: {db_type!r} (expected 'postgresql' or 'sqlite')")
+
+
+def get_database() -> Database:
+    """Returns the shared backend, creating it on first use."""
+    global _database
+    if _database is None:
+        with _lock:
+            if _database is None:
+                _database = create_database()
+    return _database
+
+
+def close_database():
+    """Closes the shared backend; the next get_database() call reopens it."""
+    global _database
+    with _lock:
+        if _database is not None:
+            _database.close()
+            _database = None
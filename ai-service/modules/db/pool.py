@@ -0,0 +1,293 @@
+"""
+Thread-safe connection pool.
+
+Replaces psycopg2's SimpleConnectionPool (not thread-safe, raises on
+exhaustion) with a pool that:
+- is safe to share between FastAPI threadpool workers,
+- blocks up to a timeout when all connections are busy instead of raising,
+- validates connections that sat idle before handing them out,
+- keeps per-connection metadata (e.g. the statement_timeout currently set),
+- reports utilization metrics.
+"""
+
+import os
+import time
+import threading
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Optional
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+DB_POOL_MIN = int(os.getenv("DB_POOL_MIN", "1"))
+DB_POOL_MAX = int(os.getenv("DB_POOL_MAX", "10"))
+DB_POOL_TIMEOUT = float(os.getenv("DB_POOL_TIMEOUT", "10"))
+DB_POOL_VALIDATE_AFTER = float(os.getenv("DB_POOL_VALIDATE_AFTER", "30"))
+DB_STATEMENT_TIMEOUT_MS = int(os.getenv("DB_STATEMENT_TIMEOUT_MS", "30000"))
+
+
+class PoolTimeoutError(Exception):
+    """Raised when no connection becomes available within the acquire timeout."""
+
+
+class ThreadSafeConnectionPool:
+    """
+    Generic blocking pool. Driver specifics are injected as callables:
+
+    Args:
+        connect: creates a new connection
+        validate: returns True if a connection is still usable
+        reset: cleans a connection before it goes back to the pool
+        close: closes a connection
+    """
+
+    def __init__(self, connect: Callable[[], Any], minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                 acquire_timeout: float = DB_POOL_TIMEOUT, validate_after: float = DB_POOL_VALIDATE_AFTER,
+                 validate: Optional[Callable[[Any], bool]] = None, reset: Optional[Callable[[Any], None]] = None,
+                 close: Optional[Callable[[Any], None]] = None, name: str = "pool"):
+        if maxconn < 1 or minconn < 0 or minconn > maxconn:
+            raise ValueError(f"Invalid pool bounds: min={minconn}, max={maxconn}")
+
+        self.name = name
+        self.minconn = minconn
+        self.maxconn = maxconn
+        self.acquire_timeout = acquire_timeout
+        self.validate_after = validate_after
+        self._connect = connect
+        self._validate = validate or (lambda conn: True)
+        self._reset = reset or (lambda conn: None)
+        self._close = close or (lambda conn: conn.close())
+
+        self._cond = threading.Condition()
+        self._idle = deque()  # (conn, last_used_monotonic)
+        self._in_use: Dict[int, Any] = {}
+        self._meta: Dict[int, Dict[str, Any]] = {}
+        self._size = 0
+        self._waiting = 0
+        self._closed = False
+        self._counters = {
+            "acquires": 0,
+            "timeouts": 0,
+            "created": 0,
+            "discarded": 0,
+            "validation_failures": 0,
+            "total_wait_seconds": 0.0,
+            "max_wait_seconds": 0.0,
+        }
+
+        for _ in range(minconn):
+            conn = self._new_connection()
+            with self._cond:
+                self._size += 1
+                self._idle.append((conn, time.monotonic()))
+
+    def _new_connection(self):
+        conn = self._connect()
+        self._meta[id(conn)] = {}
+        with self._cond:
+            self._counters["created"] += 1
+        return conn
+
+    def _discard(self, conn):
+        """Closes a connection and frees its slot. Caller must NOT hold the lock."""
+        try:
+            self._close(conn)
+        except Exception:
+            pass
+        with self._cond:
+            self._meta.pop(id(conn), None)
+            self._size -= 1
+            self._counters["discarded"] += 1
+            self._cond.notify()
+
+    def getconn(self, timeout: Optional[float] = None):
+        """
+        Returns a validated connection, waiting up to `timeout` seconds
+        (default: acquire_timeout) for one to become free.
+
+        Raises:
+            PoolTimeoutError: if the pool stays exhausted for the whole timeout
+        """
+        timeout = self.acquire_timeout if timeout is None else timeout
+        start = time.monotonic()
+        deadline = start + timeout
+
+        while True:
+            conn, last_used, create = None, None, False
+            with self._cond:
+                while True:
+                    if self._closed:
+                        raise Exception(f"Connection pool '{self.name}' is closed")
+                    if self._idle:
+                        conn, last_used = self._idle.pop()
+                        break
+                    if self._size < self.maxconn:
+                        self._size += 1
+                        create = True
+                        break
+                    remaining = deadline - time.monotonic()
+                    if remaining <= 0:
+                        self._counters["timeouts"] += 1
+                        raise PoolTimeoutError(
+                            f"No connection available in pool '{self.name}' after {timeout:.1f}s "
+                            f"({self._size}/{self.maxconn} in use)"
+                        )
+                    self._waiting += 1
+                    try:
+                        self._cond.wait(remaining)
+                    finally:
+                        self._waiting -= 1
+
+            if create:
+                try:
+                    conn = self._new_connection()
+                except Exception:
+                    with self._cond:
+                        self._size -= 1
+                        self._cond.notify()
+                    raise
+            elif time.monotonic() - last_used > self.validate_after or not self._is_open(conn):
+                # Stale connections are checked before use; broken ones are replaced
+                if not self._safe_validate(conn):
+                    with self._cond:
+                        self._counters["validation_failures"] += 1
+                    self._discard(conn)
+                    continue
+
+            waited = time.monotonic() - start
+            with self._cond:
+                self._in_use[id(conn)] = conn
+                self._counters["acquires"] += 1
+                self._counters["total_wait_seconds"] += waited
+                self._counters["max_wait_seconds"] = max(self._counters["max_wait_seconds"], waited)
+            return conn
+
+    @staticmethod
+    def _is_open(conn) -> bool:
+        return not getattr(conn, "closed", False)
+
+    def _safe_validate(self, conn) -> bool:
+        try:
+            return self._is_open(conn) and self._validate(conn)
+        except Exception:
+            return False
+
+    def putconn(self, conn, discard: bool = False):
+        """Returns a connection to the pool (or closes it if broken / discard=True)."""
+        with self._cond:
+            if self._in_use.pop(id(conn), None) is None:
+                raise ValueError(f"Connection not owned by pool '{self.name}'")
+
+        if not discard and self._is_open(conn) and not self._closed:
+            try:
+                self._reset(conn)
+            except Exception:
+                discard = True
+        else:
+            discard = True
+
+        if discard:
+            self._discard(conn)
+            return
+
+        with self._cond:
+            self._idle.append((conn, time.monotonic()))
+            self._cond.notify()
+
+    @contextmanager
+    def connection(self, timeout: Optional[float] = None):
+        """Context manager form of getconn/putconn."""
+        conn = self.getconn(timeout)
+        broken = False
+        try:
+            yield conn
+        except Exception:
+            broken = not self._is_open(conn)
+            raise
+        finally:
+            self.putconn(conn, discard=broken)
+
+    def meta(self, conn) -> Dict[str, Any]:
+        """Per-connection metadata dict (e.g. current statement_timeout)."""
+        return self._meta.setdefault(id(conn), {})
+
+    def stats(self) -> Dict[str, Any]:
+        with self._cond:
+            in_use = len(self._in_use)
+            acquires = self._counters["acquires"]
+            return {
+                "name": self.name,
+                "min": self.minconn,
+                "max": self.maxconn,
+                "size": self._size,
+                "in_use": in_use,
+                "idle": len(self._idle),
+                "waiting": self._waiting,
+                "utilization": round(in_use / self.maxconn, 4),
+                "avg_wait_seconds": round(self._counters["total_wait_seconds"] / acquires, 6) if acquires else 0.0,
+                **self._counters,
+            }
+
+    def closeall(self):
+        with self._cond:
+            self._closed = True
+            idle = [conn for conn, _ in self._idle]
+            self._idle.clear()
+            self._cond.notify_all()
+        for conn in idle:
+            self._discard(conn)
+
+
+# --- PostgreSQL specifics ---
+
+def _pg_validate(conn) -> bool:
+    with conn.cursor() as cur:
+        cur.execute("SELECT 1")
+        cur.fetchone()
+    conn.rollback()
+    return True
+
+
+def _pg_reset(conn):
+    from psycopg2 import extensions
+
+    # Never hand out a connection with an open or aborted transaction
+    if conn.get_transaction_status() != extensions.TRANSACTION_STATUS_IDLE:
+        conn.rollback()
+
+
+def create_postgres_pool(host, port, db_name, user, password,
+                         minconn: int = DB_POOL_MIN, maxconn: int = DB_POOL_MAX,
+                         acquire_timeout: float = DB_POOL_TIMEOUT) -> ThreadSafeConnectionPool:
+    """
+    Builds the shared PostgreSQL pool used by db_manager and PostgresDatabase.
+    """
+    import psycopg2
+
+    def connect():
+        return psycopg2.connect(host=host, port=port, database=db_name, user=user, password=password)
+
+    return ThreadSafeConnectionPool(
+        connect,
+        minconn=minconn,
+        maxconn=maxconn,
+        acquire_timeout=acquire_timeout,
+        validate=_pg_validate,
+        reset=_pg_reset,
+        name=f"{db_name}@{host}",
+    )
+
+
+def apply_statement_timeout(pool: ThreadSafeConnectionPool, conn, timeout_ms: int = DB_STATEMENT_TIMEOUT_MS):
+    """
+    Sets statement_timeout on a pooled PostgreSQL connection, skipping the
+    round trip when the connection already has that value.
+    """
+    meta = pool.meta(conn)
+    if meta.get("statement_timeout_ms") == timeout_ms:
+        return
+    with conn.cursor() as cur:
+        cur.execute("SET statement_timeout = %s", (int(timeout_ms),))
+    conn.commit()
+    meta["statement_timeout_ms"] = timeout_ms
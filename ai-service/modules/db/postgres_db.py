@@ -1,34 +1,41 @@
+import uuid
 import pandas as pd
-from typing import Optional
+from typing import Iterator, List, Optional, Tuple
 from .database_base import Database
+from .columnar import ColumnarResult
+from .config import DB_FETCH_SIZE
+from .pool import create_postgres_pool, apply_statement_timeout, DB_STATEMENT_TIMEOUT_MS
+from ..cancellation import OperationCancelled, on_cancel, raise_if_cancelled
 
 class PostgresDatabase(Database):
-    def __init__(self, host, port, db_name, user, password):
+    dialect = "postgresql"
+
+    def __init__(self, host, port, db_name, user, password, statement_timeout_ms: int = DB_STATEMENT_TIMEOUT_MS):
         self.host = host
         self.port = port
         self.db_name = db_name
         self.user = user
         self.password = password
+        self.statement_timeout_ms = statement_timeout_ms
         self._pool = None
         self._init_pool()
 
     def _init_pool(self):
         try:
-            from psycopg2 import pool
-            self._pool = pool.SimpleConnectionPool(
-                1, 10,
-                host=self.host,
-                port=self.port,
-                database=self.db_name,
-                user=self.user,
-                password=self.password
-            )
+            self._pool = create_postgres_pool(self.host, self.port, self.db_name, self.user, self.password)
             print(f"✅ PostgreSQL connection pool created: {self.db_name}@{self.host}")
         except Exception as e:
             raise Exception(f"PostgreSQL pool initialization failed: {e}")
 
     def get_connection(self):
-        return self._pool.getconn()
+        conn = self._pool.getconn()
+        try:
+            if self.statement_timeout_ms > 0:
+                apply_statement_timeout(self._pool, conn, self.statement_timeout_ms)
+        except Exception:
+            self._pool.putconn(conn, discard=True)
+            raise
+        return conn
 
     def release_connection(self, conn):
         self._pool.putconn(conn)
@@ -45,6 +52,64 @@ class PostgresDatabase(Database):
             if conn:
                 self.release_connection(conn)
 
+    def run_select_columnar(self, sql: str, params: Optional[tuple] = None) -> ColumnarResult:
+        conn = None
+        try:
+            conn = self.get_connection()
+            with conn.cursor() as cursor:
+                cursor.execute(sql, params)
+                return ColumnarResult.from_cursor(cursor)
+        except Exception as e:
+            raise Exception(f"PostgreSQL query failed: {e}")
+        finally:
+            if conn:
+                self.release_connection(conn)
+
+    def stream_select(self, sql: str, params: Optional[tuple] = None, fetch_size: int = DB_FETCH_SIZE,
+                      cancel_event=None, dedicated: bool = False) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Streams a SELECT through a named (server-side) cursor: PostgreSQL keeps
+        the result and only `fetch_size` rows cross the wire per round trip.
+        The pooled connection is held until the generator is exhausted or closed;
+        pooled connections are never thread-bound, so `dedicated` changes nothing.
+
+        Setting `cancel_event` sends a cancel request for the running statement
+        (connection.cancel(), the protocol form of pg_cancel_backend); the
+        generator then raises OperationCancelled and releases the connection.
+        """
+        raise_if_cancelled(cancel_event)
+        conn = self.get_connection()
+        cursor = None
+        try:
+            with on_cancel(cancel_event, conn.cancel):
+                cursor = conn.cursor(name=f"ai_stream_{uuid.uuid4().hex}")
+                cursor.itersize = fetch_size
+                cursor.execute(sql, params)
+                first = True
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    raise_if_cancelled(cancel_event)
+                    # The first batch is always yielded so empty results still carry column names
+                    if rows or first:
+                        yield [d[0] for d in cursor.description or ()], rows
+                    first = False
+                    if len(rows) < fetch_size:
+                        break
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Query cancelled") from e
+            raise Exception(f"PostgreSQL query failed: {e}")
+        finally:
+            if cursor is not None:
+                try:
+                    cursor.close()
+                except Exception:
+                    pass
+            # Ends the cursor's transaction before the connection goes back to the pool
+            self.release_connection(conn)
+
     def execute_query(self, sql: str, params: Optional[tuple] = None) -> int:
         conn = None
         try:
@@ -63,6 +128,9 @@ class PostgresDatabase(Database):
             if conn:
                 self.release_connection(conn)
 
+    def pool_stats(self) -> dict:
+        return self._pool.stats() if self._pool else {}
+
     def close(self):
         if self._pool:
             self._pool.closeall()
@@ -0,0 +1,171 @@
+import os
+import sqlite3
+import threading
+import pandas as pd
+from typing import Iterator, List, Optional, Tuple
+from .database_base import Database
+from .columnar import ColumnarResult
+from ..cancellation import OperationCancelled, on_cancel, raise_if_cancelled
+from .config import (
+    DB_FETCH_SIZE,
+    SQLITE_JOURNAL_MODE, SQLITE_SYNCHRONOUS, SQLITE_CACHE_SIZE, SQLITE_MMAP_SIZE, SQLITE_BUSY_TIMEOUT_MS,
+)
+
+SCHEMA = (
+    """
+    CREATE TABLE IF NOT EXISTS meter_users (
+        username TEXT PRIMARY KEY,
+        meter_id INTEGER
+    )
+    """,
+    """
+    CREATE TABLE IF NOT EXISTS meter_loads (
+        meter_id INTEGER,
+        date_time TEXT,
+        forecasted_load REAL
+    )
+    """,
+)
+
+
+class SQLiteDatabase(Database):
+    """
+    SQLite backend with one persistent connection per thread.
+
+    Connections are opened lazily the first time a thread queries, tuned with
+    WAL journaling (readers never block the writer) and the pragmas from
+    modules.db.config, and reused for every later query on that thread.
+    """
+
+    dialect = "sqlite"
+
+    def __init__(self, path: str, journal_mode: str = SQLITE_JOURNAL_MODE, synchronous: str = SQLITE_SYNCHRONOUS,
+                 cache_size: int = SQLITE_CACHE_SIZE, mmap_size: int = SQLITE_MMAP_SIZE,
+                 busy_timeout_ms: int = SQLITE_BUSY_TIMEOUT_MS):
+        self.path = path
+        self.journal_mode = journal_mode
+        self.synchronous = synchronous
+        self.cache_size = cache_size
+        self.mmap_size = mmap_size
+        self.busy_timeout_ms = busy_timeout_ms
+        self._local = threading.local()
+        self._connections = {}
+        self._lock = threading.Lock()
+
+        directory = os.path.dirname(path)
+        if directory:
+            os.makedirs(directory, exist_ok=True)
+
+    def _connect(self) -> sqlite3.Connection:
+        # check_same_thread=False only so close() can run from the shutdown thread;
+        # each connection is otherwise used by the thread that opened it
+        conn = sqlite3.connect(self.path, timeout=self.busy_timeout_ms / 1000, check_same_thread=False)
+        conn.execute(f"PRAGMA journal_mode={self.journal_mode}")
+        conn.execute(f"PRAGMA synchronous={self.synchronous}")
+        conn.execute(f"PRAGMA cache_size={int(self.cache_size)}")
+        conn.execute(f"PRAGMA mmap_size={int(self.mmap_size)}")
+        conn.execute("PRAGMA temp_store=MEMORY")
+        conn.execute(f"PRAGMA busy_timeout={int(self.busy_timeout_ms)}")
+        return conn
+
+    def get_connection(self) -> sqlite3.Connection:
+        """Returns this thread's connection, opening it on first use."""
+        conn = getattr(self._local, "conn", None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            with self._lock:
+                self._connections[threading.get_ident()] = conn
+        return conn
+
+    def release_connection(self, conn):
+        """Per-thread connections stay open; kept for interface parity with PostgresDatabase."""
+
+    def initialize_schema(self):
+        conn = self.get_connection()
+        for statement in SCHEMA:
+            conn.execute(statement)
+        conn.commit()
+
+    def run_select_query(self, sql: str, params: Optional[tuple] = None) -> pd.DataFrame:
+        try:
+            return pd.read_sql_query(sql, self.get_connection(), params=params)
+        except Exception as e:
+            raise Exception(f"SQLite query failed: {e}")
+
+    def run_select_columnar(self, sql: str, params: Optional[tuple] = None) -> ColumnarResult:
+        cursor = self.get_connection().cursor()
+        try:
+            cursor.execute(sql, params or ())
+            return ColumnarResult.from_cursor(cursor)
+        except Exception as e:
+            raise Exception(f"SQLite query failed: {e}")
+        finally:
+            cursor.close()
+
+    def stream_select(self, sql: str, params: Optional[tuple] = None, fetch_size: int = DB_FETCH_SIZE,
+                      cancel_event=None, dedicated: bool = False) -> Iterator[Tuple[List[str], List[tuple]]]:
+        """
+        Streams a SELECT with fetchmany on this thread's connection. Pass
+        `dedicated=True` when the generator may be resumed on another thread
+        (a streaming response): it then runs on its own connection, closed
+        when the generator finishes.
+        Setting `cancel_event` interrupts the running statement
+        (connection.interrupt()); the generator then raises OperationCancelled.
+        """
+        raise_if_cancelled(cancel_event)
+        conn = self._connect() if dedicated else self.get_connection()
+        cursor = None
+        try:
+            with on_cancel(cancel_event, conn.interrupt):
+                cursor = conn.execute(sql, params or ())
+                columns = [d[0] for d in cursor.description or ()]
+                first = True
+                while True:
+                    rows = cursor.fetchmany(fetch_size)
+                    raise_if_cancelled(cancel_event)
+                    # The first batch is always yielded so empty results still carry column names
+                    if rows or first:
+                        yield columns, rows
+                    first = False
+                    if len(rows) < fetch_size:
+                        break
+        except OperationCancelled:
+            raise
+        except Exception as e:
+            if cancel_event is not None and cancel_event.is_set():
+                raise OperationCancelled("Query cancelled") from e
+            raise Exception(f"SQLite query failed: {e}")
+        finally:
+            if cursor is not None:
+                cursor.close()
+            if dedicated:
+                conn.close()
+
+    def execute_query(self, sql: str, params: Optional[tuple] = None) -> int:
+        conn = self.get_connection()
+        try:
+            cursor = conn.cursor()
+            cursor.execute(sql, params or ())
+            conn.commit()
+            affected = cursor.rowcount
+            cursor.close()
+            return affected
+        except Exception as e:
+            conn.rollback()
+            raise Exception(f"SQLite execute failed: {e}")
+
+    def pool_stats(self) -> dict:
+        with self._lock:
+            return {"name": self.path, "connections": len(self._connections), "journal_mode": self.journal_mode}
+
+    def close(self):
+        with self._lock:
+            connections = list(self._connections.values())
+            self._connections.clear()
+        for conn in connections:
+            try:
+                conn.close()
+            except Exception:
+                pass
+        self._local = threading.local()
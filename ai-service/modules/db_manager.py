@@ -1,81 +1,42 @@
 """
 Database Manager Module - PostgreSQL Support
 
-Handles database connections and queries for both PostgreSQL and SQLite.
-Uses environment variables for configuration.
+Thin facade over the configured `modules.db.Database` backend (PostgreSQL or
+SQLite, selected by DB_TYPE). Adds the SELECT result cache and keeps the
+module-level API the rest of the service imports.
 """
 
-import os
-import sqlite3
 import pandas as pd
-from typing import Optional
-from dotenv import load_dotenv
+from typing import Iterator, List, Optional, Tuple
 
-# Paths
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-ENV_PATH = os.path.join(BASE_DIR, ".env")
-
-# Load environment variables from the root .env file
-if os.path.exists(ENV_PATH):
-    load_dotenv(ENV_PATH)
-else:
-    load_dotenv() # Fallback
-
-# Configuration (Updated to match user's preferred names)
-DB_TYPE = os.getenv("DB_TYPE", "postgresql").lower()
-DB_HOST = os.getenv("DB_HOST", "localhost")
-DB_PORT = os.getenv("DB_PORT", "5432")
-DB_NAME = os.getenv("DB_NAME", "chatbot_db")
-DB_USER = os.getenv("DB_USER", "postgres")
-DB_PASSWORD = os.getenv("DB_PASSWORD", "rishav123")
-
-# SQLite Paths
-SQLITE_DB_PATH = os.path.join(BASE_DIR, os.getenv("SQLITE_DB_PATH", "data/data.db"))
-
-# PostgreSQL connection pool (lazy initialization)
-_pg_pool = None
+from modules.db import ColumnarResult, get_database, close_database
+from modules.db.config import (  # noqa: F401 - re-exported for compatibility
+    BASE_DIR, ENV_PATH, DB_TYPE, DB_HOST, DB_PORT, DB_NAME, DB_USER, DB_PASSWORD, SQLITE_DB_PATH, DB_FETCH_SIZE,
+)
+from modules.executors import db_executor, run_blocking
+from modules import tracing
+from modules.result_cache import result_cache
+from modules.result_pages import MAX_INLINE_ROWS
 
 
 def get_postgres_connection():
-    """
-    Get a PostgreSQL connection from the pool.
-    Creates the pool on first call.
-    """
-    global _pg_pool
-    
-    try:
-        import psycopg2
-        from psycopg2 import pool
-        
-        if _pg_pool is None:
-            _pg_pool = pool.SimpleConnectionPool(
-                1,  # min connections
-                10,  # max connections
-                host=DB_HOST,
-                port=DB_PORT,
-                database=DB_NAME,
-                user=DB_USER,
-                password=DB_PASSWORD
-            )
-            print(f"✅ PostgreSQL connection pool created: {DB_NAME}@{DB_HOST}")
-        
-        return _pg_pool.getconn()
-    
-    except ImportError:
-        raise Exception("psycopg2 not installed. Run: pip install psycopg2-binary")
-    except Exception as e:
-        raise Exception(f"PostgreSQL connection failed: {e}")
+    """Get a connection from the configured backend (kept for compatibility)."""
+    return get_database().get_connection()
 
 
 def release_postgres_connection(conn):
-    """Return a connection to the pool."""
-    if _pg_pool:
-        _pg_pool.putconn(conn)
+    """Return a connection obtained from get_postgres_connection."""
+    get_database().release_connection(conn)
 
 
 def get_sqlite_connection():
-    """Get a SQLite connection."""
-    return sqlite3.connect(SQLITE_DB_PATH)
+    """Get this thread's persistent SQLite connection (kept for compatibility)."""
+    return get_database().get_connection()
+
+
+def pool_stats() -> dict:
+    """Connection pool metrics of the configured backend."""
+    return get_database().pool_stats()
 
 
 def create_db_if_missing():
@@ -84,106 +45,110 @@ def create_db_if_missing():
     Only for SQLite - PostgreSQL schema should be created manually.
     """
     if DB_TYPE == "sqlite":
-        conn = sqlite3.connect(SQLITE_DB_PATH)
-        try:
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS meter_users (
-                    username TEXT PRIMARY KEY, 
-                    meter_id INTEGER
-                )
-            """)
-            conn.execute("""
-                CREATE TABLE IF NOT EXISTS meter_loads (
-                    meter_id INTEGER, 
-                    date_time TEXT, 
-                    forecasted_load REAL
-                )
-            """)
-            conn.commit()
-            print("✅ SQLite tables created/verified")
-        finally:
-            conn.close()
+        get_database().initialize_schema()
+        print("✅ SQLite tables created/verified")
     else:
         print(f"ℹ️  PostgreSQL mode ({DB_NAME}@{DB_HOST}) - ensure schema is created")
 
 
+def run_select_columnar(sql: str, params: Optional[tuple] = None) -> ColumnarResult:
+    """
+    Executes a read-only SQL query and returns NumPy columns built directly
+    from the cursor. Results are served from / stored in the result cache.
+    """
+    result = result_cache.get_result(sql, params)
+    if result is None:
+        result = get_database().run_select_columnar(sql, params)
+        result_cache.put_result(sql, params, result)
+    return result
+
+
 def run_select_query(sql: str, params: Optional[tuple] = None) -> pd.DataFrame:
     """
     Executes a read-only SQL query and returns a DataFrame.
     """
-    if DB_TYPE == "postgresql":
-        conn = None
-        try:
-            conn = get_postgres_connection()
-            # PostgreSQL allows parameterized queries in pd.read_sql_query
-            df = pd.read_sql_query(sql, conn, params=params)
-            return df
-        except Exception as e:
-            raise Exception(f"PostgreSQL query failed: {e}")
-        finally:
-            if conn:
-                release_postgres_connection(conn)
-    
-    else:  # SQLite
-        conn = None
+    return run_select_columnar(sql, params).to_dataframe()
+
+
+async def run_select_query_async(sql: str, params: Optional[tuple] = None) -> pd.DataFrame:
+    """
+    Async wrapper for run_select_query. The blocking driver call runs on the
+    bounded DB executor so the event loop stays responsive.
+    """
+    return await run_blocking(db_executor, run_select_query, sql, params)
+
+
+@tracing.traced("run_select_query")
+def run_select_limited(sql: str, params: Optional[tuple] = None, max_rows: int = MAX_INLINE_ROWS,
+                       cancel_event=None) -> Tuple[pd.DataFrame, bool]:
+    """
+    Executes a read-only SQL query but reads at most `max_rows` rows through a
+    streaming (server-side) cursor, so an unbounded query cannot exhaust memory.
+    Setting `cancel_event` aborts the query with OperationCancelled.
+
+    Returns:
+        (dataframe, truncated) - truncated is True when the query had more rows
+    """
+    # One extra row tells whether the result was cut off
+    cache_sql = f"{sql}\n-- max_rows={max_rows}"
+    result = result_cache.get_result(cache_sql, params)
+    if result is None:
+        rows, columns = [], []
+        stream = get_database().stream_select(sql, params, fetch_size=min(DB_FETCH_SIZE, max_rows + 1),
+                                              cancel_event=cancel_event)
         try:
-            conn = get_sqlite_connection()
-            df = pd.read_sql_query(sql, conn, params=params)
-            return df
-        except Exception as e:
-            raise Exception(f"SQLite query failed: {e}")
+            for columns, batch in stream:
+                rows.extend(batch)
+                if len(rows) > max_rows:
+                    break
         finally:
-            if conn:
-                conn.close()
+            stream.close()
+        result = ColumnarResult.from_rows(columns, rows[:max_rows + 1])
+        result_cache.put_result(cache_sql, params, result)
+
+    truncated = len(result) > max_rows
+    return result.head(max_rows).to_dataframe(), truncated
+
+
+async def run_select_limited_async(sql: str, params: Optional[tuple] = None, max_rows: int = MAX_INLINE_ROWS,
+                                   cancel_event=None) -> Tuple[pd.DataFrame, bool]:
+    """Async wrapper for run_select_limited (runs on the DB executor)."""
+    return await run_blocking(db_executor, run_select_limited, sql, params, max_rows, cancel_event)
+
+
+def stream_select(sql: str, params: Optional[tuple] = None,
+                  fetch_size: int = DB_FETCH_SIZE) -> Iterator[Tuple[List[str], List[tuple]]]:
+    """
+    Yields (columns, rows) batches straight from the database cursor,
+    bypassing the result cache. Used for full exports, whose generator a
+    streaming response may resume on another thread, hence the dedicated
+    connection.
+    """
+    return get_database().stream_select(sql, params, fetch_size=fetch_size, dedicated=True)
 
 
 def execute_query(sql: str, params: Optional[tuple] = None) -> int:
     """
     Executes an INSERT/UPDATE/DELETE query.
     """
-    if DB_TYPE == "postgresql":
-        conn = None
-        try:
-            conn = get_postgres_connection()
-            cursor = conn.cursor()
-            cursor.execute(sql, params)
-            conn.commit()
-            affected = cursor.rowcount
-            cursor.close()
-            return affected
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise Exception(f"PostgreSQL execute failed: {e}")
-        finally:
-            if conn:
-                release_postgres_connection(conn)
-    
-    else:  # SQLite
-        conn = None
-        try:
-            conn = get_sqlite_connection()
-            cursor = conn.cursor()
-            cursor.execute(sql, params)
-            conn.commit()
-            affected = cursor.rowcount
-            cursor.close()
-            return affected
-        except Exception as e:
-            if conn:
-                conn.rollback()
-            raise Exception(f"SQLite execute failed: {e}")
-        finally:
-            if conn:
-                conn.close()
+    affected = get_database().execute_query(sql, params)
+    result_cache.invalidate_for_write(sql)
+    return affected
+
+
+def invalidate_result_cache(table: Optional[str] = None) -> int:
+    """
+    Explicit invalidation hook for writes made outside execute_query
+    (bulk loads, ETL jobs). Drops cached results that read from `table`,
+    or every cached result when no table is given.
+    """
+    return result_cache.invalidate(table)
 
 
 def close_connections():
     """Close all database connections (cleanup on shutdown)."""
-    global _pg_pool
-    if _pg_pool:
-        _pg_pool.closeall()
-        print("✅ PostgreSQL connection pool closed")
+    close_database()
+    print(f"✅ {DB_TYPE} connections closed")
 
 
 # Initialize database structure if SQLite
@@ -192,4 +157,4 @@ try:
         create_db_if_missing()
     print(f"✅ Database initialized: {DB_TYPE.upper()}")
 except Exception as e:
-    print(f"⚠️  Database initialization warning: {e}")
\ No newline at end of file
+    print(f"⚠️  Database initialization warning: {e}")
@@ -0,0 +1,216 @@
+"""
+Downsampling Module
+
+Reduces time-series results to roughly one point per chart pixel before they
+are charted and sent to the browser.
+
+- LTTB (Largest-Triangle-Three-Buckets) keeps the visual shape of the series.
+- min/max bucketing keeps every spike (two points per bucket).
+- Optionally, the bucketing is pushed down into SQL (date_trunc / strftime)
+  so the database aggregates the full result instead of the first page.
+
+The number of output points is derived from the target chart width in pixels.
+"""
+
+import os
+from typing import Any, Dict, Optional, Tuple
+
+import numpy as np
+import pandas as pd
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+DOWNSAMPLE_ENABLED = os.getenv("DOWNSAMPLE_ENABLED", "true").lower() == "true"
+DOWNSAMPLE_METHOD = os.getenv("DOWNSAMPLE_METHOD", "lttb").lower()  # "lttb" or "minmax"
+CHART_DEFAULT_WIDTH_PX = int(os.getenv("CHART_DEFAULT_WIDTH_PX", "1200"))
+DOWNSAMPLE_POINTS_PER_PIXEL = float(os.getenv("DOWNSAMPLE_POINTS_PER_PIXEL", "1"))
+DOWNSAMPLE_SQL_PUSHDOWN = os.getenv("DOWNSAMPLE_SQL_PUSHDOWN", "false").lower() == "true"
+
+MIN_POINTS = 16
+
+# Truncation units for SQL pushdown, finest first: (name, seconds, SQLite strftime format)
+SQL_UNITS = (
+    ("minute", 60, "%Y-%m-%d %H:%M:00"),
+    ("hour", 3600, "%Y-%m-%d %H:00:00"),
+    ("day", 86400, "%Y-%m-%d"),
+    ("week", 7 * 86400, None),
+    ("month", 30 * 86400, "%Y-%m-01"),
+    ("year", 365 * 86400, "%Y-01-01"),
+)
+
+
+def target_points(width_px: Optional[int] = None) -> int:
+    """Number of points worth drawing on a chart `width_px` pixels wide."""
+    width = width_px or CHART_DEFAULT_WIDTH_PX
+    return max(MIN_POINTS, int(width * DOWNSAMPLE_POINTS_PER_PIXEL))
+
+
+def _numeric_axis(values: pd.Series) -> np.ndarray:
+    """Maps an x column to float64 (epoch seconds for dates, row position as a fallback)."""
+    if pd.api.types.is_numeric_dtype(values):
+        return values.to_numpy(dtype=np.float64, na_value=np.nan)
+    ts = values if pd.api.types.is_datetime64_any_dtype(values) else pd.to_datetime(values, errors="coerce")
+    if ts.isna().any():
+        return np.arange(len(values), dtype=np.float64)
+    if getattr(ts.dt, "tz", None) is not None:
+        ts = ts.dt.tz_convert("UTC").dt.tz_localize(None)
+    return ts.to_numpy(dtype="datetime64[ns]").astype(np.int64) / 1e9
+
+
+def lttb_indices(x: np.ndarray, y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Largest-Triangle-Three-Buckets. Returns the indices of the `n_out` points
+    to keep (always including the first and last point).
+    Each bucket is evaluated with vectorized NumPy; only the bucket loop is Python.
+    """
+    n = len(x)
+    if n_out >= n or n_out < 3:
+        return np.arange(n)
+
+    edges = np.linspace(1, n - 1, n_out - 1).astype(np.int64)
+    # Average of each bucket, used as the third triangle vertex for the previous bucket
+    sums_x = np.add.reduceat(x[1:n - 1], edges[:-1] - 1)
+    sums_y = np.add.reduceat(y[1:n - 1], edges[:-1] - 1)
+    counts = np.diff(np.append(edges[:-1], n - 1))
+    avg_x = np.append(sums_x / counts, x[-1])
+    avg_y = np.append(sums_y / counts, y[-1])
+
+    out = np.empty(n_out, dtype=np.int64)
+    out[0], out[-1] = 0, n - 1
+    a = 0
+    for i in range(n_out - 2):
+        start, end = edges[i], edges[i + 1]
+        bx, by = x[start:end], y[start:end]
+        # Twice the triangle area between the previous pick, each candidate and the next bucket's average
+        area = np.abs((x[a] - avg_x[i + 1]) * (by - y[a]) - (x[a] - bx) * (avg_y[i + 1] - y[a]))
+        a = start + int(np.argmax(area))
+        out[i + 1] = a
+    return out
+
+
+def minmax_indices(y: np.ndarray, n_out: int) -> np.ndarray:
+    """
+    Splits the series into n_out / 2 buckets and keeps the minimum and maximum
+    of each, fully vectorized (one lexsort, no Python loop).
+    """
+    n = len(y)
+    n_buckets = max(1, n_out // 2)
+    if n <= n_out:
+        return np.arange(n)
+
+    bucket = (np.arange(n) * n_buckets) // n
+    order = np.lexsort((y, bucket))
+    starts = np.flatnonzero(np.r_[True, bucket[order][1:] != bucket[order][:-1]])
+    ends = np.r_[starts[1:], n] - 1
+    return np.unique(np.concatenate([order[starts], order[ends]]))
+
+
+def downsample_dataframe(df: pd.DataFrame, x_col: str, y_col: str, width_px: Optional[int] = None,
+                         method: Optional[str] = None) -> Tuple[pd.DataFrame, Optional[Dict[str, Any]]]:
+    """
+    Downsamples a time series when it has more points than the chart can show.
+
+    Returns:
+        (dataframe, info) - info is None when the data was left untouched
+    """
+    n_out = target_points(width_px)
+    if len(df) <= n_out or x_col not in df.columns or y_col not in df.columns:
+        return df, None
+    if not pd.api.types.is_numeric_dtype(df[y_col]):
+        return df, None
+
+    method = (method or DOWNSAMPLE_METHOD).lower()
+    x = _numeric_axis(df[x_col])
+    if not np.all(np.diff(x) >= 0):
+        order = np.argsort(x, kind="stable")
+        df, x = df.iloc[order], x[order]
+    y = np.nan_to_num(df[y_col].to_numpy(dtype=np.float64, na_value=np.nan), nan=0.0)
+
+    if method == "minmax":
+        idx = minmax_indices(y, n_out)
+    else:
+        method = "lttb"
+        idx = lttb_indices(x, y, n_out)
+
+    info = {"method": method, "original_points": len(df), "returned_points": len(idx), "target_points": n_out}
+    logger.info(f"Downsampled {y_col} vs {x_col}: {len(df)} -> {len(idx)} points ({method})")
+    return df.iloc[idx].reset_index(drop=True), info
+
+
+def _quote(identifier: str) -> str:
+    return '"' + str(identifier).replace('"', '""') + '"'
+
+
+def pick_sql_unit(span_seconds: float, n_points: int, dialect: str) -> Tuple[str, int, Optional[str]]:
+    """Finest truncation unit that keeps the bucket count at or below n_points."""
+    units = [u for u in SQL_UNITS if dialect == "postgresql" or u[2]]
+    for unit in units:
+        if span_seconds / unit[1] <= n_points:
+            return unit
+    return units[-1]
+
+
+def span_sql(sql: str, x_col: str) -> str:
+    """Query returning the MIN / MAX of the x column and the row count of the full result."""
+    inner = " ".join(sql.split()).rstrip(";")
+    return f"SELECT MIN({_quote(x_col)}) AS x_min, MAX({_quote(x_col)}) AS x_max, COUNT(*) AS n FROM ({inner}) AS _src"
+
+
+def bucketed_sql(sql: str, x_col: str, y_col: str, unit: Tuple[str, int, Optional[str]], dialect: str) -> Optional[str]:
+    """
+    Wraps a time-series query so the database averages y per time bucket.
+    Returns None when the dialect cannot truncate to `unit`.
+    """
+    inner = " ".join(sql.split()).rstrip(";")
+    name, _, sqlite_format = unit
+    if dialect == "postgresql":
+        bucket = f"date_trunc('{name}', {_quote(x_col)})"
+    elif sqlite_format:
+        bucket = f"strftime('{sqlite_format}', {_quote(x_col)})"
+    else:
+        return None
+    return (
+        f"SELECT {bucket} AS {_quote(x_col)}, AVG({_quote(y_col)}) AS {_quote(y_col)} "
+        f"FROM ({inner}) AS _src GROUP BY 1 ORDER BY 1"
+    )
+
+
+def downsample_in_sql(sql: str, x_col: str, y_col: str,
+                      width_px: Optional[int] = None) -> Optional[Tuple[pd.DataFrame, Dict[str, Any]]]:
+    """
+    Re-runs a time-series query with the bucketing done by the database, over
+    the full result rather than only the rows inlined in the response.
+
+    Returns:
+        (dataframe, info), or None when pushdown does not apply and the caller
+        should downsample in memory instead
+    """
+    from modules import db_manager
+
+    n_out = target_points(width_px)
+    try:
+        span = db_manager.run_select_query(span_sql(sql, x_col))
+        if span.empty or int(span["n"].iloc[0]) <= n_out:
+            return None
+        x_min, x_max = pd.to_datetime(span["x_min"].iloc[0]), pd.to_datetime(span["x_max"].iloc[0])
+        if pd.isna(x_min) or pd.isna(x_max):
+            return None
+
+        unit = pick_sql_unit((x_max - x_min).total_seconds(), n_out, db_manager.DB_TYPE)
+        bucket_query = bucketed_sql(sql, x_col, y_col, unit, db_manager.DB_TYPE)
+        if not bucket_query:
+            return None
+        df = db_manager.run_select_query(bucket_query)
+    except Exception as e:
+        logger.warning(f"SQL downsampling failed ({e}); falling back to in-memory downsampling")
+        return None
+
+    info = {
+        "method": f"sql_{unit[0]}_avg",
+        "original_points": int(span["n"].iloc[0]),
+        "returned_points": len(df),
+        "target_points": n_out,
+    }
+    logger.info(f"Downsampled in SQL by {unit[0]}: {info['original_points']} -> {len(df)} points")
+    return df, info
@@ -0,0 +1,40 @@
+"""
+Executors Module
+
+Bounded thread pools used by the async pipeline to offload blocking work
+(database drivers, pandas/plot serialization) without stalling the event loop.
+The bounds double as backpressure: at most N blocking calls run at once and
+the rest wait in the pool queue instead of spawning unbounded threads.
+"""
+
+import os
+import asyncio
+import functools
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+
+DB_EXECUTOR_WORKERS = int(os.getenv("DB_EXECUTOR_WORKERS", "16"))
+CPU_EXECUTOR_WORKERS = int(os.getenv("CPU_EXECUTOR_WORKERS", str(min(4, os.cpu_count() or 1))))
+FLIGHT_EXECUTOR_WORKERS = int(os.getenv("FLIGHT_EXECUTOR_WORKERS", "32"))
+
+db_executor = ThreadPoolExecutor(max_workers=DB_EXECUTOR_WORKERS, thread_name_prefix="db-worker")
+cpu_executor = ThreadPoolExecutor(max_workers=CPU_EXECUTOR_WORKERS, thread_name_prefix="cpu-worker")
+# Shared sync single-flight executions, so every caller (the starter too) can stop waiting on its own
+flight_executor = ThreadPoolExecutor(max_workers=FLIGHT_EXECUTOR_WORKERS, thread_name_prefix="flight-worker")
+
+
+async def run_blocking(executor, fn, *args, **kwargs):
+    """
+    Runs a blocking callable on the given executor and awaits its result.
+    Context variables (e.g. per-request state) are carried into the worker thread.
+    """
+    loop = asyncio.get_running_loop()
+    ctx = contextvars.copy_context()
+    return await loop.run_in_executor(executor, functools.partial(ctx.run, fn, *args, **kwargs))
+
+
+def shutdown_executors():
+    """Stops the worker pools (cleanup on shutdown)."""
+    db_executor.shutdown(wait=False, cancel_futures=True)
+    cpu_executor.shutdown(wait=False, cancel_futures=True)
+    flight_executor.shutdown(wait=False, cancel_futures=True)
@@ -1,106 +1,218 @@
 import pandas as pd
 import numpy as np
-import sqlite3
-import joblib
 import os
-import requests
 import re
 from datetime import datetime
-from tensorflow import keras
-
-# Path Configuration
-BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
-MODEL_PATH = os.path.join(BASE_DIR, "models", "revenue_model.keras")
-SCALER_PATH = os.path.join(BASE_DIR, "models", "scaler.pkl")
+from typing import Dict, List, Tuple
 
 import logging
 logger = logging.getLogger("AI_SERVICE")
 
 
 # Dependencies from modules
-from modules import db_manager
+from modules import db_manager, tracing
+from modules.model_registry import revenue_model
+from modules.llm_client import llm_client, async_llm_client
+from modules.executors import db_executor, run_blocking
+from modules.cancellation import OperationCancelled
+from modules.llm_scheduler import LLMQueueFull, PRIORITY_NORMAL
 
-# LLM Config
-OLLAMA_API = "http://localhost:11434/api/generate"
-MODEL = "gemma3:12b"
+# Upper bound on how many days a single forecast request may cover
+MAX_FORECAST_DAYS = int(os.getenv("MAX_FORECAST_DAYS", "366"))
 
-def get_forecasted_load_from_db(target_date_str):
-    """Queries the DB for the SUM of all forecasted loads for a specific future date."""
-    # Use db_manager for cross-db support
-    # For PostgreSQL, we cast date_time to date for comparison
+def get_forecasted_loads_from_db(target_dates: List[str]) -> Dict[str, float]:
+    """
+    Queries the DB for the daily SUM of forecasted loads for several dates at once.
+
+    Args:
+        target_dates: Dates in YYYY-MM-DD format
+
+    Returns:
+        Mapping of date string -> total load (dates without data are omitted)
+    """
+    if not target_dates:
+        return {}
+
+    # One grouped query for every requested day
     if db_manager.DB_TYPE == "postgresql":
-        query = "SELECT SUM(forecasted_load) as total_load FROM meter_loads WHERE date_time::date = %s"
+        query = """
+            SELECT to_char(date_time::date, 'YYYY-MM-DD') AS day, SUM(forecasted_load) AS total_load
+            FROM meter_loads
+            WHERE date_time::date = ANY(%s::date[])
+            GROUP BY day
+        """
+        params = (list(target_dates),)
     else:
-        query = f"SELECT SUM(forecasted_load) as total_load FROM meter_loads WHERE date_time LIKE '{target_date_str}%'"
-    
+        placeholders = ", ".join("?" for _ in target_dates)
+        query = f"""
+            SELECT substr(date_time, 1, 10) AS day, SUM(forecasted_load) AS total_load
+            FROM meter_loads
+            WHERE substr(date_time, 1, 10) IN ({placeholders})
+            GROUP BY day
+        """
+        params = tuple(target_dates)
+
     try:
-        df = db_manager.run_select_query(query, (target_date_str,) if db_manager.DB_TYPE == "postgresql" else None)
-        if df.empty or df.iloc[0]['total_load'] is None:
-            return None
-        return float(df.iloc[0]['total_load'])
+        df = db_manager.run_select_query(query, params)
+        df = df.dropna(subset=["total_load"])
+        return dict(zip(df["day"].astype(str), df["total_load"].astype(float)))
     except Exception as e:
         print(f"Error fetching load from DB: {e}")
-        return None
+        return {}
+
+def get_forecasted_load_from_db(target_date_str):
+    """Queries the DB for the SUM of all forecasted loads for a specific future date."""
+    return get_forecasted_loads_from_db([target_date_str]).get(target_date_str)
 
-def predict_revenue_for_date(user_query):
+def _date_prompt(user_query):
     # --- FIX: DYNAMIC DATE INJECTION ---
     # We grab the current system date precisely
     now = datetime.now()
     current_date = now.strftime("%Y-%m-%d")
+    current_day = now.strftime("%A")
     current_year = now.year
 
-    # 1. Extract Date via LLM with STRICT constraints
-    prompt = f"""
-    Context: Today is {current_date} (Year: {current_year}).
-    Task: Extract the target date from this query: '{user_query}'.
-    
+    # 1. Extract Date(s) via LLM with STRICT constraints
+    return f"""
+    Context: Today is {current_date}, a {current_day} (Year: {current_year}).
+    Task: Extract the target date or dates from this query: '{user_query}'.
+
     Rules:
     1. "Tomorrow" = {current_date} + 1 day.
     2. "Next Thursday" = The upcoming Thursday relative to {current_date}.
     3. DO NOT CHANGE THE YEAR unless the query explicitly says "next year".
-    4. Return ONLY the date in YYYY-MM-DD format.
-    
+    4. For a single day, return ONLY the date in YYYY-MM-DD format.
+    5. For a period ("next week", "next 30 days", "from X to Y"), return ONLY "YYYY-MM-DD to YYYY-MM-DD" (inclusive).
+    6. For several separate days, return ONLY the dates in YYYY-MM-DD format separated by commas.
+
     Query: {user_query}
     """
-    
+
+@tracing.traced("extract_dates")
+def extract_target_dates(user_query, cancel_event=None) -> Tuple[List[str], str]:
+    """
+    Asks the LLM which date(s) the query is about.
+
+    Returns:
+        (dates, error_message) - dates is empty when extraction failed
+    """
+    try:
+        response_text = llm_client.generate_text(_date_prompt(user_query), cancel_event=cancel_event,
+                                                 priority=PRIORITY_NORMAL)
+    except (OperationCancelled, LLMQueueFull):
+        raise
+    except Exception as e:
+        return [], f"LLM Error during date extraction: {e}"
+
+    return parse_target_dates(response_text)
+
+@tracing.traced("extract_dates")
+async def extract_target_dates_async(user_query, cancel_event=None) -> Tuple[List[str], str]:
+    """Async counterpart of extract_target_dates."""
+    try:
+        response_text = await async_llm_client.generate_text(_date_prompt(user_query), cancel_event=cancel_event,
+                                                             priority=PRIORITY_NORMAL)
+    except (OperationCancelled, LLMQueueFull):
+        raise
+    except Exception as e:
+        return [], f"LLM Error during date extraction: {e}"
+
+    return parse_target_dates(response_text)
+
+def parse_target_dates(response_text: str) -> Tuple[List[str], str]:
+    """
+    Parses an LLM date answer: a single date, a "START to END" range, or a list.
+
+    Returns:
+        (dates, error_message) - dates is empty when nothing usable was found
+    """
+    # Regex to find date pattern YYYY-MM-DD
+    found = re.findall(r"\d{4}-\d{2}-\d{2}", response_text)
+    if not found:
+        return [], f"LLM responded: '{response_text}'. Could not understand the target date."
+
     try:
-        r = requests.post(OLLAMA_API, json={"model": MODEL, "prompt": prompt, "stream": False})
-        response_text = r.json().get('response', '')
-        
-        # Regex to find date pattern YYYY-MM-DD
-        date_match = re.search(r"\d{4}-\d{2}-\d{2}", response_text)
-        if not date_match: 
-            return pd.DataFrame(), f"LLM responded: '{response_text}'. Could not understand the target date."
-        date_str = date_match.group(0)
-    except Exception as e: 
-        return pd.DataFrame(), f"LLM Error during date extraction: {e}"
+        range_match = re.search(r"(\d{4}-\d{2}-\d{2})\s*(?:to|through|until|-|–)\s*(\d{4}-\d{2}-\d{2})", response_text)
+        if range_match and len(found) == 2:
+            start, end = sorted(pd.to_datetime(list(range_match.groups())))
+            if (end - start).days + 1 > MAX_FORECAST_DAYS:
+                return [], f"Requested range {start.date()} to {end.date()} exceeds {MAX_FORECAST_DAYS} days."
+            dates = pd.date_range(start, end, freq="D").strftime("%Y-%m-%d").tolist()
+        else:
+            # Validate and de-duplicate while keeping chronological order
+            dates = sorted(set(pd.to_datetime(found).strftime("%Y-%m-%d")))
+            if len(dates) > MAX_FORECAST_DAYS:
+                return [], f"Requested {len(dates)} dates, more than the limit of {MAX_FORECAST_DAYS}."
+    except (ValueError, pd.errors.OutOfBoundsDatetime):
+        return [], f"LLM responded: '{response_text}'. Could not understand the target date."
+
+    return dates, ""
+
+@tracing.traced("forecast")
+def predict_revenue_for_dates(date_strs: List[str]) -> Tuple[pd.DataFrame, str]:
+    """
+    Forecasts revenue for every given date with one grouped load query and
+    one vectorized model call.
 
+    Returns:
+        (DataFrame with 'date' and 'predicted_revenue' columns, message)
+    """
     # 2. Check Model Existence
-    if not os.path.exists(MODEL_PATH): 
+    if not revenue_model.model_exists():
         return pd.DataFrame(), "Model not trained. Run 'train_model.py' first."
-    
+
     # 3. Get Load Feature (The Input)
-    total_load = get_forecasted_load_from_db(date_str)
-    
-    if total_load is None: 
+    loads = get_forecasted_loads_from_db(date_strs)
+    available = [d for d in date_strs if d in loads]
+    missing = [d for d in date_strs if d not in loads]
+
+    if not available:
         # Detailed error message for debugging
-        return pd.DataFrame(), f"System Error: No forecasted load data found in DB for {date_str}. (Check: Does generate_all_data.py cover this date?)"
+        requested = date_strs[0] if len(date_strs) == 1 else f"{date_strs[0]} to {date_strs[-1]}"
+        return pd.DataFrame(), f"System Error: No forecasted load data found in DB for {requested}. (Check: Does generate_all_data.py cover this date?)"
 
     # 4. Run Prediction
     try:
-        model = keras.models.load_model(MODEL_PATH)
-        scaler_X, scaler_y = joblib.load(SCALER_PATH)
-        
-        dt = datetime.strptime(date_str, "%Y-%m-%d")
-        features_raw = [[total_load, dt.month, dt.weekday()]]
-        features_scaled = scaler_X.transform(features_raw)
-        
-        revenue_scaled = model.predict(features_scaled, verbose=0)
-        revenue = scaler_y.inverse_transform(revenue_scaled)[0][0]
-        
-        df = pd.DataFrame({'date': [date_str], 'predicted_revenue': [round(revenue, 2)]})
-        msg = f"Revenue Forecast for {date_str}: ${round(revenue, 2)}"
+        dts = pd.to_datetime(available)
+        features_raw = np.column_stack([
+            np.array([loads[d] for d in available], dtype=np.float64),
+            dts.month.to_numpy(),
+            dts.weekday.to_numpy(),
+        ])
+
+        # Model and scalers stay resident in the registry between requests
+        revenue = np.round(np.asarray(revenue_model.predict(features_raw), dtype=np.float64)[:, 0], 2)
+
+        df = pd.DataFrame({'date': available, 'predicted_revenue': revenue})
+        if len(available) == 1:
+            msg = f"Revenue Forecast for {available[0]}: ${revenue[0]}"
+        else:
+            msg = (f"Revenue Forecast for {available[0]} to {available[-1]} ({len(available)} days): "
+                   f"total ${round(float(revenue.sum()), 2)}, daily average ${round(float(revenue.mean()), 2)}")
+        if missing:
+            msg += f" (no load data for {len(missing)} day(s): {', '.join(missing[:5])}{'...' if len(missing) > 5 else ''})"
         logger.info(f"Forecast Prediction: {msg}")
         return df, msg
     except Exception as e:
-        return pd.DataFrame(), f"Prediction Engine Error: {str(e)}"
\ No newline at end of file
+        return pd.DataFrame(), f"Prediction Engine Error: {str(e)}"
+
+def predict_revenue_for_date(user_query, cancel_event=None):
+    """
+    Forecasts revenue for the date, date list or date range named in the query.
+    """
+    date_strs, error = extract_target_dates(user_query, cancel_event)
+    if not date_strs:
+        return pd.DataFrame(), error
+
+    return predict_revenue_for_dates(date_strs)
+
+async def predict_revenue_for_date_async(user_query, cancel_event=None):
+    """
+    Async counterpart of predict_revenue_for_date. The DB lookup and model call
+    run on the bounded DB executor.
+    """
+    date_strs, error = await extract_target_dates_async(user_query, cancel_event)
+    if not date_strs:
+        return pd.DataFrame(), error
+
+    return await run_blocking(db_executor, predict_revenue_for_dates, date_strs)
@@ -0,0 +1,77 @@
+"""
+Intent Rules Module
+
+Deterministic pre-classifier that runs before the LLM intent prompt.
+Keyword, regex and date-expression rules each return a confidence score;
+when the best rule is confident enough the LLM round trip is skipped.
+Only ambiguous queries (e.g. "revenue on the 25th") fall through to the LLM.
+"""
+
+import os
+import re
+from datetime import datetime
+from typing import NamedTuple, Optional
+
+INTENT_RULES_ENABLED = os.getenv("INTENT_RULES_ENABLED", "true").lower() == "true"
+INTENT_RULES_MIN_CONFIDENCE = float(os.getenv("INTENT_RULES_MIN_CONFIDENCE", "0.8"))
+
+REVENUE_TERMS = re.compile(r"\$|\b(revenue|revenues|earning|earnings|income|sales|billing|turnover|profit|profits)\b")
+# Same words as the post-LLM safety override in llm_router.classify_intent
+LOAD_TERMS = re.compile(r"\b(load|loads|power|usage|demand|consumption)\b")
+FUTURE_TERMS = re.compile(
+    r"\b(tomorrow|next|upcoming|coming|future|forecast|forecasted|forecasting|predict|predicted|prediction|"
+    r"projected|projection|expected|expect|will|estimate|estimated)\b"
+)
+PAST_TERMS = re.compile(r"\b(yesterday|last|ago|past|previous|previously|historical|history|was|were|earned|made)\b")
+ISO_DATE = re.compile(r"\b(\d{4}-\d{2}-\d{2})\b")
+
+
+class IntentDecision(NamedTuple):
+    intent: Optional[str]  # None when no rule is confident
+    confidence: float
+    rule: str
+
+
+def pre_classify(query: str, now: Optional[datetime] = None) -> IntentDecision:
+    """
+    Applies the rules in order of specificity and returns the first decision.
+    """
+    text = query.lower()
+    today = (now or datetime.now()).strftime("%Y-%m-%d")
+
+    if not REVENUE_TERMS.search(text):
+        return IntentDecision("SQL_QUERY", 0.95, "no_revenue_terms")
+
+    if LOAD_TERMS.search(text):
+        # The revenue engine cannot answer load questions
+        return IntentDecision("SQL_QUERY", 0.9, "revenue_with_load_terms")
+
+    dates = ISO_DATE.findall(text)
+    if dates:
+        if all(d > today for d in dates):
+            return IntentDecision("REVENUE_FORECAST", 0.95, "revenue_future_iso_date")
+        if all(d < today for d in dates):
+            return IntentDecision("SQL_QUERY", 0.85, "revenue_past_iso_date")
+
+    has_future = bool(FUTURE_TERMS.search(text))
+    has_past = bool(PAST_TERMS.search(text))
+    if has_future and not has_past:
+        return IntentDecision("REVENUE_FORECAST", 0.9, "revenue_future_terms")
+    if has_past and not has_future:
+        return IntentDecision("SQL_QUERY", 0.8, "revenue_past_terms")
+
+    return IntentDecision(None, 0.5, "revenue_ambiguous")
+
+
+def decide(query: str) -> IntentDecision:
+    """
+    Returns the rule decision if it clears INTENT_RULES_MIN_CONFIDENCE,
+    otherwise an IntentDecision with intent=None (caller should ask the LLM).
+    """
+    if not INTENT_RULES_ENABLED:
+        return IntentDecision(None, 0.0, "rules_disabled")
+
+    decision = pre_classify(query)
+    if decision.intent is None or decision.confidence < INTENT_RULES_MIN_CONFIDENCE:
+        return IntentDecision(None, decision.confidence, decision.rule)
+    return decision
@@ -0,0 +1,348 @@
+"""
+LLM Client Module
+
+Single shared HTTP client for all Ollama calls. Keeps a pooled keep-alive
+session, applies connect/read timeouts, retries connection failures with
+backoff and caps the number of concurrent generations sent to Ollama.
+
+`OllamaClient` serves the synchronous code paths (requests), while
+`AsyncOllamaClient` serves the asyncio pipeline (httpx) with the same settings.
+Both take their concurrency slots from the shared priority scheduler
+(modules.llm_scheduler), so Ollama sees at most LLM_MAX_CONCURRENCY calls.
+"""
+
+import os
+import json
+import time
+import socket
+import asyncio
+import threading
+import contextvars
+from typing import Any, Dict, Iterator, List, Optional
+
+import requests
+from requests.adapters import HTTPAdapter
+from urllib3.connectionpool import HTTPConnectionPool, HTTPSConnectionPool
+from urllib3.util.retry import Retry
+from dotenv import load_dotenv
+
+from modules import tracing
+from modules.cancellation import on_cancel, raise_if_cancelled
+from modules.llm_scheduler import LLMScheduler, llm_scheduler, LLM_MAX_CONCURRENCY, PRIORITY_NORMAL  # noqa: F401
+
+# Load environment variables from .env file
+load_dotenv()
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+# --- CONFIGURATION ---
+
+OLLAMA_API = os.getenv("OLLAMA_API", "http://localhost:11434/api/generate")
+# Make sure you have pulled this model in terminal: ollama pull gemma3:12b
+LOCAL_MODEL = os.getenv("OLLAMA_MODEL", "gemma3:12b")
+
+LLM_CONNECT_TIMEOUT = float(os.getenv("LLM_CONNECT_TIMEOUT", "5"))
+LLM_READ_TIMEOUT = float(os.getenv("LLM_READ_TIMEOUT", "300"))
+LLM_MAX_RETRIES = int(os.getenv("LLM_MAX_RETRIES", "2"))
+LLM_RETRY_BACKOFF = float(os.getenv("LLM_RETRY_BACKOFF", "0.5"))
+LLM_POOL_SIZE = int(os.getenv("LLM_POOL_SIZE", "10"))
+
+DEFAULT_OPTIONS = {"temperature": 0.1}
+
+
+class LLMUnavailableError(Exception):
+    """Raised when Ollama cannot be reached or returns an unusable response."""
+
+
+# Connections checked out by the current (cancellable) request, see _TrackingPoolMixin
+_checked_out: contextvars.ContextVar[Optional[List[Any]]] = contextvars.ContextVar("llm_checked_out", default=None)
+
+
+class _TrackingPoolMixin:
+    """
+    Records every connection a cancellable request checks out, so cancelling
+    can shut its socket down while the request still waits for Ollama's
+    first bytes (before requests hands back a response object to close).
+    """
+
+    def _get_conn(self, timeout=None):
+        conn = super()._get_conn(timeout)
+        checked_out = _checked_out.get()
+        if checked_out is not None:
+            checked_out.append(conn)
+        return conn
+
+
+class _TrackingHTTPConnectionPool(_TrackingPoolMixin, HTTPConnectionPool):
+    pass
+
+
+class _TrackingHTTPSConnectionPool(_TrackingPoolMixin, HTTPSConnectionPool):
+    pass
+
+
+class _CancellableAdapter(HTTPAdapter):
+    def init_poolmanager(self, *args, **kwargs):
+        super().init_poolmanager(*args, **kwargs)
+        self.poolmanager.pool_classes_by_scheme = {
+            "http": _TrackingHTTPConnectionPool,
+            "https": _TrackingHTTPSConnectionPool,
+        }
+
+
+def _abort_connections(connections: List[Any]):
+    # shutdown() (unlike close()) wakes a thread blocked reading the socket
+    for conn in connections:
+        sock = getattr(conn, "sock", None)
+        if sock is not None:
+            try:
+                sock.shutdown(socket.SHUT_RDWR)
+            except OSError:
+                pass
+
+
+class OllamaClient:
+    """
+    Thread-safe Ollama client backed by one pooled `requests.Session`.
+    """
+
+    def __init__(self, api_url: str = OLLAMA_API, model: str = LOCAL_MODEL,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, retry_backoff: float = LLM_RETRY_BACKOFF,
+                 scheduler: Optional[LLMScheduler] = None, pool_size: int = LLM_POOL_SIZE):
+        self.api_url = api_url
+        self.model = model
+        self.timeout = (connect_timeout, read_timeout)
+        self.scheduler = scheduler or llm_scheduler
+
+        # Retry only failures to connect: a POST that reached Ollama may already be generating
+        retry = Retry(
+            total=max_retries,
+            connect=max_retries,
+            read=0,
+            status=0,
+            backoff_factor=retry_backoff,
+            allowed_methods=None,
+        )
+        adapter = _CancellableAdapter(pool_connections=1, pool_maxsize=pool_size, max_retries=retry)
+        self.session = requests.Session()
+        self.session.mount("http://", adapter)
+        self.session.mount("https://", adapter)
+
+    def _payload(self, prompt: str, model: Optional[str], options: Optional[Dict[str, Any]], stream: bool) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options if options is not None else DEFAULT_OPTIONS,
+        }
+
+    def generate(self, prompt: str, model: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                 cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_NORMAL) -> Dict[str, Any]:
+        """
+        Runs one non-streaming generation in scheduler class `priority`.
+
+        With a cancel_event the generation is streamed internally, so cancelling
+        closes the connection (and stops Ollama) mid-generation.
+
+        Returns:
+            The decoded Ollama response body (text is under "response")
+
+        Raises:
+            LLMUnavailableError: on connection, timeout or decoding failures
+            LLMQueueFull: when the scheduler rejects the call
+            OperationCancelled: when cancel_event is set
+        """
+        if cancel_event is not None:
+            raise_if_cancelled(cancel_event)
+            parts, last = [], {}
+            for chunk in self.generate_stream(prompt, model, options, cancel_event=cancel_event, priority=priority):
+                parts.append(chunk.get("response", ""))
+                last = chunk
+            raise_if_cancelled(cancel_event)
+            return {**last, "response": "".join(parts)}
+
+        with self.scheduler.slot(priority):
+            start = time.perf_counter()
+            try:
+                r = self.session.post(self.api_url, json=self._payload(prompt, model, options, False), timeout=self.timeout)
+                r.raise_for_status()
+                body = r.json()
+            except (requests.RequestException, ValueError) as e:
+                raise LLMUnavailableError(str(e)) from e
+            tracing.record_llm_call(time.perf_counter() - start, body)
+            return body
+
+    def generate_text(self, prompt: str, model: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                      cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_NORMAL) -> str:
+        """Runs one generation and returns only the response text."""
+        return self.generate(prompt, model, options, cancel_event, priority).get("response", "")
+
+    def generate_stream(self, prompt: str, model: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                        cancel_event: Optional[threading.Event] = None,
+                        priority: int = PRIORITY_NORMAL) -> Iterator[Dict[str, Any]]:
+        """
+        Streams NDJSON chunks from Ollama. The scheduler slot is held until
+        the stream is exhausted, cancelled or closed. Cancelling shuts the
+        connection down from the cancelling thread, so a blocked read ends at
+        once (Ollama stops generating when the client goes away) and the
+        stream just stops.
+
+        Raises:
+            LLMUnavailableError: on connection, timeout or decoding failures
+            LLMQueueFull: when the scheduler rejects the call
+        """
+        if cancel_event and cancel_event.is_set():
+            return
+        with self.scheduler.slot(priority, cancel_event):
+            start = time.perf_counter()
+            last = None
+            connections = []
+            tracking = _checked_out.set(connections) if cancel_event is not None else None
+            try:
+                with on_cancel(cancel_event, lambda: _abort_connections(connections)), \
+                        self.session.post(self.api_url, json=self._payload(prompt, model, options, True),
+                                          stream=True, timeout=self.timeout) as r:
+                    if tracking is not None:
+                        _checked_out.reset(tracking)
+                        tracking = None
+                    r.raise_for_status()
+                    for line in r.iter_lines():
+                        if cancel_event and cancel_event.is_set():
+                            return
+                        if not line:
+                            continue
+                        chunk = last = json.loads(line)
+                        yield chunk
+                        if chunk.get("done"):
+                            return
+            except Exception as e:
+                if cancel_event and cancel_event.is_set():
+                    return  # the read failed because cancellation closed the connection
+                if isinstance(e, (requests.RequestException, ValueError)):
+                    raise LLMUnavailableError(str(e)) from e
+                raise
+            finally:
+                if tracking is not None:
+                    _checked_out.reset(tracking)
+                # The final chunk carries Ollama's token counts and durations
+                tracing.record_llm_call(time.perf_counter() - start, last if last and last.get("done") else None)
+
+    def close(self):
+        self.session.close()
+
+
+class AsyncOllamaClient:
+    """
+    asyncio-native Ollama client backed by one pooled `httpx.AsyncClient`.
+    The HTTP client and semaphore are created lazily inside the running loop.
+    """
+
+    def __init__(self, api_url: str = OLLAMA_API, model: str = LOCAL_MODEL,
+                 connect_timeout: float = LLM_CONNECT_TIMEOUT, read_timeout: float = LLM_READ_TIMEOUT,
+                 max_retries: int = LLM_MAX_RETRIES, retry_backoff: float = LLM_RETRY_BACKOFF,
+                 scheduler: Optional[LLMScheduler] = None, pool_size: int = LLM_POOL_SIZE):
+        self.api_url = api_url
+        self.model = model
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.max_retries = max_retries
+        self.retry_backoff = retry_backoff
+        self.scheduler = scheduler or llm_scheduler
+        self.pool_size = pool_size
+        self._client = None
+        self._loop = None
+
+    def _get_client(self):
+        import httpx
+
+        loop = asyncio.get_running_loop()
+        if self._client is None or self._client.is_closed or self._loop is not loop:
+            self._loop = loop
+            self._client = httpx.AsyncClient(
+                timeout=httpx.Timeout(self.read_timeout, connect=self.connect_timeout),
+                limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size),
+            )
+        return self._client
+
+    def _payload(self, prompt: str, model: Optional[str], options: Optional[Dict[str, Any]], stream: bool) -> Dict[str, Any]:
+        return {
+            "model": model or self.model,
+            "prompt": prompt,
+            "stream": stream,
+            "options": options if options is not None else DEFAULT_OPTIONS,
+        }
+
+    async def generate(self, prompt: str, model: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                       cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_NORMAL) -> Dict[str, Any]:
+        """
+        Runs one non-streaming generation in scheduler class `priority`. Setting
+        cancel_event aborts the request (closing its connection, which stops
+        Ollama) and releases the slot.
+
+        Raises:
+            LLMUnavailableError: on connection, timeout or decoding failures
+            LLMQueueFull: when the scheduler rejects the call
+            OperationCancelled: when cancel_event is set
+        """
+        client = self._get_client()
+        payload = self._payload(prompt, model, options, False)
+        raise_if_cancelled(cancel_event)
+        async with self.scheduler.slot_async(priority, cancel_event):
+            if cancel_event is None:
+                return await self._post(client, payload)
+
+            loop = asyncio.get_running_loop()
+            request = asyncio.ensure_future(self._post(client, payload))
+            cancelled = loop.create_future()
+
+            def wake():
+                try:
+                    loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None))
+                except RuntimeError:
+                    pass  # loop already closed
+
+            try:
+                with on_cancel(cancel_event, wake):
+                    await asyncio.wait({request, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+            finally:
+                if not request.done():
+                    request.cancel()
+                    await asyncio.gather(request, return_exceptions=True)
+            raise_if_cancelled(cancel_event)
+            return request.result()
+
+    async def _post(self, client, payload: Dict[str, Any]) -> Dict[str, Any]:
+        import httpx
+
+        start = time.perf_counter()
+        for attempt in range(self.max_retries + 1):
+            try:
+                r = await client.post(self.api_url, json=payload)
+                r.raise_for_status()
+                body = r.json()
+                tracing.record_llm_call(time.perf_counter() - start, body)
+                return body
+            except httpx.ConnectError as e:
+                # Retry only failures to connect, mirroring the sync client
+                if attempt >= self.max_retries:
+                    raise LLMUnavailableError(str(e)) from e
+                await asyncio.sleep(self.retry_backoff * (2 ** attempt))
+            except (httpx.HTTPError, ValueError) as e:
+                raise LLMUnavailableError(str(e)) from e
+
+    async def generate_text(self, prompt: str, model: Optional[str] = None, options: Optional[Dict[str, Any]] = None,
+                            cancel_event: Optional[threading.Event] = None, priority: int = PRIORITY_NORMAL) -> str:
+        """Runs one generation and returns only the response text."""
+        return (await self.generate(prompt, model, options, cancel_event, priority)).get("response", "")
+
+    async def aclose(self):
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+
+# Shared instances used by every module that talks to Ollama
+llm_client = OllamaClient()
+async_llm_client = AsyncOllamaClient()
@@ -1,28 +1,26 @@
-import requests
 import json
 import re
 import threading
 import os
 from datetime import datetime
-from dotenv import load_dotenv
-
-# Load environment variables from .env file
-load_dotenv()
 
 import logging
 logger = logging.getLogger("AI_SERVICE")
 
 # --- CONFIGURATION ---
 
-# 1. LOCAL CONFIG (Ollama)
-OLLAMA_API = "http://localhost:11434/api/generate"
-# Make sure you have pulled this model in terminal: ollama pull gemma3:12b
-LOCAL_MODEL = "gemma3:12b"  
+# Ollama endpoint, model name, timeouts and pooling live in the shared client
+from modules.llm_client import llm_client, async_llm_client, LLMUnavailableError
+from modules.sql_cache import sql_cache
+from modules import intent_rules, local_analyzer, tracing
+from modules.cancellation import OperationCancelled
+from modules.llm_scheduler import LLMQueueFull, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, PRIORITY_BACKGROUND
+from modules.executors import cpu_executor, run_blocking
 
 
 # --- ROUTER FUNCTIONS ---
 
-def call_llm(prompt, model_type="local", cancel_event=None):
+def call_llm(prompt, model_type="local", cancel_event=None, stream=False, priority=PRIORITY_NORMAL):
     """
     Routes the request to Local (Ollama) ONLY.
     
@@ -30,58 +28,97 @@ def call_llm(prompt, model_type="local", cancel_event=None):
         prompt: The prompt to send to the LLM
         model_type: Ignored (kept for compatibility)
         cancel_event: Optional threading.Event for cancellation support
+        stream: If True, returns a generator yielding tokens as they are produced
+        priority: Scheduler class of the call site (modules.llm_scheduler)
     """
-    return call_local_api(prompt, cancel_event)
+    if stream:
+        return stream_local_api(prompt, cancel_event, priority)
+    return call_local_api(prompt, cancel_event, priority)
 
-def call_local_api(prompt, cancel_event=None):
+def call_local_api(prompt, cancel_event=None, priority=PRIORITY_NORMAL):
     """
     Calls Ollama running locally.
     
     Args:
         prompt: The prompt to send
-        cancel_event: Optional threading.Event for cancellation
+        cancel_event: Optional threading.Event / CancellationToken; cancelling
+            closes the Ollama connection mid-generation
+        priority: Scheduler class of the call site
+
+    Raises:
+        OperationCancelled: when cancel_event is set
+        LLMQueueFull: when the scheduler rejects the call (surfaced as HTTP 429)
     """
     try:
-        # Check if cancelled before making request
-        if cancel_event and cancel_event.is_set():
-            return "Request cancelled by user"
-        
-        payload = {
-            "model": LOCAL_MODEL,
-            "prompt": prompt,
-            "stream": False,
-            "options": {"temperature": 0.1}
-        }
-        r = requests.post(OLLAMA_API, json=payload, timeout=300)
-        
-        # Check if cancelled after request
-        if cancel_event and cancel_event.is_set():
-            return "Request cancelled by user"
-        
-        return r.json().get('response', 'Error: No response from Ollama')
+        result = llm_client.generate(prompt, cancel_event=cancel_event, priority=priority)
+        return result.get('response', 'Error: No response from Ollama')
+    except (OperationCancelled, LLMQueueFull):
+        raise
     except Exception as e:
         # Fallback/Dummy response if local AI is down
         print(f"Local AI Error: {e}")
         return "Local AI is currently unavailable. Please ensure Ollama is running."
 
-# --- APP LOGIC FUNCTIONS ---
+def stream_local_api(prompt, cancel_event=None, priority=PRIORITY_NORMAL):
+    """
+    Streams tokens from Ollama's NDJSON response.
+    
+    Args:
+        prompt: The prompt to send
+        cancel_event: Optional threading.Event; stops reading (and closes the
+            connection) as soon as it is set
+    
+    Yields:
+        Response text fragments in generation order
+    """
+    if cancel_event and cancel_event.is_set():
+        return
 
-def classify_intent(query, model_type="local"):
+    try:
+        for chunk in llm_client.generate_stream(prompt, cancel_event=cancel_event, priority=priority):
+            token = chunk.get("response", "")
+            if token:
+                yield token
+    except LLMQueueFull:
+        raise
+    except Exception as e:
+        print(f"Local AI Error: {e}")
+        yield "Local AI is currently unavailable. Please ensure Ollama is running."
+
+async def call_llm_async(prompt, model_type="local", cancel_event=None, priority=PRIORITY_NORMAL):
     """
-    Decides if the user wants historical data (SQL) or future predictions (Revenue).
-    Includes a keyword safety check to prevent 'Load' queries from going to Revenue.
+    Async counterpart of call_llm (non-streaming). Does not block the event loop.
+    
+    Args:
+        prompt: The prompt to send to the LLM
+        model_type: Ignored (kept for compatibility)
+        cancel_event: Optional threading.Event for cancellation support
+        priority: Scheduler class of the call site
     """
+    try:
+        result = await async_llm_client.generate(prompt, cancel_event=cancel_event, priority=priority)
+        return result.get('response', 'Error: No response from Ollama')
+    except (OperationCancelled, LLMQueueFull):
+        raise
+    except Exception as e:
+        print(f"Local AI Error: {e}")
+        return "Local AI is currently unavailable. Please ensure Ollama is running."
+
+# --- APP LOGIC FUNCTIONS ---
+# Each step is split into a prompt builder and a response parser so the sync
+# and async entry points share exactly the same prompt and post-processing.
+
+def _intent_prompt(query):
     current_date = datetime.now().strftime("%Y-%m-%d")
-    prompt = f"""
+    return f"""
     You are an intent classifier.
     Context: Today is {current_date}.
     1. If query is about REVENUE ($) AND a future date -> JSON: {{"intent": "REVENUE_FORECAST"}}
     2. Else -> JSON: {{"intent": "SQL_QUERY"}}
     Output JSON ONLY. Query: {query}
     """
-    
-    # 1. Ask the LLM
-    resp = call_llm(prompt, model_type)
+
+def _parse_intent(resp, query):
     detected_intent = "SQL_QUERY" # Default
 
     try:
@@ -106,12 +143,53 @@ def classify_intent(query, model_type="local"):
 
     return detected_intent
 
-def generate_sql(query, model_type="local"):
-    """Generates SQL based on the user query."""
+def _rule_intent(query):
+    # 0. Deterministic fast path: skip the LLM when the rules are confident
+    decision = intent_rules.decide(query)
+    if decision.intent:
+        logger.info(f"Intent decided by rules: {decision.intent} (rule={decision.rule}, confidence={decision.confidence})")
+    else:
+        logger.info(f"Intent ambiguous for rules (rule={decision.rule}, confidence={decision.confidence}); asking LLM")
+    return decision.intent
+
+@tracing.traced("classify_intent")
+def classify_intent(query, model_type="local", cancel_event=None):
+    """
+    Decides if the user wants historical data (SQL) or future predictions (Revenue).
+    Confident rule matches return immediately; otherwise the LLM decides, with a
+    keyword safety check to prevent 'Load' queries from going to Revenue.
+    """
+    intent = _rule_intent(query)
+    if intent:
+        return intent
+
+    # 1. Ask the LLM
+    resp = call_llm(_intent_prompt(query), model_type, cancel_event=cancel_event, priority=PRIORITY_INTERACTIVE)
+    intent = _parse_intent(resp, query)
+    logger.info(f"Intent decided by LLM: {intent}")
+    return intent
+
+@tracing.traced("classify_intent")
+async def classify_intent_async(query, model_type="local", cancel_event=None):
+    """Async counterpart of classify_intent."""
+    intent = _rule_intent(query)
+    if intent:
+        return intent
+
+    resp = await call_llm_async(_intent_prompt(query), model_type, cancel_event=cancel_event,
+                                priority=PRIORITY_INTERACTIVE)
+    intent = _parse_intent(resp, query)
+    logger.info(f"Intent decided by LLM: {intent}")
+    return intent
+
+# Bump whenever the SQL prompt or schema changes so cached translations are not reused
+SQL_PROMPT_VERSION = "2024.1"
+
+def _sql_prompt(query):
     current_time = datetime.now().strftime("%Y-%m-%d %H:%M:%S")
     current_day = datetime.now().strftime("%A")
     
-    prompt = f"""
+    return f"""
     Role: Expert SQL Generator.
     Schema: 
     - meter_users (username VARCHAR, meter_id INTEGER)
@@ -127,9 +205,8 @@ def generate_sql(query, model_type="local"):
     
     Query: {query}
     """
-    
-    resp = call_llm(prompt, model_type)
-    
+
+def _parse_sql(resp):
     # Safety Check: If the API returned an error message, don't execute it as SQL
     if "Error" in resp and ("Connection" in resp or "API" in resp):
         return f"-- SYSTEM ERROR: {resp}", resp
@@ -157,11 +234,87 @@ def generate_sql(query, model_type="local"):
         
     return sql, resp
 
-def analyze_data(df, query, model_type="local"):
-    """Generates insights from the dataframe."""
-    if df.empty: 
-        return {"summary": "No data found matching your query.", "visualization_type": "table"}
+def _cache_sql(query, sql, resp):
+    # Only cache something that looks like an executable query
+    if re.match(r"^(SELECT|WITH)\b", sql, re.IGNORECASE):
+        sql_cache.put(query, SQL_PROMPT_VERSION, sql, resp)
+
+@tracing.traced("generate_sql")
+def generate_sql(query, model_type="local", cancel_event=None):
+    """Generates SQL based on the user query (served from the SQL cache when possible)."""
+    cached = sql_cache.get(query, SQL_PROMPT_VERSION)
+    if cached:
+        logger.info(f"SQL cache hit: {cached[0]}")
+        return cached
+
+    resp = call_llm(_sql_prompt(query), model_type, cancel_event=cancel_event, priority=PRIORITY_NORMAL)
+    sql, resp = _parse_sql(resp)
+    _cache_sql(query, sql, resp)
+    return sql, resp
+
+@tracing.traced("generate_sql")
+async def generate_sql_async(query, model_type="local", cancel_event=None):
+    """Async counterpart of generate_sql."""
+    cached = sql_cache.get(query, SQL_PROMPT_VERSION)
+    if cached:
+        logger.info(f"SQL cache hit: {cached[0]}")
+        return cached
+
+    resp = await call_llm_async(_sql_prompt(query), model_type, cancel_event=cancel_event, priority=PRIORITY_NORMAL)
+    sql, resp = _parse_sql(resp)
+    _cache_sql(query, sql, resp)
+    return sql, resp
+
+def suggest_visualization(df):
+    """
+    Picks a line chart from column names/dtypes when the data looks like a time series.
+    
+    Returns:
+        Dict with visualization_type/x_column/y_column, or None
+    """
+    # Check for time columns
+    time_cols = [c for c in df.columns if any(x in str(c).lower() for x in ['date', 'time', 'ts', 'day', 'hour', 'month'])]
+    # Check for numeric columns
+    numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
+    
+    if time_cols and numeric_cols:
+        return {
+            "visualization_type": "line",
+            "x_column": time_cols[0], # Best guess
+            "y_column": numeric_cols[0] # Best guess
+        }
+    return None
+
+@tracing.traced("stream_summary")
+def stream_summary(df, query, model_type="local", cancel_event=None):
+    """
+    Streams a short plain-text insight about the data, token by token.
+    """
+    if df.empty:
+        yield "No data found matching your query."
+        return
+    
+    column_info = {col: str(df[col].dtype) for col in df.columns}
+    data_sample = df.head(5).to_dict('list')
+    
+    prompt = f"""
+    Role: Data Analyst.
+    Task: Write a 1-sentence insight about this data that answers the user's query.
+    Output plain text only (no JSON, no markdown).
     
+    Query: {query}
+    
+    --- DATA STRUCTURE ---
+    Columns and Types: {column_info}
+    Row count: {len(df)}
+    
+    --- DATA SAMPLE (First 5 Rows) ---
+    {data_sample}
+    """
+    
+    yield from call_llm(prompt, model_type, cancel_event=cancel_event, stream=True, priority=PRIORITY_BACKGROUND)
+
+def _analysis_prompt(df, query):
     # --- ENHANCED DATA SAMPLE INJECTION ---
     # 1. Provide column names and data types (critical for LLM to select x/y axes)
     column_info = {col: str(df[col].dtype) for col in df.columns}
@@ -169,7 +322,7 @@ def analyze_data(df, query, model_type="local"):
     # 2. Provide the top 5 rows
     data_sample = df.head(5).to_dict('list') # Use 'list' for a cleaner prompt structure
     
-    prompt = f"""
+    return f"""
     Role: Data Analyst.
     Task: Analyze this data snippet and the user's query.
     Return a JSON object with:
@@ -190,9 +343,8 @@ def analyze_data(df, query, model_type="local"):
     
     JSON Output Only:
     """
-    
-    resp = call_llm(prompt, model_type)
-    
+
+def _parse_analysis(resp, df):
     try:
         match = re.search(r"\{.*\}", resp, re.DOTALL).group(0)
         result = json.loads(match)
@@ -201,17 +353,9 @@ def analyze_data(df, query, model_type="local"):
         # If LLM does NOT suggest a chart, but we have time-series data, force "line"
         vt = result.get("visualization_type", "").lower()
         if vt not in ["line", "bar"]:
-            cols = [c.lower() for c in df.columns]
-            # Check for time columns
-            time_cols = [c for c in cols if any(x in c for x in ['date', 'time', 'ts', 'day', 'hour', 'month'])]
-            # Check for numeric columns
-            numeric_cols = df.select_dtypes(include=['number']).columns.tolist()
-            
-            if time_cols and numeric_cols:
-                result["visualization_type"] = "line"
-                result["x_column"] = time_cols[0] # Best guess
-                result["y_column"] = numeric_cols[0] # Best guess
-                
+            heuristic = suggest_visualization(df)
+            if heuristic:
+                result.update(heuristic)
                 logger.info(f"Heuristic applied: Forced visualization to 'line' using {result['x_column']} vs {result['y_column']}")
                 
         logger.info(f"Analysis Result: {result}")
@@ -233,4 +377,46 @@ def analyze_data(df, query, model_type="local"):
              }
              
         # Include the raw data in case of parsing failure for debugging
-        return {"summary": "Analysis failed or raw text returned.", "visualization_type": "table", "raw": resp}
\ No newline at end of file
+        return {"summary": "Analysis failed or raw text returned.", "visualization_type": "table", "raw": resp}
+
+def analyze_locally(df, query):
+    """
+    Deterministic fast path: the insight for result shapes that decide the
+    answer on their own (see local_analyzer), or None when the LLM is needed.
+    """
+    decision = local_analyzer.decide(df, query)
+    if decision.insight:
+        logger.info(f"Analysis decided locally (rule={decision.rule}): {decision.insight['visualization_type']}")
+    else:
+        logger.info(f"Result shape ambiguous for the local analyzer (rule={decision.rule}); asking LLM")
+    return decision.insight
+
+@tracing.traced("analyze_data")
+def analyze_data(df, query, model_type="local", cancel_event=None):
+    """
+    Generates insights from the dataframe. Deterministic result shapes are
+    summarized locally; only ambiguous ones go to the LLM.
+    """
+    if df.empty: 
+        return {"summary": "No data found matching your query.", "visualization_type": "table"}
+
+    insight = analyze_locally(df, query)
+    if insight:
+        return insight
+    
+    resp = call_llm(_analysis_prompt(df, query), model_type, cancel_event=cancel_event, priority=PRIORITY_BACKGROUND)
+    return _parse_analysis(resp, df)
+
+@tracing.traced("analyze_data")
+async def analyze_data_async(df, query, model_type="local", cancel_event=None):
+    """Async counterpart of analyze_data; the local analysis runs on the CPU executor."""
+    if df.empty: 
+        return {"summary": "No data found matching your query.", "visualization_type": "table"}
+
+    insight = await run_blocking(cpu_executor, analyze_locally, df, query)
+    if insight:
+        return insight
+    
+    resp = await call_llm_async(_analysis_prompt(df, query), model_type, cancel_event=cancel_event,
+                                priority=PRIORITY_BACKGROUND)
+    return _parse_analysis(resp, df)
@@ -0,0 +1,316 @@
+"""
+LLM Scheduler Module
+
+Admission control and priority scheduling for Ollama calls. Every generation
+(sync or async, streaming or not) takes one of LLM_MAX_CONCURRENCY slots from
+the shared scheduler; callers beyond that wait in one bounded queue.
+
+- Priority classes per call site: intent / planning are INTERACTIVE, SQL and
+  date extraction NORMAL, analysis and summaries BACKGROUND. A waiter's
+  priority improves by one class every LLM_PRIORITY_AGING_SECONDS it has
+  waited, so background work is delayed under load but never starved.
+- Within a class, the user with the fewest running calls goes first (fair
+  share); each user may hold at most LLM_QUEUE_MAX_PER_USER queued calls.
+- When the queue (or the user's share) is full the call is rejected at once
+  with LLMQueueFull and a Retry-After estimate (HTTP 429 at the routes), and
+  a call that waits longer than LLM_QUEUE_TIMEOUT is rejected the same way,
+  instead of piling up until the read timeout.
+
+The user is taken from a context variable set by the routes (`user_scope`).
+"""
+
+import os
+import math
+import time
+import asyncio
+import threading
+import contextvars
+from collections import Counter
+from contextlib import asynccontextmanager, contextmanager
+from typing import Any, Callable, Dict, Iterator, List, Optional, TypeVar
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+from modules import tracing
+from modules.cancellation import on_cancel, raise_if_cancelled
+
+LLM_MAX_CONCURRENCY = int(os.getenv("LLM_MAX_CONCURRENCY", "4"))
+LLM_QUEUE_MAX = int(os.getenv("LLM_QUEUE_MAX", "32"))
+LLM_QUEUE_MAX_PER_USER = int(os.getenv("LLM_QUEUE_MAX_PER_USER", "4"))
+LLM_QUEUE_TIMEOUT = float(os.getenv("LLM_QUEUE_TIMEOUT", "30"))
+LLM_PRIORITY_AGING_SECONDS = float(os.getenv("LLM_PRIORITY_AGING_SECONDS", "10"))
+
+PRIORITY_INTERACTIVE = 0
+PRIORITY_NORMAL = 1
+PRIORITY_BACKGROUND = 2
+PRIORITY_NAMES = {PRIORITY_INTERACTIVE: "interactive", PRIORITY_NORMAL: "normal", PRIORITY_BACKGROUND: "background"}
+
+QUEUE_WAIT_SECONDS = tracing.Histogram(
+    "ai_llm_queue_wait_seconds", "Time Ollama calls waited for a scheduler slot.", ["priority"]
+)
+QUEUE_REJECTED = tracing.Counter(
+    "ai_llm_queue_rejected_total", "Ollama calls rejected by admission control.", ["priority", "reason"]
+)
+tracing.REGISTRY.extend([QUEUE_WAIT_SECONDS, QUEUE_REJECTED])
+
+_current_user: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("llm_user", default=None)
+
+T = TypeVar("T")
+
+
+class LLMQueueFull(Exception):
+    """Raised when an Ollama call is not admitted; `retry_after` is in seconds."""
+
+    def __init__(self, message: str, retry_after: int = 1):
+        super().__init__(message)
+        self.retry_after = retry_after
+
+
+@contextmanager
+def user_scope(user: Optional[str]):
+    """Attributes the Ollama calls made inside the block to `user` (fair share)."""
+    token = _current_user.set(user)
+    try:
+        yield
+    finally:
+        _current_user.reset(token)
+
+
+def iterate_as(user: Optional[str], iterator: Iterator[T]) -> Iterator[T]:
+    """
+    user_scope() for a generator that may be resumed from different threads
+    or contexts (e.g. a StreamingResponse body): the user is set around each
+    step only, never across a yield.
+    """
+    try:
+        while True:
+            with user_scope(user):
+                try:
+                    item = next(iterator)
+                except StopIteration:
+                    return
+            yield item
+    finally:
+        close = getattr(iterator, "close", None)
+        if close:
+            close()
+
+
+class _Waiter:
+    __slots__ = ("priority", "user", "seq", "enqueued_at", "granted", "wake")
+
+    def __init__(self, priority: int, user: Optional[str], seq: int, wake: Callable[[], Any]):
+        self.priority = priority
+        self.user = user
+        self.seq = seq
+        self.enqueued_at = time.monotonic()
+        self.granted = False
+        self.wake = wake
+
+
+class LLMScheduler:
+    """
+    Thread-safe slot scheduler shared by the sync and async Ollama clients.
+    `slot()` / `slot_async()` hold one slot for the duration of a generation.
+    """
+
+    def __init__(self, max_concurrency: int = LLM_MAX_CONCURRENCY, max_queue: int = LLM_QUEUE_MAX,
+                 max_queue_per_user: int = LLM_QUEUE_MAX_PER_USER, queue_timeout: float = LLM_QUEUE_TIMEOUT,
+                 aging_seconds: float = LLM_PRIORITY_AGING_SECONDS):
+        self.max_concurrency = max_concurrency
+        self.max_queue = max_queue
+        self.max_queue_per_user = max_queue_per_user
+        self.queue_timeout = queue_timeout
+        self.aging_seconds = aging_seconds
+        self._lock = threading.Lock()
+        self._queue: List[_Waiter] = []
+        self._queued_by_user: Counter = Counter()
+        self._running = 0
+        self._running_by_user: Counter = Counter()
+        self._seq = 0
+        # Moving average of slot hold time, for Retry-After estimates
+        self._avg_service_seconds = 1.0
+        self._counters = {"admitted": 0, "waited": 0, "rejected": 0, "timeouts": 0}
+
+    def _retry_after(self) -> int:
+        # Roughly how long until the current queue has drained
+        waves = (len(self._queue) + 1) / max(self.max_concurrency, 1)
+        return max(1, min(60, math.ceil(waves * self._avg_service_seconds)))
+
+    def _reject(self, priority: int, reason: str, message: str) -> LLMQueueFull:
+        self._counters["rejected"] += 1
+        QUEUE_REJECTED.inc(PRIORITY_NAMES.get(priority, str(priority)), reason)
+        return LLMQueueFull(message, self._retry_after())
+
+    def _check(self, priority: int, user: Optional[str]):
+        # Must hold the lock
+        if self._running < self.max_concurrency and not self._queue:
+            return
+        if len(self._queue) >= self.max_queue:
+            raise self._reject(priority, "queue_full", "The assistant is busy, please retry shortly.")
+        if user is not None and self._queued_by_user[user] >= self.max_queue_per_user:
+            raise self._reject(priority, "user_share", "Too many requests in progress, please retry shortly.")
+
+    def check_admission(self, priority: int = PRIORITY_INTERACTIVE, user: Optional[str] = None):
+        """
+        Raises LLMQueueFull now if a call would be rejected, so a route can
+        answer 429 before it commits to a (streaming) response.
+        """
+        with self._lock:
+            self._check(priority, user if user is not None else _current_user.get())
+
+    def _admit(self, priority: int, wake: Callable[[], Any]) -> Optional[_Waiter]:
+        """Takes a free slot (returns None) or queues a waiter; raises LLMQueueFull when full."""
+        user = _current_user.get()
+        with self._lock:
+            self._check(priority, user)
+            self._counters["admitted"] += 1
+            if self._running < self.max_concurrency and not self._queue:
+                self._running += 1
+                self._running_by_user[user] += 1
+                return None
+            self._seq += 1
+            waiter = _Waiter(priority, user, self._seq, wake)
+            self._queue.append(waiter)
+            self._queued_by_user[user] += 1
+            self._counters["waited"] += 1
+            return waiter
+
+    def _effective_priority(self, waiter: _Waiter, now: float) -> int:
+        if self.aging_seconds <= 0:
+            return waiter.priority
+        return waiter.priority - int((now - waiter.enqueued_at) / self.aging_seconds)
+
+    def _dequeue(self, waiter: _Waiter):
+        self._queue.remove(waiter)
+        self._queued_by_user[waiter.user] -= 1
+        if self._queued_by_user[waiter.user] <= 0:
+            del self._queued_by_user[waiter.user]
+
+    def _dispatch(self) -> List[_Waiter]:
+        # Must hold the lock; returns the waiters to wake once it is released
+        granted = []
+        now = time.monotonic()
+        while self._queue and self._running < self.max_concurrency:
+            waiter = min(self._queue, key=lambda w: (self._effective_priority(w, now),
+                                                      self._running_by_user[w.user], w.seq))
+            self._dequeue(waiter)
+            waiter.granted = True
+            self._running += 1
+            self._running_by_user[waiter.user] += 1
+            granted.append(waiter)
+        return granted
+
+    def _release(self, user: Optional[str], held_seconds: Optional[float]):
+        with self._lock:
+            self._running -= 1
+            self._running_by_user[user] -= 1
+            if self._running_by_user[user] <= 0:
+                del self._running_by_user[user]
+            if held_seconds is not None:
+                self._avg_service_seconds = 0.8 * self._avg_service_seconds + 0.2 * held_seconds
+            granted = self._dispatch()
+        for waiter in granted:
+            waiter.wake()
+
+    def _settle(self, waiter: _Waiter) -> bool:
+        """After a wait ends: True when the slot was granted, otherwise leaves the queue."""
+        with self._lock:
+            if waiter.granted:
+                return True
+            self._dequeue(waiter)
+            return False
+
+    def _observe_wait(self, priority: int, waiter: Optional[_Waiter]):
+        waited = time.monotonic() - waiter.enqueued_at if waiter is not None else 0.0
+        QUEUE_WAIT_SECONDS.observe(waited, PRIORITY_NAMES.get(priority, str(priority)))
+
+    def _timed_out(self, priority: int) -> LLMQueueFull:
+        with self._lock:
+            self._counters["timeouts"] += 1
+            return self._reject(priority, "timeout", "The assistant is busy, please retry shortly.")
+
+    @contextmanager
+    def slot(self, priority: int = PRIORITY_NORMAL, cancel_event: Optional[threading.Event] = None):
+        """
+        Holds one slot for the enclosed (blocking) generation.
+
+        Raises:
+            LLMQueueFull: when the queue is full or the wait exceeds queue_timeout
+            OperationCancelled: when cancel_event is set while waiting
+        """
+        raise_if_cancelled(cancel_event)
+        user = _current_user.get()
+        woken = threading.Event()
+        waiter = self._admit(priority, woken.set)
+        if waiter is not None:
+            with on_cancel(cancel_event, woken.set):
+                woken.wait(self.queue_timeout or None)
+            if not self._settle(waiter):
+                raise_if_cancelled(cancel_event)
+                raise self._timed_out(priority)
+        self._observe_wait(priority, waiter)
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user, time.monotonic() - start)
+
+    @asynccontextmanager
+    async def slot_async(self, priority: int = PRIORITY_NORMAL, cancel_event: Optional[threading.Event] = None):
+        """asyncio counterpart of slot(); waiting never blocks the event loop."""
+        raise_if_cancelled(cancel_event)
+        loop = asyncio.get_running_loop()
+        user = _current_user.get()
+        woken = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: woken.done() or woken.set_result(None))
+            except RuntimeError:
+                pass  # loop already closed
+
+        waiter = self._admit(priority, wake)
+        if waiter is not None:
+            try:
+                with on_cancel(cancel_event, wake):
+                    await asyncio.wait_for(asyncio.shield(woken), self.queue_timeout or None)
+            except asyncio.TimeoutError:
+                pass
+            except asyncio.CancelledError:
+                if self._settle(waiter):
+                    self._release(user, None)
+                raise
+            if not self._settle(waiter):
+                raise_if_cancelled(cancel_event)
+                raise self._timed_out(priority)
+        self._observe_wait(priority, waiter)
+
+        start = time.monotonic()
+        try:
+            yield
+        finally:
+            self._release(user, time.monotonic() - start)
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            queued_by_priority = Counter(PRIORITY_NAMES.get(w.priority, str(w.priority)) for w in self._queue)
+            return {
+                "max_concurrency": self.max_concurrency,
+                "running": self._running,
+                "queued": len(self._queue),
+                "queued_by_priority": dict(queued_by_priority),
+                "users_waiting": len(self._queued_by_user),
+                "max_queue": self.max_queue,
+                "max_queue_per_user": self.max_queue_per_user,
+                "queue_timeout_seconds": self.queue_timeout,
+                "avg_service_seconds": round(self._avg_service_seconds, 3),
+                "retry_after_seconds": self._retry_after(),
+                **self._counters,
+            }
+
+
+# Shared instance: one queue in front of the single Ollama instance
+llm_scheduler = LLMScheduler()
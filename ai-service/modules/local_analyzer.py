@@ -0,0 +1,206 @@
+"""
+Local Analyzer Module
+
+Deterministic replacement for the analysis LLM call when the result shape
+decides the answer on its own. Columns are classified from their dtypes and
+names (time axis, numeric measure, category / identifier), the chart type and
+axes follow from that, and the one-sentence summary is filled from NumPy
+statistics (min / max / mean, linear trend, peak timestamp or top category).
+
+- time axis + one measure          -> line (a single series only)
+- one category + one measure       -> bar (one row per category)
+- a single row, or no measure      -> table
+- anything else (several candidate measures, several series, ...) is
+  ambiguous and falls through to the LLM, like intent_rules does for intents.
+"""
+
+import os
+import re
+from typing import Any, Dict, List, NamedTuple, Optional
+
+import numpy as np
+import pandas as pd
+
+LOCAL_ANALYZER_ENABLED = os.getenv("LOCAL_ANALYZER_ENABLED", "true").lower() == "true"
+# More categories than this are shown as a table rather than a bar chart
+LOCAL_ANALYZER_MAX_BARS = int(os.getenv("LOCAL_ANALYZER_MAX_BARS", "50"))
+
+# Name hints of llm_router.suggest_visualization, matched per word so that
+# e.g. "counts" is not taken for a timestamp
+TIME_WORDS = {"date", "time", "ts", "day", "hour", "week", "month", "year", "datetime", "timestamp"}
+ID_NAME = re.compile(r"(^|_)id$|^id_")
+# Fitted change over the series, as a share of its range, below which it is called flat
+FLAT_TREND = 0.02
+_TOKEN_RE = re.compile(r"[a-z0-9]+")
+
+
+class AnalysisDecision(NamedTuple):
+    insight: Optional[Dict[str, Any]]  # None when the shape is ambiguous
+    rule: str
+
+
+def _label(column: str) -> str:
+    return str(column).replace("_", " ")
+
+
+def _fmt(value: float) -> str:
+    if np.isfinite(value) and float(value).is_integer() and abs(value) < 1e15:
+        return f"{value:,.0f}"
+    return f"{value:,.2f}"
+
+
+def _fmt_x(value: Any) -> str:
+    if isinstance(value, (np.datetime64, pd.Timestamp)):
+        ts = pd.Timestamp(value)
+        return ts.strftime("%Y-%m-%d") if ts == ts.normalize() else ts.strftime("%Y-%m-%d %H:%M")
+    return str(value)
+
+
+def _time_axis(series: pd.Series) -> Optional[np.ndarray]:
+    """Numeric sort key for a time-like column, or None when it is not one."""
+    kind = series.dtype.kind
+    if kind == "M":
+        return series.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    if not TIME_WORDS & set(_TOKEN_RE.findall(str(series.name).lower())):
+        return None
+    if kind in "iuf":
+        # hour / day / year numbers are an ordinal axis
+        return series.to_numpy(dtype=np.float64, na_value=np.nan)
+    if kind in "OSU":
+        sample = series.head(20)
+        if pd.to_datetime(sample, errors="coerce").isna().any():
+            return None
+        parsed = pd.to_datetime(series, errors="coerce")
+        if parsed.isna().any():
+            return None
+        return parsed.to_numpy(dtype="datetime64[ns]").astype(np.int64)
+    return None
+
+
+def _is_measure(series: pd.Series) -> bool:
+    return series.dtype.kind in "iuf" and not ID_NAME.search(str(series.name).lower())
+
+
+def _pick_measure(measures: List[str], query: str) -> Optional[str]:
+    """The only measure, or the one whose name shares the most words with the query."""
+    if len(measures) == 1:
+        return measures[0]
+    words = set(_TOKEN_RE.findall(query.lower()))
+    scores = [len(set(_TOKEN_RE.findall(str(m).lower())) & words) for m in measures]
+    best = max(scores)
+    return measures[scores.index(best)] if best and scores.count(best) == 1 else None
+
+
+def _line_summary(df: pd.DataFrame, x_col: str, y_col: str, axis: np.ndarray) -> str:
+    order = np.argsort(axis, kind="stable")
+    y = df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)[order]
+    x = df[x_col].to_numpy()[order]
+    finite = np.isfinite(y)
+    y, x = y[finite], x[finite]
+    if len(y) == 0:
+        return f"No numeric {_label(y_col)} values were returned."
+
+    lo, hi, mean = float(y.min()), float(y.max()), float(y.mean())
+    text = (f"{_label(y_col).capitalize()} ranged from {_fmt(lo)} to {_fmt(hi)} (mean {_fmt(mean)}) "
+            f"over {len(y)} points from {_fmt_x(x[0])} to {_fmt_x(x[-1])}")
+    if len(y) > 1:
+        slope = np.polyfit(np.arange(len(y), dtype=np.float64), y, 1)[0]
+        change = slope * (len(y) - 1)
+        scale = hi - lo
+        if not scale or abs(change) < FLAT_TREND * scale:
+            trend = "roughly flat"
+        elif lo >= 0 and mean > 0:
+            trend = f"trending {'up' if change > 0 else 'down'} {abs(change) / mean * 100:.1f}%"
+        else:
+            # A percentage of a mean near (or crossing) zero means nothing
+            trend = f"trending {'up' if change > 0 else 'down'} by {_fmt(abs(change))}"
+        text += f", {trend}"
+    return text + f"; the peak of {_fmt(hi)} was at {_fmt_x(x[int(np.argmax(y))])}."
+
+
+def _bar_summary(df: pd.DataFrame, x_col: str, y_col: str) -> str:
+    y = df[y_col].to_numpy(dtype=np.float64, na_value=np.nan)
+    finite = np.isfinite(y)
+    if not finite.any():
+        return f"No numeric {_label(y_col)} values were returned."
+    x = df[x_col].to_numpy()[finite]
+    y = y[finite]
+    top, bottom = int(np.argmax(y)), int(np.argmin(y))
+    return (f"{_fmt_x(x[top])} has the highest {_label(y_col)} ({_fmt(float(y[top]))}) and "
+            f"{_fmt_x(x[bottom])} the lowest ({_fmt(float(y[bottom]))}) across {len(y)} {_label(x_col)} values; "
+            f"mean {_fmt(float(y.mean()))}.")
+
+
+def _row_summary(df: pd.DataFrame, measures: List[str]) -> str:
+    parts = []
+    for col in measures or df.columns:
+        value = df[col].iloc[0]
+        parts.append(f"{_label(col)}: {_fmt(float(value)) if col in measures and pd.notna(value) else value}")
+    return ", ".join(parts).capitalize() + "."
+
+
+def classify(df: pd.DataFrame, query: str = "") -> AnalysisDecision:
+    """
+    Infers the visualization and summary from the result shape.
+    Returns insight=None when the shape is ambiguous (caller should ask the LLM).
+    """
+    if df.empty:
+        return AnalysisDecision({"summary": "No data found matching your query.", "visualization_type": "table"}, "empty")
+
+    times, measures, categories = [], [], []
+    axes = {}
+    for col in df.columns:
+        series = df[col]
+        axis = _time_axis(series)
+        if axis is not None:
+            times.append(col)
+            axes[col] = axis
+        elif _is_measure(series):
+            measures.append(col)
+        elif series.dtype.kind != "b":
+            categories.append(col)
+
+    if not measures:
+        return AnalysisDecision({
+            "summary": f"Found {len(df)} matching row{'s' if len(df) != 1 else ''}.",
+            "visualization_type": "table",
+        }, "no_measure")
+
+    if len(df) == 1:
+        return AnalysisDecision({"summary": _row_summary(df, measures), "visualization_type": "table"}, "single_row")
+
+    y_col = _pick_measure(measures, query)
+    if y_col is None:
+        return AnalysisDecision(None, "several_measures")
+
+    if times:
+        # Another varying dimension (meter, user, category) means several series
+        if any(df[c].nunique(dropna=False) > 1 for c in categories):
+            return AnalysisDecision(None, "multi_series")
+        x_col = times[0]
+        return AnalysisDecision({
+            "summary": _line_summary(df, x_col, y_col, axes[x_col]),
+            "visualization_type": "line",
+            "x_column": x_col,
+            "y_column": y_col,
+        }, "time_series")
+
+    if len(categories) == 1:
+        x_col = categories[0]
+        if len(df) > LOCAL_ANALYZER_MAX_BARS or df[x_col].nunique(dropna=False) != len(df):
+            return AnalysisDecision(None, "category_not_unique")
+        return AnalysisDecision({
+            "summary": _bar_summary(df, x_col, y_col),
+            "visualization_type": "bar",
+            "x_column": x_col,
+            "y_column": y_col,
+        }, "category_measure")
+
+    return AnalysisDecision(None, "ambiguous_shape")
+
+
+def decide(df: pd.DataFrame, query: str = "") -> AnalysisDecision:
+    """classify() unless LOCAL_ANALYZER_ENABLED is off."""
+    if not LOCAL_ANALYZER_ENABLED:
+        return AnalysisDecision(None, "analyzer_disabled")
+    return classify(df, query)
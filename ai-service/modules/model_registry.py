@@ -0,0 +1,241 @@
+"""
+Model Registry Module
+
+Keeps the revenue forecasting model and its scalers resident in memory.
+Artifacts are loaded once per process and transparently reloaded when the
+file on disk changes (mtime based), so retraining does not need a restart.
+
+Two backends are supported, selected with FORECAST_BACKEND:
+- "numpy": pure NumPy forward pass over `revenue_model.npz` (no TensorFlow)
+- "keras": the original `revenue_model.keras` + `scaler.pkl`
+- "auto" (default): NumPy when the `.npz` export exists, Keras otherwise
+
+The NumPy export is tied to its sources: it records a SHA-256 of
+`revenue_model.keras` and `scaler.pkl`, and when that no longer matches the
+files on disk (or the export predates the digest) it is re-exported on the
+next load; the Keras backend serves instead if the re-export fails. Content
+hashes rather than mtimes, since a fresh clone gives every file a new mtime.
+"""
+
+import os
+import time
+import threading
+from typing import Any, Dict, Optional, Tuple
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+from modules.numpy_model import (
+    NumpyRevenueModel, export_keras_model, read_source_digest, source_digest, MODEL_PATH, SCALER_PATH, NPZ_PATH,
+)
+
+FORECAST_BACKEND = os.getenv("FORECAST_BACKEND", "auto").lower()
+
+
+def _mtime(path: str) -> Optional[float]:
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return None
+
+
+def _file_key(*paths: str) -> Optional[Tuple]:
+    """(size, mtime_ns) of each file, or None if one is missing. Keys the digest caches."""
+    try:
+        return tuple((st.st_size, st.st_mtime_ns) for st in map(os.stat, paths))
+    except OSError:
+        return None
+
+
+class KerasRevenueModel:
+    """
+    Keras model plus the (scaler_X, scaler_y) pair. TensorFlow is imported
+    only when this backend is actually instantiated.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH):
+        import joblib
+        from tensorflow import keras
+
+        self.model = keras.models.load_model(model_path)
+        self.scaler_X, self.scaler_y = joblib.load(scaler_path)
+
+    def predict(self, features_raw) -> Any:
+        features_scaled = self.scaler_X.transform(features_raw)
+        revenue_scaled = self.model.predict(features_scaled, verbose=0)
+        return self.scaler_y.inverse_transform(revenue_scaled)
+
+
+class RevenueModelRegistry:
+    """
+    Process-wide holder for the revenue model.
+
+    Thread-safe: concurrent requests share one loaded instance and only one
+    thread performs a (re)load at a time.
+    """
+
+    def __init__(self, model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH,
+                 npz_path: str = NPZ_PATH, backend: str = FORECAST_BACKEND):
+        self.model_path = model_path
+        self.scaler_path = scaler_path
+        self.npz_path = npz_path
+        self.backend = backend
+        self._lock = threading.Lock()
+        self._model = None
+        self._active_backend = None
+        self._loaded_mtimes = None
+        # Source mtimes for which re-exporting the .npz failed
+        self._export_failed_mtimes = None
+        # (file key, digest) pairs, so files are only re-hashed after they change
+        self._source_digest = (None, None)
+        self._export_digest = (None, None)
+
+        # Timing stats (seconds)
+        self._stats = {
+            "loads": 0,
+            "last_load_seconds": None,
+            "total_load_seconds": 0.0,
+            "inferences": 0,
+            "last_inference_seconds": None,
+            "total_inference_seconds": 0.0,
+        }
+
+    def _npz_outdated(self) -> bool:
+        """True when the NumPy export was not made from the current Keras model and scalers."""
+        npz_key = _file_key(self.npz_path)
+        source_key = _file_key(self.model_path, self.scaler_path)
+        if npz_key is None or source_key is None:
+            return False
+        if self._source_digest[0] != source_key:
+            self._source_digest = (source_key, source_digest(self.model_path, self.scaler_path))
+        if self._export_digest[0] != npz_key:
+            self._export_digest = (npz_key, read_source_digest(self.npz_path))
+        return self._export_digest[1] != self._source_digest[1]
+
+    def _resolve_backend(self) -> str:
+        if self.backend == "keras":
+            return "keras"
+        if not os.path.exists(self.npz_path):
+            if self.backend == "numpy":
+                logger.warning(f"{self.npz_path} missing; falling back to Keras backend.")
+            return "keras"
+        if self._npz_outdated() and self._export_failed_mtimes == self._mtimes("numpy"):
+            # Re-exporting these sources already failed; serve the retrained Keras model
+            return "keras"
+        return "numpy"
+
+    def _source_paths(self, backend: str) -> Tuple[str, ...]:
+        if backend == "numpy":
+            # The sources are watched too, so retraining invalidates the export
+            return (self.npz_path, self.model_path, self.scaler_path)
+        return (self.model_path, self.scaler_path)
+
+    def _mtimes(self, backend: str) -> Tuple[Optional[float], ...]:
+        return tuple(_mtime(p) for p in self._source_paths(backend))
+
+    def model_exists(self) -> bool:
+        if self._resolve_backend() == "numpy":
+            return os.path.exists(self.npz_path)
+        return all(os.path.exists(p) for p in self._source_paths("keras"))
+
+    def _is_stale(self) -> bool:
+        if self._model is None:
+            return True
+        backend = self._resolve_backend()
+        if backend != self._active_backend:
+            return True
+        return self._mtimes(backend) != self._loaded_mtimes
+
+    def _reexport(self) -> bool:
+        """Re-exports an outdated .npz from the Keras sources. Caller must hold the lock."""
+        try:
+            export_keras_model(self.model_path, self.scaler_path, self.npz_path)
+        except Exception as e:
+            self._export_failed_mtimes = self._mtimes("numpy")
+            logger.warning(f"{self.npz_path} does not match {self.model_path} / {self.scaler_path} and could not be "
+                           f"re-exported ({e}); falling back to Keras backend.")
+            return False
+        logger.info(f"Re-exported {self.npz_path} from the retrained Keras model")
+        return True
+
+    def _load(self):
+        """Deserializes the model from disk. Caller must hold the lock."""
+        backend = self._resolve_backend()
+
+        start = time.perf_counter()
+        if backend == "numpy" and self._npz_outdated() and not self._reexport():
+            backend = "keras"
+        mtimes = self._mtimes(backend)
+        if backend == "numpy":
+            model = NumpyRevenueModel(self.npz_path)
+        else:
+            model = KerasRevenueModel(self.model_path, self.scaler_path)
+        elapsed = time.perf_counter() - start
+
+        self._model = model
+        self._active_backend = backend
+        self._loaded_mtimes = mtimes
+        self._stats["loads"] += 1
+        self._stats["last_load_seconds"] = elapsed
+        self._stats["total_load_seconds"] += elapsed
+        logger.info(f"Revenue model ({backend}) loaded in {elapsed:.3f}s (load #{self._stats['loads']})")
+
+    def get(self):
+        """
+        Returns the active model, loading or reloading it if needed.
+        """
+        if self._is_stale():
+            with self._lock:
+                if self._is_stale():
+                    self._load()
+        return self._model
+
+    def predict(self, features_raw) -> Any:
+        """
+        Runs the model on raw (unscaled) features.
+
+        Args:
+            features_raw: 2-D array-like of [total_load, month, weekday] rows
+
+        Returns:
+            2-D NumPy array of predicted revenue in original units
+        """
+        model = self.get()
+
+        start = time.perf_counter()
+        revenue = model.predict(features_raw)
+        elapsed = time.perf_counter() - start
+
+        with self._lock:
+            self._stats["inferences"] += 1
+            self._stats["last_inference_seconds"] = elapsed
+            self._stats["total_inference_seconds"] += elapsed
+        logger.info(f"Revenue inference took {elapsed * 1000:.1f}ms")
+        return revenue
+
+    def warmup(self) -> bool:
+        """
+        Loads the artifacts and runs one dummy prediction so the first real
+        request does not pay load or graph construction cost.
+        """
+        if not self.model_exists():
+            logger.warning("Revenue model artifacts not found; skipping warmup.")
+            return False
+        try:
+            self.predict([[0.0, 1, 0]])
+            return True
+        except Exception as e:
+            logger.error(f"Revenue model warmup failed: {e}")
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "loaded": self._model is not None,
+            "configured_backend": self.backend,
+            "active_backend": self._active_backend,
+            **self._stats,
+        }
+
+
+# Shared instance used by the forecasting engine
+revenue_model = RevenueModelRegistry()
@@ -0,0 +1,204 @@
+"""
+NumPy Revenue Model Module
+
+Runs the revenue forecasting network as a plain NumPy forward pass so that
+serving does not need TensorFlow. The dense-layer weights and the MinMax
+scaler parameters are exported once from the Keras artifacts into a compact
+`.npz` file, which records a SHA-256 of those sources so a stale export
+can be detected without relying on file mtimes.
+
+Export (TensorFlow is optional; without it the weights are read straight
+from the `.keras` archive via h5py):
+
+    python -m modules.numpy_model
+"""
+
+import os
+import io
+import json
+import hashlib
+import zipfile
+import argparse
+import numpy as np
+from typing import List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+BASE_DIR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+MODEL_PATH = os.path.join(BASE_DIR, "models", "revenue_model.keras")
+SCALER_PATH = os.path.join(BASE_DIR, "models", "scaler.pkl")
+NPZ_PATH = os.path.join(BASE_DIR, "models", "revenue_model.npz")
+
+ACTIVATIONS = {
+    "linear": lambda x: x,
+    "relu": lambda x: np.maximum(x, 0.0),
+    "sigmoid": lambda x: 1.0 / (1.0 + np.exp(-x)),
+    "tanh": np.tanh,
+}
+
+
+class NumpyRevenueModel:
+    """
+    Dense feed-forward network plus MinMax scaling, evaluated with NumPy.
+    """
+
+    def __init__(self, npz_path: str = NPZ_PATH):
+        with np.load(npz_path, allow_pickle=False) as data:
+            n_layers = int(data["n_layers"])
+            self.weights = [data[f"W{i}"] for i in range(n_layers)]
+            self.biases = [data[f"b{i}"] for i in range(n_layers)]
+            self.activations = [str(a) for a in data["activations"]]
+            self.x_min = data["x_min"]
+            self.x_scale = data["x_scale"]
+            self.y_min = data["y_min"]
+            self.y_scale = data["y_scale"]
+
+        for name in self.activations:
+            if name not in ACTIVATIONS:
+                raise ValueError(f"Unsupported activation in {npz_path}: {name}")
+
+    def predict(self, features_raw) -> np.ndarray:
+        """
+        Args:
+            features_raw: 2-D array-like of [total_load, month, weekday] rows
+
+        Returns:
+            2-D NumPy array of predicted revenue in original units
+        """
+        x = np.asarray(features_raw, dtype=np.float64)
+        # MinMaxScaler.transform: X * scale_ + min_
+        h = x * self.x_scale + self.x_min
+        for W, b, act in zip(self.weights, self.biases, self.activations):
+            h = ACTIVATIONS[act](h @ W + b)
+        # MinMaxScaler.inverse_transform: (X - min_) / scale_
+        return (h - self.y_min) / self.y_scale
+
+
+def _read_keras_layers(model_path: str) -> List[Tuple[np.ndarray, np.ndarray, str]]:
+    """
+    Extracts (kernel, bias, activation) for each Dense layer of a `.keras` model.
+    Uses Keras when installed, otherwise parses the archive directly.
+    """
+    try:
+        from tensorflow import keras
+    except ImportError:
+        keras = None
+
+    if keras is not None:
+        model = keras.models.load_model(model_path)
+        layers = []
+        for layer in model.layers:
+            if layer.__class__.__name__ != "Dense":
+                continue
+            kernel, bias = layer.get_weights()
+            layers.append((kernel, bias, layer.activation.__name__))
+        return layers
+
+    import h5py
+
+    with zipfile.ZipFile(model_path) as archive:
+        config = json.loads(archive.read("config.json"))
+        weights_blob = archive.read("model.weights.h5")
+
+    layers = []
+    with h5py.File(io.BytesIO(weights_blob), "r") as weights:
+        for layer in config["config"]["layers"]:
+            if layer["class_name"] != "Dense":
+                continue
+            name = layer["config"]["name"]
+            group = weights["layers"][name]["vars"]
+            layers.append((group["0"][()], group["1"][()], layer["config"]["activation"]))
+    return layers
+
+
+def source_digest(model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH) -> str:
+    """SHA-256 over the Keras model and scaler files, in that order."""
+    digest = hashlib.sha256()
+    for path in (model_path, scaler_path):
+        with open(path, "rb") as f:
+            for chunk in iter(lambda: f.read(1 << 20), b""):
+                digest.update(chunk)
+    return digest.hexdigest()
+
+
+def read_source_digest(npz_path: str = NPZ_PATH) -> Optional[str]:
+    """Returns the source digest stored in an export, or None for exports that predate it."""
+    with np.load(npz_path, allow_pickle=False) as data:
+        return str(data["source_sha256"]) if "source_sha256" in data.files else None
+
+
+def export_keras_model(model_path: str = MODEL_PATH, scaler_path: str = SCALER_PATH,
+                       npz_path: str = NPZ_PATH) -> str:
+    """
+    Writes the dense weights and scaler parameters to a compressed `.npz`.
+
+    Returns:
+        The path of the written file
+    """
+    import joblib
+
+    layers = _read_keras_layers(model_path)
+    if not layers:
+        raise ValueError(f"No Dense layers found in {model_path}")
+    scaler_X, scaler_y = joblib.load(scaler_path)
+
+    arrays = {
+        "n_layers": np.array(len(layers)),
+        "activations": np.array([act for _, _, act in layers]),
+        "x_min": np.asarray(scaler_X.min_, dtype=np.float64),
+        "x_scale": np.asarray(scaler_X.scale_, dtype=np.float64),
+        "y_min": np.asarray(scaler_y.min_, dtype=np.float64),
+        "y_scale": np.asarray(scaler_y.scale_, dtype=np.float64),
+        "source_sha256": np.array(source_digest(model_path, scaler_path)),
+    }
+    for i, (kernel, bias, _) in enumerate(layers):
+        arrays[f"W{i}"] = np.asarray(kernel, dtype=np.float32)
+        arrays[f"b{i}"] = np.asarray(bias, dtype=np.float32)
+
+    np.savez_compressed(npz_path, **arrays)
+    logger.info(f"Exported {len(layers)} dense layers to {npz_path}")
+    return npz_path
+
+
+def verify_against_keras(npz_path: str = NPZ_PATH, model_path: str = MODEL_PATH,
+                         scaler_path: str = SCALER_PATH, rtol: float = 1e-4) -> float:
+    """
+    Compares NumPy and Keras predictions on a grid of synthetic inputs.
+    Requires TensorFlow.
+
+    Returns:
+        The maximum relative difference observed
+    """
+    import joblib
+    from tensorflow import keras
+
+    model = keras.models.load_model(model_path)
+    scaler_X, scaler_y = joblib.load(scaler_path)
+
+    loads = np.linspace(scaler_X.data_min_[0], scaler_X.data_max_[0], 25)
+    grid = np.array([[load, month, weekday]
+                     for load in loads for month in range(1, 13) for weekday in range(7)])
+
+    expected = scaler_y.inverse_transform(model.predict(scaler_X.transform(grid), verbose=0))
+    actual = NumpyRevenueModel(npz_path).predict(grid)
+
+    max_rel = float(np.max(np.abs(actual - expected) / np.maximum(np.abs(expected), 1e-9)))
+    if max_rel > rtol:
+        raise AssertionError(f"NumPy model deviates from Keras: max relative diff {max_rel:.2e}")
+    return max_rel
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Export the revenue model to NumPy format.")
+    parser.add_argument("--model", default=MODEL_PATH)
+    parser.add_argument("--scaler", default=SCALER_PATH)
+    parser.add_argument("--out", default=NPZ_PATH)
+    parser.add_argument("--verify", action="store_true", help="Compare against Keras (needs TensorFlow)")
+    args = parser.parse_args()
+
+    path = export_keras_model(args.model, args.scaler, args.out)
+    print(f"✅ Exported NumPy revenue model: {path}")
+    if args.verify:
+        diff = verify_against_keras(args.out, args.model, args.scaler)
+        print(f"✅ Matches Keras predictions (max relative diff {diff:.2e})")
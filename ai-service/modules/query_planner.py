@@ -0,0 +1,180 @@
+"""
+Query Planner Module
+
+Optional "single-shot" mode (PLANNER_MODE=single_shot) that replaces the
+serial intent -> SQL / date-extraction LLM calls with one structured prompt
+returning a JSON plan:
+
+    {
+        "intent": "SQL_QUERY" | "REVENUE_FORECAST",
+        "sql": "SELECT ..."                      (SQL_QUERY only),
+        "dates": ["YYYY-MM-DD", ...] | "YYYY-MM-DD to YYYY-MM-DD" (REVENUE_FORECAST only),
+        "visualization": {"type": "line" | "bar" | "table", "x_column": str, "y_column": str}
+    }
+
+The plan is validated against this schema; any parsing or validation failure
+returns None so callers fall back to the multi-call path.
+"""
+
+import os
+import re
+import json
+from datetime import datetime
+from typing import Any, Dict, Optional
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+from modules import llm_router, intent_rules, forecasting_engine, tracing
+from modules.sql_cache import sql_cache
+from modules.llm_scheduler import PRIORITY_INTERACTIVE
+
+PLANNER_MODE = os.getenv("PLANNER_MODE", "off").lower()
+PLANNER_ENABLED = PLANNER_MODE == "single_shot"
+
+INTENTS = {"SQL_QUERY", "REVENUE_FORECAST"}
+VISUALIZATIONS = {"line", "bar", "table"}
+
+
+class PlanValidationError(ValueError):
+    """Raised when the LLM plan does not match the expected schema."""
+
+
+def _plan_prompt(query):
+    now = datetime.now()
+    current_time = now.strftime("%Y-%m-%d %H:%M:%S")
+    current_day = now.strftime("%A")
+
+    return f"""
+    Role: Query Planner for a utility analytics assistant.
+    Context: Today is {current_time} ({current_day}).
+    Schema:
+    - meter_users (username VARCHAR, meter_id INTEGER)
+    - meter_loads (meter_id INTEGER, date_time TIMESTAMPTZ, forecasted_load DOUBLE PRECISION)
+
+    Step 1 - intent:
+    - "REVENUE_FORECAST" if the query is about REVENUE ($) AND a future date.
+    - "SQL_QUERY" otherwise (including any question about load, power, usage, demand or consumption).
+
+    Step 2 - if SQL_QUERY, write PostgreSQL SQL in "sql":
+    1. If the query asks for "load", "power", or "usage" WITHOUT specifying a meter_id or username, you MUST aggregate.
+       - Use: `SELECT date_time, SUM(forecasted_load) as total_load FROM meter_loads GROUP BY date_time ORDER BY date_time`
+    2. Do NOT select `meter_id` unless explicitly asked using "meter 1001" or "my meter".
+    3. Always order by date_time.
+
+    Step 2 - if REVENUE_FORECAST, put the target dates in "dates":
+    - A single day or separate days: a list of "YYYY-MM-DD" strings.
+    - A period ("next week", "next 30 days"): the string "YYYY-MM-DD to YYYY-MM-DD" (inclusive).
+    - "Tomorrow" = today + 1 day. DO NOT CHANGE THE YEAR unless the query explicitly says "next year".
+
+    Step 3 - "visualization": {{"type": "line" | "bar" | "table", "x_column": "...", "y_column": "..."}}
+    - "line" for a DATE/TIME column with a NUMERIC column, "bar" for a CATEGORY column with a NUMERIC column.
+
+    Output a single JSON object with keys "intent", "sql", "dates", "visualization". JSON ONLY.
+    Query: {query}
+    """
+
+
+def validate_plan(data: Any, query: str) -> Dict[str, Any]:
+    """
+    Checks a decoded plan against the schema and normalizes it.
+
+    Raises:
+        PlanValidationError: describing the first problem found
+    """
+    if not isinstance(data, dict):
+        raise PlanValidationError("plan is not a JSON object")
+
+    intent = data.get("intent")
+    if intent not in INTENTS:
+        raise PlanValidationError(f"invalid intent: {intent!r}")
+
+    # Same safety net as classify_intent: the revenue engine cannot answer load questions
+    if intent == "REVENUE_FORECAST" and intent_rules.LOAD_TERMS.search(query.lower()):
+        raise PlanValidationError("REVENUE_FORECAST planned for a load question")
+
+    plan = {"intent": intent, "sql": "", "dates": [], "visualization": None}
+
+    if intent == "SQL_QUERY":
+        sql = data.get("sql")
+        if not isinstance(sql, str):
+            raise PlanValidationError("sql must be a string")
+        sql = re.sub(r"^```(?:sql)?|```$", "", sql.strip(), flags=re.IGNORECASE).strip()
+        if not re.match(r"^(SELECT|WITH)\b", sql, re.IGNORECASE):
+            raise PlanValidationError("sql must start with SELECT or WITH")
+        plan["sql"] = sql
+    else:
+        dates = data.get("dates")
+        if isinstance(dates, list) and all(isinstance(d, str) for d in dates):
+            dates = ", ".join(dates)
+        if not isinstance(dates, str):
+            raise PlanValidationError("dates must be a list of strings or a 'START to END' string")
+        parsed, error = forecasting_engine.parse_target_dates(dates)
+        if not parsed:
+            raise PlanValidationError(error or "no valid dates")
+        plan["dates"] = parsed
+
+    vis = data.get("visualization")
+    if isinstance(vis, dict) and str(vis.get("type", "")).lower() in VISUALIZATIONS:
+        plan["visualization"] = {
+            "visualization_type": str(vis["type"]).lower(),
+            "x_column": vis.get("x_column") if isinstance(vis.get("x_column"), str) else None,
+            "y_column": vis.get("y_column") if isinstance(vis.get("y_column"), str) else None,
+        }
+
+    return plan
+
+
+def _parse_plan(resp, query) -> Optional[Dict[str, Any]]:
+    try:
+        json_match = re.search(r"\{.*\}", resp, re.DOTALL)
+        if not json_match:
+            raise PlanValidationError("no JSON object in response")
+        plan = validate_plan(json.loads(json_match.group(0)), query)
+    except (ValueError, PlanValidationError) as e:
+        logger.warning(f"Planner output rejected ({e}); falling back to multi-call path")
+        return None
+
+    if plan["intent"] == "SQL_QUERY":
+        sql_cache.put(query, llm_router.SQL_PROMPT_VERSION, plan["sql"], resp)
+    logger.info(f"Planner: {plan['intent']} sql={plan['sql']!r} dates={plan['dates'][:3]}")
+    return plan
+
+
+def _fast_plan(query) -> Optional[Dict[str, Any]]:
+    """
+    Builds a plan without the LLM when the intent rules are confident and the
+    SQL is already cached.
+    """
+    decision = intent_rules.decide(query)
+    if decision.intent != "SQL_QUERY":
+        return None
+    cached = sql_cache.get(query, llm_router.SQL_PROMPT_VERSION)
+    if not cached:
+        return None
+    logger.info(f"Planner: served from rules ({decision.rule}) + SQL cache")
+    return {"intent": "SQL_QUERY", "sql": cached[0], "dates": [], "visualization": None}
+
+
+@tracing.traced("plan_query")
+def plan_query(query, model_type="local", cancel_event=None) -> Optional[Dict[str, Any]]:
+    """
+    Returns a validated plan, or None when the caller should use the multi-call path.
+    """
+    plan = _fast_plan(query)
+    if plan:
+        return plan
+    resp = llm_router.call_llm(_plan_prompt(query), model_type, cancel_event=cancel_event,
+                               priority=PRIORITY_INTERACTIVE)
+    return _parse_plan(resp, query)
+
+
+@tracing.traced("plan_query")
+async def plan_query_async(query, model_type="local", cancel_event=None) -> Optional[Dict[str, Any]]:
+    """Async counterpart of plan_query."""
+    plan = _fast_plan(query)
+    if plan:
+        return plan
+    resp = await llm_router.call_llm_async(_plan_prompt(query), model_type, cancel_event=cancel_event,
+                                           priority=PRIORITY_INTERACTIVE)
+    return _parse_plan(resp, query)
@@ -0,0 +1,176 @@
+"""
+Result Cache Module
+
+Caches the results of executed SELECT statements.
+
+- Keyed by normalized SQL text plus bound parameters.
+- Bounded by total size in bytes (LRU eviction), not by entry count.
+- Results are stored as compact NumPy columns (ColumnarResult).
+- Entries are invalidated when a write touches a table they read from
+  (see db_manager.execute_query), through invalidate(), or after a TTL, which
+  covers writes made outside this service (e.g. the load forecast ETL).
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, FrozenSet, Optional, Tuple
+
+import pandas as pd
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+from modules.db.columnar import ColumnarResult
+
+RESULT_CACHE_ENABLED = os.getenv("RESULT_CACHE_ENABLED", "true").lower() == "true"
+RESULT_CACHE_MAX_BYTES = int(os.getenv("RESULT_CACHE_MAX_BYTES", str(64 * 1024 * 1024)))
+RESULT_CACHE_TTL_SECONDS = float(os.getenv("RESULT_CACHE_TTL_SECONDS", "300"))
+
+_TABLE_REF = re.compile(r"\b(?:FROM|JOIN)\s+([A-Za-z_][\w.\"]*)", re.IGNORECASE)
+_WRITE_TARGET = re.compile(
+    r"^\s*(?:INSERT\s+INTO|UPDATE|DELETE\s+FROM|TRUNCATE(?:\s+TABLE)?|ALTER\s+TABLE|DROP\s+TABLE(?:\s+IF\s+EXISTS)?)\s+([A-Za-z_][\w.\"]*)",
+    re.IGNORECASE,
+)
+
+
+def normalize_sql(sql: str) -> str:
+    """Collapses whitespace and drops a trailing semicolon."""
+    return " ".join(sql.split()).rstrip(";").strip()
+
+
+def _table_name(raw: str) -> str:
+    return raw.replace('"', "").split(".")[-1].lower()
+
+
+def referenced_tables(sql: str) -> FrozenSet[str]:
+    """Tables read by a SELECT (FROM / JOIN targets)."""
+    return frozenset(_table_name(t) for t in _TABLE_REF.findall(sql))
+
+
+def written_table(sql: str) -> Optional[str]:
+    """Table modified by a write statement, or None if it cannot be determined."""
+    match = _WRITE_TARGET.match(sql)
+    return _table_name(match.group(1)) if match else None
+
+
+class _Entry:
+    __slots__ = ("result", "tables", "created_at")
+
+    def __init__(self, result: ColumnarResult, tables: FrozenSet[str]):
+        self.result = result
+        self.tables = tables
+        self.created_at = time.time()
+
+
+class ResultCache:
+    """
+    Thread-safe, byte-bounded LRU cache of SELECT results.
+    """
+
+    def __init__(self, max_bytes: int = RESULT_CACHE_MAX_BYTES, ttl_seconds: float = RESULT_CACHE_TTL_SECONDS,
+                 enabled: bool = RESULT_CACHE_ENABLED):
+        self.max_bytes = max_bytes
+        self.ttl_seconds = ttl_seconds
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "misses": 0, "evictions": 0, "invalidations": 0, "rejected_too_large": 0}
+
+    @staticmethod
+    def _key(sql: str, params: Optional[tuple]) -> Tuple[str, str]:
+        return normalize_sql(sql), repr(params)
+
+    def _drop(self, key):
+        entry = self._entries.pop(key)
+        self._bytes -= entry.result.nbytes
+
+    def get_result(self, sql: str, params: Optional[tuple] = None) -> Optional[ColumnarResult]:
+        """Returns the cached columnar result, or None on a miss."""
+        if not self.enabled:
+            return None
+
+        key = self._key(sql, params)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None and time.time() - entry.created_at > self.ttl_seconds:
+                self._drop(key)
+                entry = None
+            if entry is None:
+                self._counters["misses"] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._counters["hits"] += 1
+            return entry.result
+
+    def get(self, sql: str, params: Optional[tuple] = None) -> Optional[pd.DataFrame]:
+        result = self.get_result(sql, params)
+        return result.to_dataframe() if result is not None else None
+
+    def put_result(self, sql: str, params: Optional[tuple], result: ColumnarResult):
+        if not self.enabled:
+            return
+
+        # A single result may use at most a quarter of the budget
+        if result.nbytes > self.max_bytes // 4:
+            with self._lock:
+                self._counters["rejected_too_large"] += 1
+            return
+
+        key = self._key(sql, params)
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = _Entry(result, referenced_tables(sql))
+            self._bytes += result.nbytes
+            while self._bytes > self.max_bytes and self._entries:
+                self._drop(next(iter(self._entries)))
+                self._counters["evictions"] += 1
+
+    def put(self, sql: str, params: Optional[tuple], df: pd.DataFrame):
+        if self.enabled:
+            self.put_result(sql, params, ColumnarResult.from_dataframe(df))
+
+    def invalidate(self, table: Optional[str] = None) -> int:
+        """
+        Drops entries that read from `table`, or everything when table is None.
+
+        Returns:
+            Number of entries removed
+        """
+        with self._lock:
+            if table is None:
+                keys = list(self._entries)
+            else:
+                table = _table_name(table)
+                keys = [k for k, e in self._entries.items() if table in e.tables or not e.tables]
+            for key in keys:
+                self._drop(key)
+            self._counters["invalidations"] += len(keys)
+        if keys:
+            logger.info(f"Result cache invalidated {len(keys)} entries (table={table or '*'})")
+        return len(keys)
+
+    def invalidate_for_write(self, sql: str) -> int:
+        """Invalidates whatever a write statement may have changed."""
+        return self.invalidate(written_table(sql))
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["misses"]
+            return {
+                "enabled": self.enabled,
+                "entries": len(self._entries),
+                "bytes": self._bytes,
+                "max_bytes": self.max_bytes,
+                "ttl_seconds": self.ttl_seconds,
+                "hit_ratio": round(self._counters["hits"] / lookups, 4) if lookups else 0.0,
+                **self._counters,
+            }
+
+
+# Shared instance used by db_manager
+result_cache = ResultCache()
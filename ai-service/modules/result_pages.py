@@ -0,0 +1,81 @@
+"""
+Result Pages Module
+
+Keeps large SQL results out of the chat response. The chat pipeline returns at
+most MAX_INLINE_ROWS rows inline; when the query produced more, the SQL is
+registered here under an opaque continuation token so the client can fetch
+further pages (/api/chat/results/{token}) or stream a full NDJSON export
+(/api/chat/results/{token}/export) without asking the LLM again.
+
+Pages re-run the SQL wrapped in LIMIT / OFFSET, so they reflect the data at
+fetch time; tokens expire after RESULT_TOKEN_TTL_SECONDS.
+"""
+
+import os
+import time
+import secrets
+import threading
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from modules.result_cache import normalize_sql
+
+MAX_INLINE_ROWS = int(os.getenv("MAX_INLINE_ROWS", "5000"))
+MAX_PAGE_ROWS = int(os.getenv("MAX_PAGE_ROWS", "10000"))
+# 0 = no cap on NDJSON exports
+MAX_EXPORT_ROWS = int(os.getenv("MAX_EXPORT_ROWS", "0"))
+RESULT_TOKEN_TTL_SECONDS = float(os.getenv("RESULT_TOKEN_TTL_SECONDS", "1800"))
+RESULT_TOKEN_MAX_ENTRIES = int(os.getenv("RESULT_TOKEN_MAX_ENTRIES", "1024"))
+
+
+def paged_sql(sql: str, limit: int, offset: int) -> str:
+    """Wraps a SELECT so only one page of it is returned."""
+    return f"SELECT * FROM ({normalize_sql(sql)}) AS _page LIMIT {int(limit)} OFFSET {int(offset)}"
+
+
+class _Entry:
+    __slots__ = ("sql", "params", "created_at")
+
+    def __init__(self, sql, params):
+        self.sql = sql
+        self.params = params
+        self.created_at = time.time()
+
+
+class ContinuationRegistry:
+    """
+    Thread-safe token -> SQL map with a TTL and an entry cap (oldest dropped first).
+    """
+
+    def __init__(self, ttl_seconds: float = RESULT_TOKEN_TTL_SECONDS, max_entries: int = RESULT_TOKEN_MAX_ENTRIES):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+
+    def register(self, sql: str, params: Optional[tuple] = None) -> str:
+        token = secrets.token_urlsafe(16)
+        with self._lock:
+            self._entries[token] = _Entry(sql, params)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+        return token
+
+    def get(self, token: str) -> Optional[_Entry]:
+        """Returns the registered query, or None if the token is unknown or expired."""
+        with self._lock:
+            entry = self._entries.get(token)
+            if entry is None:
+                return None
+            if time.time() - entry.created_at > self.ttl_seconds:
+                del self._entries[token]
+                return None
+            return entry
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"tokens": len(self._entries), "max_entries": self.max_entries, "ttl_seconds": self.ttl_seconds}
+
+
+# Shared instance used by the chat pipeline and the results endpoints
+continuation_registry = ContinuationRegistry()
@@ -0,0 +1,197 @@
+"""
+Single-Flight Module
+
+Coalesces identical concurrent chat requests. When a dashboard refresh or a
+group of operators asks the same question at the same moment, the first
+request runs the pipeline and every identical request that arrives while it
+is in flight waits for, and shares, its result instead of queueing its own
+LLM calls against the same Ollama instance.
+
+- Keys are the normalized question (sql_cache.normalize_query) plus the
+  user role and any option that changes the response.
+- Nothing is cached: the entry disappears as soon as the execution finishes.
+- Each participant can leave on its own cancellation; the shared execution is
+  only cancelled once every participant has left.
+"""
+
+import os
+import asyncio
+import threading
+import contextvars
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+from modules import tracing
+from modules.cancellation import CancellationToken, on_cancel, raise_if_cancelled
+from modules.executors import flight_executor
+from modules.sql_cache import normalize_query
+
+SINGLE_FLIGHT_ENABLED = os.getenv("SINGLE_FLIGHT_ENABLED", "true").lower() == "true"
+
+COALESCED_REQUESTS = tracing.Counter(
+    "ai_coalesced_requests_total", "Requests that shared an identical in-flight pipeline execution.", ["path"]
+)
+tracing.REGISTRY.append(COALESCED_REQUESTS)
+
+
+def request_key(user_query: str, user_role: str, *options: Hashable) -> Tuple[Hashable, ...]:
+    """Coalescing key: the normalized question, the role and response-shaping options."""
+    return (normalize_query(user_query), user_role, *options)
+
+
+class _Flight:
+    """One in-flight execution and the requests waiting for it."""
+
+    def __init__(self):
+        # Passed to the shared execution; set once every participant has left
+        self.token = CancellationToken()
+        self.participants = 1
+        self.finished = False
+        self.result: Any = None
+        self.error: Optional[BaseException] = None
+        self.cond = threading.Condition()
+        self.task: Optional[asyncio.Future] = None
+
+
+class SingleFlight:
+    """
+    Thread-safe single-flight group. `do` serves threads (the flight runs on
+    flight_executor and every participant, its starter included, waits for
+    it); `do_async` serves the event loop (the flight is a task every
+    participant awaits).
+    """
+
+    def __init__(self, enabled: bool = SINGLE_FLIGHT_ENABLED):
+        self.enabled = enabled
+        self._flights: Dict[Tuple[Hashable, ...], _Flight] = {}
+        self._lock = threading.Lock()
+        self._counters = {"executions": 0, "coalesced": 0, "abandoned": 0}
+
+    def _join(self, key: Tuple[Hashable, ...], path: str) -> Tuple[_Flight, bool]:
+        with self._lock:
+            flight = self._flights.get(key)
+            # An abandoned execution is still winding down; it is not joined
+            if flight is not None and not flight.token.is_set():
+                flight.participants += 1
+                self._counters["coalesced"] += 1
+                COALESCED_REQUESTS.inc(path)
+                return flight, False
+            flight = self._flights[key] = _Flight()
+            self._counters["executions"] += 1
+            return flight, True
+
+    def _leave(self, flight: _Flight):
+        # A participant stopped waiting; the last one to leave cancels the execution
+        with self._lock:
+            flight.participants -= 1
+            abandoned = flight.participants == 0 and not flight.finished
+            if abandoned:
+                self._counters["abandoned"] += 1
+        if abandoned:
+            flight.token.cancel()
+        with flight.cond:
+            flight.cond.notify_all()
+
+    def _finish(self, key: Tuple[Hashable, ...], flight: _Flight):
+        with self._lock:
+            flight.finished = True
+            if self._flights.get(key) is flight:
+                del self._flights[key]
+        with flight.cond:
+            flight.cond.notify_all()
+
+    def do(self, key: Tuple[Hashable, ...], fn: Callable[[Optional[threading.Event]], Any],
+           cancel_event: Optional[threading.Event] = None) -> Any:
+        """
+        Runs fn(cancel_event) once per key among concurrent callers and returns
+        (or raises) its outcome to all of them.
+
+        Raises:
+            OperationCancelled: when the caller's cancel_event is set
+        """
+        if not self.enabled:
+            return fn(cancel_event)
+        raise_if_cancelled(cancel_event)
+        key = ("sync",) + tuple(key)
+        flight, leader = self._join(key, "sync")
+
+        if leader:
+            # Run elsewhere so a cancelled starter does not hold its thread until the flight ends
+            ctx = contextvars.copy_context()
+
+            def run():
+                try:
+                    flight.result = ctx.run(fn, flight.token)
+                except BaseException as e:
+                    flight.error = e
+                finally:
+                    self._finish(key, flight)
+
+            flight_executor.submit(run)
+
+        left = threading.Event()
+
+        def leave():
+            left.set()
+            self._leave(flight)
+
+        with on_cancel(cancel_event, leave):
+            with flight.cond:
+                flight.cond.wait_for(lambda: flight.finished or left.is_set())
+        raise_if_cancelled(cancel_event)
+        if flight.error is not None:
+            raise flight.error
+        return flight.result
+
+    async def do_async(self, key: Tuple[Hashable, ...], fn: Callable[[Optional[threading.Event]], Awaitable[Any]],
+                       cancel_event: Optional[threading.Event] = None) -> Any:
+        """
+        asyncio counterpart of do(). The execution runs as its own task, so a
+        participant that is cancelled (or whose client went away) can leave
+        without stopping it for the others.
+        """
+        if not self.enabled:
+            return await fn(cancel_event)
+        raise_if_cancelled(cancel_event)
+        loop = asyncio.get_running_loop()
+        key = ("async", id(loop)) + tuple(key)
+        flight, leader = self._join(key, "async")
+        if leader:
+            def done(task: asyncio.Future):
+                # Participants re-raise the outcome themselves; an abandoned
+                # execution's OperationCancelled would otherwise be logged as unretrieved
+                if not task.cancelled():
+                    task.exception()
+                self._finish(key, flight)
+
+            flight.task = asyncio.ensure_future(fn(flight.token))
+            flight.task.add_done_callback(done)
+
+        cancelled = loop.create_future()
+
+        def wake():
+            try:
+                loop.call_soon_threadsafe(lambda: cancelled.done() or cancelled.set_result(None))
+            except RuntimeError:
+                pass  # loop already closed
+
+        try:
+            with on_cancel(cancel_event, wake):
+                await asyncio.wait({flight.task, cancelled}, return_when=asyncio.FIRST_COMPLETED)
+        except asyncio.CancelledError:
+            self._leave(flight)
+            raise
+        if cancelled.done():
+            self._leave(flight)
+        raise_if_cancelled(cancel_event)
+        return flight.task.result()
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {"enabled": self.enabled, "in_flight": len(self._flights), **self._counters}
+
+
+# Shared instance used by ChatService
+single_flight = SingleFlight()
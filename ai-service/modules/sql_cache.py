@@ -0,0 +1,276 @@
+"""
+SQL Generation Cache Module
+
+Caches natural-language -> SQL translations produced by the LLM.
+
+- Exact hits are keyed by the normalized question plus the SQL prompt version.
+- Near-duplicates ("show total load today" vs "total load for today") are
+  matched by token-set (Jaccard) similarity; numbers, time expressions,
+  aggregation words and comparison / ordering words must match exactly so
+  "meter 1001" never reuses the SQL for "meter 1002", "peak load" never reuses
+  the one for "average load" and "above the average" never reuses the one for
+  "below the average".
+- Literal filter values taken from the raw question (quoted strings, numbers,
+  identifier-like tokens, capitalized names, the word after "user" / "meter"
+  ...) must match exactly as well, so a long question that differs only in a
+  username never reuses the other user's filter.
+- Entries expire after a TTL, the least recently used entry is evicted when full,
+  and questions with relative dates ("today", "this week", "now") are only
+  valid for the day (or hour) they were generated in, since the prompt embeds
+  the current time.
+"""
+
+import os
+import re
+import time
+import threading
+from collections import OrderedDict
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+import logging
+logger = logging.getLogger("AI_SERVICE")
+
+SQL_CACHE_ENABLED = os.getenv("SQL_CACHE_ENABLED", "true").lower() == "true"
+SQL_CACHE_MAX_ENTRIES = int(os.getenv("SQL_CACHE_MAX_ENTRIES", "512"))
+SQL_CACHE_TTL_SECONDS = float(os.getenv("SQL_CACHE_TTL_SECONDS", "3600"))
+SQL_CACHE_SIMILARITY = float(os.getenv("SQL_CACHE_SIMILARITY", "0.85"))
+
+# Filler words that do not change the meaning of a data question
+STOPWORDS = {
+    "a", "an", "the", "of", "for", "to", "in", "on", "at", "by", "is", "are", "was", "were",
+    "me", "please", "show", "give", "get", "tell", "display", "list", "what", "whats",
+    "can", "could", "you", "i", "want", "need", "see", "about", "data", "value", "values",
+}
+
+# Expressions whose meaning depends on the current date / time
+HOURLY_TERMS = re.compile(r"\b(now|current|currently|right now|this hour|last hour|past hour|latest)\b")
+DAILY_TERMS = re.compile(
+    r"\b(today|tonight|yesterday|tomorrow|this (?:week|month|year|quarter|morning|afternoon|evening)"
+    r"|last|next|past|previous|ago|recent|recently|upcoming|so far|till date|to date)\b"
+)
+
+# Words that change the resulting SQL; they must match exactly for a near-hit
+ANCHOR_WORDS = {
+    "today", "tonight", "yesterday", "tomorrow", "now", "current", "latest", "this", "last", "next",
+    "past", "previous", "ago", "hour", "hours", "day", "days", "week", "weeks", "month", "months",
+    "year", "years", "hourly", "daily", "weekly", "monthly", "yearly", "morning", "evening", "night",
+    "max", "maximum", "min", "minimum", "avg", "average", "mean", "sum", "total", "count",
+    "highest", "lowest", "peak", "top", "bottom", "not", "without", "per", "each", "every", "my",
+}
+
+# Comparison and ordering words (and spelled-out operators) flip a filter or sort
+# order without changing much else, so they must match exactly as well
+COMPARISON_WORDS = {
+    "above", "below", "over", "under", "greater", "less", "more", "fewer", "higher", "lower", "exceeding",
+    "exceeds", "ascending", "descending", "asc", "desc", "before", "after", "between", "since", "until",
+    "least", "most", "equal", "equals", "op_gte", "op_lte", "op_gt", "op_lt", "op_ne", "op_eq",
+}
+# Operators spelled as symbols, longest first, so "load > 5" and "load < 5" do not normalize alike
+_OPERATORS = ((">=", " op_gte "), ("<=", " op_lte "), ("!=", " op_ne "), ("<>", " op_ne "),
+              (">", " op_gt "), ("<", " op_lt "), ("=", " op_eq "))
+
+# Nouns after which the next word names one specific record ("user alice")
+ENTITY_WORDS = {"user", "username", "meter", "customer", "account", "name", "named", "called", "id", "email", "role"}
+
+_TOKEN_RE = re.compile(r"[a-z0-9_]+")
+# Quotes at word boundaries only, so "what's" / "user's" do not open a literal
+_QUOTED_RE = re.compile(r"(?<!\w)'([^']*)'(?!\w)|\"([^\"]*)\"|`([^`]*)`")
+_RAW_TOKEN_RE = re.compile(r"[A-Za-z0-9_@.\-]+")
+
+
+def normalize_query(query: str) -> str:
+    """Lowercases, spells out comparison operators, strips punctuation and collapses whitespace."""
+    query = query.lower()
+    for symbol, word in _OPERATORS:
+        query = query.replace(symbol, word)
+    return " ".join(_TOKEN_RE.findall(query))
+
+
+def _signature(normalized: str) -> Tuple[frozenset, frozenset]:
+    """
+    Splits a normalized query into (free words, anchors). Anchors are numbers,
+    time expressions, aggregation and comparison words, which must match exactly.
+    """
+    tokens = [t for t in normalized.split() if t not in STOPWORDS]
+    anchors = frozenset(t for t in tokens
+                        if t in ANCHOR_WORDS or t in COMPARISON_WORDS or any(ch.isdigit() for ch in t))
+    words = frozenset(t for t in tokens if t not in anchors)
+    return words, anchors
+
+
+def literal_tokens(query: str) -> frozenset:
+    """
+    Filter values spelled out in the raw question: quoted strings, tokens with
+    digits, '_', '@' or an inner '.', capitalized names (not the first word)
+    and the word following an entity noun. Lowercased.
+    """
+    literals = {"".join(groups).strip().lower() for groups in _QUOTED_RE.findall(query)}
+    raw = [t.strip(".-") for t in _RAW_TOKEN_RE.findall(_QUOTED_RE.sub(" ", query))]
+    for i, tok in enumerate(raw):
+        if not tok:
+            continue
+        if (any(ch.isdigit() for ch in tok) or any(ch in tok for ch in "_@.")
+                or (i > 0 and len(tok) > 1 and tok[0].isupper())
+                or (i > 0 and raw[i - 1].lower() in ENTITY_WORDS and len(tok) > 1
+                    and tok.lower() not in STOPWORDS and tok.lower() not in ANCHOR_WORDS)):
+            literals.add(tok.lower())
+    return frozenset(literals)
+
+
+def validity_scope(normalized: str, now: Optional[datetime] = None) -> str:
+    """
+    Returns the time window in which a cached translation stays correct.
+    """
+    now = now or datetime.now()
+    if HOURLY_TERMS.search(normalized):
+        return now.strftime("%Y-%m-%d %H")
+    if DAILY_TERMS.search(normalized):
+        return now.strftime("%Y-%m-%d")
+    return "static"
+
+
+class _Entry:
+    __slots__ = ("query", "normalized", "version", "words", "anchors", "literals", "scope", "sql", "raw",
+                 "created_at", "hits")
+
+    def __init__(self, query, normalized, version, scope, sql, raw):
+        self.query = query
+        self.normalized = normalized
+        self.version = version
+        self.words, self.anchors = _signature(normalized)
+        self.literals = literal_tokens(query)
+        self.scope = scope
+        self.sql = sql
+        self.raw = raw
+        self.created_at = time.time()
+        self.hits = 0
+
+
+class SQLGenerationCache:
+    """
+    Thread-safe LRU + TTL cache with near-duplicate matching.
+    """
+
+    def __init__(self, max_entries: int = SQL_CACHE_MAX_ENTRIES, ttl_seconds: float = SQL_CACHE_TTL_SECONDS,
+                 similarity_threshold: float = SQL_CACHE_SIMILARITY, enabled: bool = SQL_CACHE_ENABLED):
+        self.max_entries = max_entries
+        self.ttl_seconds = ttl_seconds
+        self.similarity_threshold = similarity_threshold
+        self.enabled = enabled
+        self._entries: "OrderedDict[Tuple[str, str], _Entry]" = OrderedDict()
+        self._lock = threading.Lock()
+        self._counters = {"hits": 0, "near_hits": 0, "misses": 0, "evictions": 0, "expirations": 0}
+
+    def _is_valid(self, entry: _Entry, now_ts: float) -> bool:
+        if now_ts - entry.created_at > self.ttl_seconds:
+            return False
+        return entry.scope == validity_scope(entry.normalized)
+
+    def get(self, query: str, version: str) -> Optional[Tuple[str, str]]:
+        """
+        Looks up a cached translation.
+
+        Returns:
+            (sql, raw_llm_response) or None on a miss
+        """
+        if not self.enabled:
+            return None
+
+        normalized = normalize_query(query)
+        now_ts = time.time()
+        with self._lock:
+            # 1. Exact match
+            key = (version, normalized)
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._is_valid(entry, now_ts):
+                    self._entries.move_to_end(key)
+                    entry.hits += 1
+                    self._counters["hits"] += 1
+                    return entry.sql, entry.raw
+                del self._entries[key]
+                self._counters["expirations"] += 1
+
+            # 2. Near-duplicate match
+            words, anchors = _signature(normalized)
+            literals = literal_tokens(query)
+            scope = validity_scope(normalized)
+            best_key, best_score = None, 0.0
+            for cand_key, cand in self._entries.items():
+                if (cand.version != version or cand.anchors != anchors or cand.literals != literals
+                        or cand.scope != scope):
+                    continue
+                union = words | cand.words
+                if not union:
+                    continue
+                score = len(words & cand.words) / len(union)
+                if score > best_score:
+                    best_key, best_score = cand_key, score
+
+            if best_key is not None and best_score >= self.similarity_threshold:
+                cand = self._entries[best_key]
+                if self._is_valid(cand, now_ts):
+                    self._entries.move_to_end(best_key)
+                    cand.hits += 1
+                    self._counters["near_hits"] += 1
+                    logger.info(f"SQL cache near-hit ({best_score:.2f}): '{query}' ~ '{cand.query}'")
+                    return cand.sql, cand.raw
+
+            self._counters["misses"] += 1
+            return None
+
+    def put(self, query: str, version: str, sql: str, raw: str):
+        if not self.enabled:
+            return
+
+        normalized = normalize_query(query)
+        entry = _Entry(query, normalized, version, validity_scope(normalized), sql, raw)
+        with self._lock:
+            key = (version, normalized)
+            self._entries[key] = entry
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._counters["evictions"] += 1
+
+    def clear(self) -> int:
+        """Flushes every entry. Returns how many were removed."""
+        with self._lock:
+            removed = len(self._entries)
+            self._entries.clear()
+            return removed
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            lookups = self._counters["hits"] + self._counters["near_hits"] + self._counters["misses"]
+            hit_ratio = (self._counters["hits"] + self._counters["near_hits"]) / lookups if lookups else 0.0
+            return {
+                "enabled": self.enabled,
+                "size": len(self._entries),
+                "max_entries": self.max_entries,
+                "ttl_seconds": self.ttl_seconds,
+                "similarity_threshold": self.similarity_threshold,
+                "hit_ratio": round(hit_ratio, 4),
+                **self._counters,
+            }
+
+    def entries(self) -> List[Dict[str, Any]]:
+        now_ts = time.time()
+        with self._lock:
+            return [
+                {
+                    "query": e.query,
+                    "normalized": e.normalized,
+                    "prompt_version": e.version,
+                    "scope": e.scope,
+                    "sql": e.sql,
+                    "hits": e.hits,
+                    "age_seconds": round(now_ts - e.created_at, 1),
+                }
+                for e in reversed(self._entries.values())
+            ]
+
+
+# Shared instance used by llm_router.generate_sql
+sql_cache = SQLGenerationCache()
@@ -0,0 +1,279 @@
+"""
+Tracing Module
+
+Times the stages of a chat turn (intent, SQL generation, query, analysis,
+charting, JSON encoding) and every Ollama call, and keeps the results in
+Prometheus-style histograms and counters rendered by /api/metrics.
+
+- `traced("stage")` decorates a sync, async or generator function; `stage()`
+  is the equivalent context manager.
+- Each request gets its own trace (a contextvar, carried into executor threads
+  by run_blocking) that becomes the optional Server-Timing response header.
+- `record_llm_call` stores Ollama's reported token counts and durations,
+  labelled with the stage that made the call.
+
+The exposition format is written directly; no prometheus_client dependency.
+"""
+
+import os
+import time
+import asyncio
+import threading
+import functools
+import inspect
+import contextvars
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+from modules.cancellation import OperationCancelled
+
+TRACING_ENABLED = os.getenv("TRACING_ENABLED", "true").lower() == "true"
+
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0)
+TOKEN_BUCKETS = (8, 16, 32, 64, 128, 256, 512, 1024, 2048, 4096, 8192)
+
+# (stage, seconds, description) entries of the current request
+_trace: contextvars.ContextVar[Optional[List[Tuple[str, float, str]]]] = contextvars.ContextVar("trace", default=None)
+_stage: contextvars.ContextVar[str] = contextvars.ContextVar("stage", default="other")
+
+
+def _escape(value: str) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _labels(names: Sequence[str], values: Tuple[str, ...], extra: str = "") -> str:
+    parts = [f'{n}="{_escape(v)}"' for n, v in zip(names, values)]
+    if extra:
+        parts.append(extra)
+    return "{" + ",".join(parts) + "}" if parts else ""
+
+
+class Counter:
+    """Monotonic counter with labels."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._values: Dict[Tuple[str, ...], float] = {}
+        self._lock = threading.Lock()
+
+    def inc(self, *labels: str, amount: float = 1.0):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0.0) + amount
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} counter"]
+        with self._lock:
+            for labels, value in sorted(self._values.items()):
+                lines.append(f"{self.name}{_labels(self.labelnames, labels)} {value:g}")
+        return lines
+
+
+class Histogram:
+    """Cumulative-bucket histogram with labels (Prometheus semantics)."""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_BUCKETS):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self.buckets = tuple(sorted(buckets))
+        # labels -> [bucket counts..., +Inf count, sum]
+        self._series: Dict[Tuple[str, ...], List[float]] = {}
+        self._lock = threading.Lock()
+
+    def observe(self, value: float, *labels: str):
+        with self._lock:
+            series = self._series.get(labels)
+            if series is None:
+                series = self._series[labels] = [0] * (len(self.buckets) + 1) + [0.0]
+            for i, bound in enumerate(self.buckets):
+                if value <= bound:
+                    series[i] += 1
+            series[len(self.buckets)] += 1
+            series[-1] += value
+
+    def snapshot(self) -> Dict[Tuple[str, ...], Dict[str, float]]:
+        """count / sum per label set."""
+        with self._lock:
+            return {labels: {"count": s[len(self.buckets)], "sum": s[-1]} for labels, s in self._series.items()}
+
+    def render(self) -> List[str]:
+        lines = [f"# HELP {self.name} {self.documentation}", f"# TYPE {self.name} histogram"]
+        with self._lock:
+            for labels, series in sorted(self._series.items()):
+                for bound, count in zip(self.buckets, series):
+                    le = 'le="%g"' % bound
+                    lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+                count = series[len(self.buckets)]
+                le = 'le="+Inf"'
+                lines.append(f"{self.name}_bucket{_labels(self.labelnames, labels, le)} {count}")
+                lines.append(f"{self.name}_sum{_labels(self.labelnames, labels)} {series[-1]:.6f}")
+                lines.append(f"{self.name}_count{_labels(self.labelnames, labels)} {count}")
+        return lines
+
+
+STAGE_SECONDS = Histogram("ai_stage_duration_seconds", "Duration of chat pipeline stages.", ["stage"])
+STAGE_ERRORS = Counter("ai_stage_errors_total", "Chat pipeline stages that raised.", ["stage"])
+STAGE_CANCELLED = Counter("ai_stage_cancelled_total", "Chat pipeline stages stopped by a cancellation.", ["stage"])
+LLM_REQUEST_SECONDS = Histogram("ai_llm_request_duration_seconds", "Wall time of Ollama calls, by calling stage.", ["stage"])
+LLM_PROMPT_EVAL_SECONDS = Histogram("ai_llm_prompt_eval_seconds", "Ollama-reported prompt evaluation time.", ["stage"])
+LLM_EVAL_SECONDS = Histogram("ai_llm_eval_seconds", "Ollama-reported generation time.", ["stage"])
+LLM_LOAD_SECONDS = Histogram("ai_llm_load_seconds", "Ollama-reported model load time.", ["stage"])
+LLM_PROMPT_TOKENS = Histogram("ai_llm_prompt_tokens", "Prompt tokens per Ollama call.", ["stage"], TOKEN_BUCKETS)
+LLM_EVAL_TOKENS = Histogram("ai_llm_eval_tokens", "Generated tokens per Ollama call.", ["stage"], TOKEN_BUCKETS)
+LLM_TOKENS = Counter("ai_llm_tokens_total", "Tokens processed by Ollama.", ["stage", "kind"])
+HTTP_SECONDS = Histogram("ai_http_request_duration_seconds", "HTTP request duration.", ["method", "route", "status"])
+
+REGISTRY = [
+    STAGE_SECONDS, STAGE_ERRORS, STAGE_CANCELLED, LLM_REQUEST_SECONDS, LLM_PROMPT_EVAL_SECONDS, LLM_EVAL_SECONDS,
+    LLM_LOAD_SECONDS, LLM_PROMPT_TOKENS, LLM_EVAL_TOKENS, LLM_TOKENS, HTTP_SECONDS,
+]
+
+
+def start_trace() -> contextvars.Token:
+    """Starts a fresh per-request trace; pass the token to end_trace()."""
+    return _trace.set([])
+
+
+def end_trace(token: contextvars.Token):
+    _trace.reset(token)
+
+
+def current_trace() -> List[Tuple[str, float, str]]:
+    return list(_trace.get() or [])
+
+
+def _record(name: str, seconds: float, description: str = ""):
+    STAGE_SECONDS.observe(seconds, name)
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((name, seconds, description))
+
+
+def _count_failure(name: str, exc: BaseException):
+    # A stop request or client disconnect is not a stage error
+    if isinstance(exc, (OperationCancelled, asyncio.CancelledError)):
+        STAGE_CANCELLED.inc(name)
+    else:
+        STAGE_ERRORS.inc(name)
+
+
+@contextmanager
+def stage(name: str):
+    """Times the enclosed block as pipeline stage `name`."""
+    if not TRACING_ENABLED:
+        yield
+        return
+    token = _stage.set(name)
+    start = time.perf_counter()
+    try:
+        yield
+    except (Exception, asyncio.CancelledError) as e:
+        _count_failure(name, e)
+        raise
+    finally:
+        _record(name, time.perf_counter() - start)
+        _stage.reset(token)
+
+
+def traced(name: str):
+    """Decorator form of stage() for sync, async and generator functions."""
+
+    def decorator(fn):
+        if inspect.isgeneratorfunction(fn):
+            @functools.wraps(fn)
+            def gen_wrapper(*args, **kwargs):
+                if not TRACING_ENABLED:
+                    yield from fn(*args, **kwargs)
+                    return
+                # Streams may be resumed from other threads / contexts, so the
+                # stage label is only set around each step, never across a yield
+                gen = fn(*args, **kwargs)
+                start = time.perf_counter()
+                try:
+                    while True:
+                        token = _stage.set(name)
+                        try:
+                            item = next(gen)
+                        except StopIteration:
+                            return
+                        except Exception as e:
+                            _count_failure(name, e)
+                            raise
+                        finally:
+                            _stage.reset(token)
+                        yield item
+                finally:
+                    gen.close()
+                    _record(name, time.perf_counter() - start)
+            return gen_wrapper
+
+        if asyncio.iscoroutinefunction(fn):
+            @functools.wraps(fn)
+            async def async_wrapper(*args, **kwargs):
+                with stage(name):
+                    return await fn(*args, **kwargs)
+            return async_wrapper
+
+        @functools.wraps(fn)
+        def wrapper(*args, **kwargs):
+            with stage(name):
+                return fn(*args, **kwargs)
+        return wrapper
+
+    return decorator
+
+
+def record_llm_call(seconds: float, response: Optional[Dict[str, Any]] = None):
+    """
+    Records one Ollama call under the current stage. `response` is the final
+    Ollama body (or the last stream chunk) with its *_count / *_duration fields;
+    Ollama durations are in nanoseconds.
+    """
+    if not TRACING_ENABLED:
+        return
+    name = _stage.get()
+    LLM_REQUEST_SECONDS.observe(seconds, name)
+    response = response or {}
+    for field, histogram in (("prompt_eval_duration", LLM_PROMPT_EVAL_SECONDS), ("eval_duration", LLM_EVAL_SECONDS),
+                             ("load_duration", LLM_LOAD_SECONDS)):
+        if response.get(field) is not None:
+            histogram.observe(response[field] / 1e9, name)
+
+    prompt_tokens, eval_tokens = response.get("prompt_eval_count"), response.get("eval_count")
+    if prompt_tokens is not None:
+        LLM_PROMPT_TOKENS.observe(prompt_tokens, name)
+        LLM_TOKENS.inc(name, "prompt", amount=prompt_tokens)
+    if eval_tokens is not None:
+        LLM_EVAL_TOKENS.observe(eval_tokens, name)
+        LLM_TOKENS.inc(name, "eval", amount=eval_tokens)
+
+    trace = _trace.get()
+    if trace is not None:
+        trace.append((f"llm_{name}", seconds, f"{prompt_tokens or 0} prompt + {eval_tokens or 0} eval tokens"))
+
+
+def observe_http(method: str, route: str, status: int, seconds: float):
+    HTTP_SECONDS.observe(seconds, method, route, str(status))
+
+
+def server_timing(trace: List[Tuple[str, float, str]]) -> str:
+    """Formats a trace as a Server-Timing header value (durations in ms)."""
+    entries = []
+    for i, (name, seconds, description) in enumerate(trace):
+        # Metric names must be tokens and should be unique within the header
+        entry = f"{i}-{name};dur={seconds * 1000:.1f}"
+        if description:
+            entry += f';desc="{_escape(description)}"'
+        entries.append(entry)
+    return ", ".join(entries)
+
+
+def render_prometheus() -> str:
+    """All metrics in the Prometheus text exposition format (version 0.0.4)."""
+    lines = []
+    for metric in REGISTRY:
+        lines.extend(metric.render())
+    return "\n".join(lines) + "\n"
@@ -0,0 +1,45 @@
+import os
+import sys
+import tempfile
+
+import pytest
+
+# The service code lives in ai-service/ and imports itself as top-level `app` / `modules`
+AI_SERVICE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "ai-service")
+if AI_SERVICE_DIR not in sys.path:
+    sys.path.insert(0, AI_SERVICE_DIR)
+
+# Settings are read at import time: never touch a real database or load models from tests
+os.environ.setdefault("DB_TYPE", "sqlite")
+os.environ.setdefault("SQLITE_DB_PATH", os.path.join(tempfile.mkdtemp(prefix="ai-service-tests-"), "test.db"))
+os.environ.setdefault("WARMUP_MODELS", "false")
+
+# Manual smoke script against a running server, not a unit test
+collect_ignore = ["test_ai_service.py"]
+
+
+@pytest.fixture
+def fake_ollama():
+    """A local Ollama stand-in (benchmarks.fake_ollama) with near-zero latency."""
+    from benchmarks.fake_ollama import FakeOllama
+
+    fake = FakeOllama(latency_ms={kind: 0 for kind in ("intent", "sql", "plan", "analysis", "summary", "other")},
+                      token_ms=0).start()
+    try:
+        yield fake
+    finally:
+        fake.stop()
+
+
+@pytest.fixture
+def seeded_db(tmp_path, monkeypatch):
+    """The shared SQLite backend pointed at a freshly seeded meter_loads dataset (4 meters, 2000 rows)."""
+    from benchmarks.dataset import seed_sqlite
+    from modules.db import close_database, config
+
+    close_database()
+    monkeypatch.setattr(config, "SQLITE_DB_PATH", seed_sqlite(str(tmp_path / "meters.db"), rows=2000, meters=4))
+    try:
+        yield config.SQLITE_DB_PATH
+    finally:
+        close_database()
@@ -0,0 +1,76 @@
+import json
+import sqlite3
+import time
+
+import pytest
+import requests
+
+from benchmarks.chat_pipeline import run_async, run_threaded, summarize
+from benchmarks.dataset import FIRST_METER_ID, generate, seed_sqlite
+from benchmarks.fake_ollama import AGGREGATE_SQL, FakeOllama, answer, parse_latency
+
+
+@pytest.mark.parametrize("prompt, kind", [
+    ("You are an intent classifier.\nQuery: revenue tomorrow", "intent"),
+    ("Role: Expert SQL Generator.\nQuery: load", "sql"),
+    ("Role: Query Planner.\nQuery: load", "plan"),
+    ("Role: Data Analyst. JSON Output Only.\nColumns and Types: {'date_time': 'object'}\nQuery: x", "analysis"),
+    ("Role: Data Analyst.\nQuery: x", "summary"),
+    ("hello", "other"),
+])
+def test_prompts_are_classified(prompt, kind):
+    assert answer(prompt)[0] == kind
+
+
+def test_answers_follow_the_query():
+    assert json.loads(answer("You are an intent classifier.\nQuery: revenue tomorrow")[1]) == \
+        {"intent": "REVENUE_FORECAST"}
+    assert "meter_id = 1003" in answer("Role: Expert SQL Generator.\nQuery: load for meter 1003")[1]
+    assert AGGREGATE_SQL in answer("Role: Expert SQL Generator.\nQuery: total load")[1]
+
+
+def test_parse_latency():
+    assert parse_latency(["sql=150", "analysis=80"]) == {"sql": 150.0, "analysis": 80.0}
+    assert set(parse_latency(["100"]).values()) == {100.0}
+    assert parse_latency(None) == {}
+
+
+def test_server_applies_the_latency_and_counts_calls():
+    fake = FakeOllama(latency_ms={"intent": 100}).start()
+    try:
+        start = time.perf_counter()
+        r = requests.post(fake.url, json={"prompt": "You are an intent classifier.\nQuery: x", "stream": False})
+        assert time.perf_counter() - start >= 0.1
+        assert r.json()["response"] == '{"intent": "SQL_QUERY"}'
+        assert fake.reset_calls() == {"intent": 1}
+        assert fake.calls == {}
+    finally:
+        fake.stop()
+
+
+def test_dataset_is_deterministic(tmp_path):
+    assert list(generate(100, meters=2, seed=7)) == list(generate(100, meters=2, seed=7))
+    path = seed_sqlite(str(tmp_path / "bench.db"), rows=100, meters=2)
+    with sqlite3.connect(path) as conn:
+        assert conn.execute("SELECT COUNT(*), MIN(meter_id) FROM meter_loads").fetchone() == (100, FIRST_METER_ID)
+        assert conn.execute("SELECT COUNT(*) FROM meter_users").fetchone() == (2,)
+
+
+def test_runners_report_latency_percentiles_and_errors():
+    def flaky(i):
+        if i == 3:
+            raise RuntimeError("boom")
+
+    async def ok(i):
+        return i
+
+    threaded = run_threaded("threaded", flaky, requests=10, concurrency=4)
+    on_loop = run_async("async", ok, requests=5, concurrency=2)
+
+    assert (threaded["requests"], threaded["errors"]) == (9, 1)
+    assert (on_loop["requests"], on_loop["errors"]) == (5, 0)
+    assert threaded["p50_ms"] <= threaded["p95_ms"] <= threaded["p99_ms"]
+
+
+def test_summarize_without_samples():
+    assert summarize("empty", [], 0.0, 2, 0.0)["throughput_rps"] == 0.0
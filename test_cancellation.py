@@ -0,0 +1,125 @@
+import asyncio
+import threading
+import time
+
+import pytest
+
+from modules.cancellation import (
+    CancellationRegistry, CancellationToken, OperationCancelled, on_cancel, raise_if_cancelled
+)
+from modules.db.sqlite_db import SQLiteDatabase
+from modules.llm_client import AsyncOllamaClient, OllamaClient
+from modules.llm_scheduler import LLMScheduler
+
+SLOW_PROMPT = "You are an intent classifier.\nQuery: load"
+# Runs for many seconds on SQLite unless interrupted
+SLOW_SQL = "WITH RECURSIVE n(i) AS (SELECT 1 UNION ALL SELECT i + 1 FROM n) SELECT COUNT(*) FROM n WHERE i < 1e12"
+
+
+def test_callbacks_run_once_on_cancel():
+    token, calls = CancellationToken(), []
+    token.add_callback(lambda: calls.append("a"))
+    handle = token.add_callback(lambda: calls.append("removed"))
+    token.remove_callback(handle)
+    token.add_callback(lambda: 1 / 0)  # failures are logged, not raised
+
+    token.cancel()
+    token.cancel()
+
+    assert calls == ["a"]
+    assert token.cancelled
+
+
+def test_callbacks_added_after_cancel_run_immediately():
+    token, calls = CancellationToken(), []
+    token.cancel()
+    assert token.add_callback(lambda: calls.append("late")) is None
+    assert calls == ["late"]
+    with pytest.raises(OperationCancelled):
+        raise_if_cancelled(token)
+
+
+def test_on_cancel_only_covers_its_block():
+    token, calls = CancellationToken(), []
+    with on_cancel(token, lambda: calls.append("inside")):
+        pass
+    token.cancel()
+    assert calls == []
+    with on_cancel(threading.Event(), lambda: calls.append("plain")):
+        pass  # plain events are accepted and only polled
+
+
+def test_registry_tracks_the_latest_turn():
+    registry = CancellationRegistry()
+    first = registry.start("c1")
+    second = registry.start("c1")
+    registry.release("c1", first)  # a stale release does not drop the newer turn
+
+    assert registry.cancel("c1") is True
+    assert second.cancelled and not first.cancelled
+    assert registry.cancel("c1") is False
+    assert registry.cancel(None) is False
+
+
+def test_registry_expires_and_caps_tokens():
+    registry = CancellationRegistry(ttl_seconds=60, max_entries=2)
+    for convo in ("a", "b", "c"):
+        registry.start(convo)
+    assert registry.cancel("a") is False
+    assert registry.stats()["active"] == 2
+
+    registry.ttl_seconds = -1
+    assert registry.stats()["active"] == 0
+
+
+def cancel_after(token, seconds):
+    timer = threading.Timer(seconds, token.cancel)
+    timer.start()
+    return timer
+
+
+def test_cancel_aborts_a_running_sqlite_query(tmp_path):
+    db = SQLiteDatabase(str(tmp_path / "cancel.db"))
+    token = CancellationToken()
+    cancel_after(token, 0.2)
+    start = time.perf_counter()
+    try:
+        with pytest.raises(OperationCancelled):
+            list(db.stream_select(SLOW_SQL, cancel_event=token))
+    finally:
+        db.close()
+    assert time.perf_counter() - start < 2
+
+
+def test_cancel_aborts_a_sync_ollama_call(fake_ollama):
+    fake_ollama.latency_ms["intent"] = 5000
+    client = OllamaClient(fake_ollama.url, scheduler=LLMScheduler())
+    token = CancellationToken()
+    cancel_after(token, 0.2)
+    start = time.perf_counter()
+    try:
+        with pytest.raises(OperationCancelled):
+            client.generate(SLOW_PROMPT, cancel_event=token)
+    finally:
+        client.close()
+    assert time.perf_counter() - start < 2
+
+
+def test_cancel_aborts_an_async_ollama_call_and_frees_the_slot(fake_ollama):
+    fake_ollama.latency_ms["intent"] = 5000
+    scheduler = LLMScheduler()
+    client = AsyncOllamaClient(fake_ollama.url, scheduler=scheduler)
+    token = CancellationToken()
+
+    async def run():
+        try:
+            cancel_after(token, 0.2)
+            with pytest.raises(OperationCancelled):
+                await client.generate(SLOW_PROMPT, cancel_event=token)
+        finally:
+            await client.aclose()
+
+    start = time.perf_counter()
+    asyncio.run(run())
+    assert time.perf_counter() - start < 2
+    assert scheduler.stats()["running"] == 0
@@ -0,0 +1,65 @@
+import base64
+import json
+import sys
+
+import numpy as np
+import pandas as pd
+
+from app.services.chat import ChatService
+from modules import db_manager, llm_router, query_planner
+from modules.chart_spec import build_chart_spec, chart_spec_json
+from modules.single_flight import single_flight
+
+LINE = {"visualization_type": "line", "x_column": "date_time", "y_column": "load"}
+
+
+def frame():
+    return pd.DataFrame({"date_time": pd.date_range("2025-01-01", periods=3, freq="h"), "load": [1.0, np.nan, 3.0]})
+
+
+def decode(values):
+    return np.frombuffer(base64.b64decode(values["bdata"]), dtype="<f8")
+
+
+def test_line_spec_uses_typed_arrays():
+    spec = build_chart_spec(frame(), LINE)
+    trace = spec["data"][0]
+    assert (trace["type"], trace["mode"]) == ("scatter", "lines")
+    np.testing.assert_array_equal(decode(trace["y"]), [1.0, np.nan, 3.0])
+    assert spec["layout"]["xaxis"]["title"] == {"text": "date_time"}
+
+
+def test_bar_spec_keeps_categories_as_lists():
+    df = pd.DataFrame({"username": ["alice", None], "total": [2, 3]})
+    spec = build_chart_spec(df, {"visualization_type": "bar", "x_column": "username", "y_column": "total"})
+    assert spec["data"][0]["type"] == "bar"
+    assert spec["data"][0]["x"] == ["alice", None]
+
+
+def test_no_spec_for_tables_or_missing_columns():
+    assert build_chart_spec(frame(), {"visualization_type": "table"}) is None
+    assert build_chart_spec(frame(), {**LINE, "y_column": "missing"}) is None
+    assert build_chart_spec(frame().head(0), LINE) is None
+
+
+def test_spec_json_is_plotly_shaped_and_compact():
+    spec = json.loads(chart_spec_json(frame(), LINE))
+    assert set(spec) == {"data", "layout"}
+    assert spec["data"][0]["x"] == ["2025-01-01T00:00:00", "2025-01-01T01:00:00", "2025-01-01T02:00:00"]
+    assert "template" not in spec["layout"]
+    assert "plotly" not in sys.modules
+
+
+def test_plot_json_only_on_request(monkeypatch):
+    monkeypatch.setattr(query_planner, "PLANNER_ENABLED", False)
+    monkeypatch.setattr(single_flight, "enabled", False)
+    monkeypatch.setattr(llm_router, "classify_intent", lambda *a, **k: "SQL_QUERY")
+    monkeypatch.setattr(llm_router, "generate_sql", lambda *a, **k: ("SELECT 1", ""))
+    monkeypatch.setattr(llm_router, "analyze_data", lambda *a, **k: dict(LINE, summary="ok"))
+    monkeypatch.setattr(db_manager, "run_select_limited", lambda *a, **k: (frame(), False))
+
+    without, _ = ChatService.process_chat("load", "local", "admin")
+    with_plot, _ = ChatService.process_chat("load", "local", "admin", include_plot_json=True)
+
+    assert without["plot_json"] is None
+    assert json.loads(with_plot["plot_json"])["data"][0]["name"] == "load"
@@ -0,0 +1,62 @@
+import json
+
+import pandas as pd
+
+from app.services.chat import ChatService
+from modules import db_manager, llm_router, query_planner
+from modules.llm_client import OllamaClient
+from modules.llm_scheduler import LLMScheduler
+
+SQL = "SELECT date_time, avg_load, max_load FROM daily"
+
+
+def test_generate_stream_yields_ollama_chunks(fake_ollama):
+    client = OllamaClient(fake_ollama.url, scheduler=LLMScheduler())
+    prompt = "Role: Data Analyst.\nOutput plain text only.\nQuery: load"
+    chunks = list(client.generate_stream(prompt))
+    client.close()
+
+    assert len(chunks) > 2
+    assert chunks[-1]["done"] is True
+    assert "".join(c.get("response", "") for c in chunks).startswith("Load peaks in the early evening")
+
+
+def test_format_sse_frame():
+    frame = ChatService.format_sse({"event": "token", "text": "hi"})
+    assert frame.startswith("event: token\ndata: ")
+    assert frame.endswith("\n\n")
+    assert json.loads(frame.split("data: ", 1)[1]) == {"event": "token", "text": "hi"}
+
+
+def test_stream_emits_stage_events_then_summary_tokens(monkeypatch):
+    # Two candidate measures: the chart comes from the data shape, the summary from the LLM stream
+    df = pd.DataFrame({"date_time": ["2025-01-01", "2025-01-02"], "avg_load": [1.0, 2.0], "max_load": [3.0, 4.0]})
+    monkeypatch.setattr(query_planner, "PLANNER_ENABLED", False)
+    monkeypatch.setattr(llm_router, "classify_intent", lambda *a, **k: "SQL_QUERY")
+    monkeypatch.setattr(llm_router, "generate_sql", lambda *a, **k: (SQL, SQL))
+    monkeypatch.setattr(db_manager, "run_select_limited", lambda *a, **k: (df, False))
+    monkeypatch.setattr(llm_router, "stream_summary", lambda *a, **k: iter(["Load ", "rises."]))
+
+    events = list(ChatService.process_chat_stream("how did load change", "local", "admin"))
+
+    assert [e["event"] for e in events] == ["start", "intent", "sql", "rows", "insight", "token", "token", "done"]
+    assert events[2]["sql"] == SQL
+    assert events[3] == {"event": "rows", "row_count": 2, "truncated": False}
+    response = events[-1]["response"]
+    assert response["content"] == "Load rises."
+    assert response["data"]["rows"][0] == {"date_time": "2025-01-01", "avg_load": 1.0, "max_load": 3.0}
+
+
+def test_stream_reports_sql_failures_as_error_events(monkeypatch):
+    def failing_query(*args, **kwargs):
+        raise RuntimeError("no such table: daily")
+
+    monkeypatch.setattr(query_planner, "PLANNER_ENABLED", False)
+    monkeypatch.setattr(llm_router, "classify_intent", lambda *a, **k: "SQL_QUERY")
+    monkeypatch.setattr(llm_router, "generate_sql", lambda *a, **k: (SQL, SQL))
+    monkeypatch.setattr(db_manager, "run_select_limited", failing_query)
+
+    events = list(ChatService.process_chat_stream("load", "local", "admin"))
+
+    assert events[-1]["event"] == "error"
+    assert "no such table" in events[-1]["content"]
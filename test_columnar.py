@@ -0,0 +1,83 @@
+import json
+from datetime import datetime
+from decimal import Decimal
+
+import numpy as np
+import pandas as pd
+
+from app.services.chat import ChatService
+from modules.compatibility_layer import dumps_json, sanitize_dataframe_for_json
+from modules.db.columnar import ColumnarResult
+
+
+def test_from_rows_picks_compact_dtypes():
+    result = ColumnarResult.from_rows(
+        ["meter_id", "load", "name", "amount", "flag"],
+        [(1, 1.5, "a", Decimal("2.5"), True), (2, None, "b", Decimal("1"), False)],
+    )
+    assert [a.dtype.kind for a in result.arrays] == ["i", "f", "U", "f", "b"]
+    assert np.isnan(result.arrays[1][1])
+    assert len(result) == 2
+
+
+def test_from_rows_turns_nullable_integers_into_floats_like_pandas():
+    result = ColumnarResult.from_rows(["meter_id"], [(1,), (None,)])
+    assert result.arrays[0].dtype == np.float64
+    assert result.json_columns()[0].tolist() == [1.0, 0.0]
+
+
+def test_empty_rows_keep_their_columns():
+    result = ColumnarResult.from_rows(["a", "b"], [])
+    assert len(result) == 0
+    assert list(result.to_dataframe().columns) == ["a", "b"]
+
+
+def test_sanitize_replaces_nan_inf_and_missing_with_zero():
+    df = pd.DataFrame({
+        "load": [1.5, np.nan, np.inf, -np.inf],
+        "label": ["a", None, "c", "d"],
+        "date_time": pd.to_datetime(["2025-01-01", None, "2025-01-03", "2025-01-04"]),
+    })
+    records = sanitize_dataframe_for_json(df)
+    assert [r["load"] for r in records] == [1.5, 0.0, 0.0, 0.0]
+    assert [r["label"] for r in records] == ["a", 0, "c", "d"]
+    assert records[0]["date_time"] == datetime(2025, 1, 1)
+    assert records[1]["date_time"] == 0
+
+
+def test_to_dataframe_returns_copies():
+    result = ColumnarResult.from_dataframe(pd.DataFrame({"load": [1.0, 2.0]}))
+    df = result.to_dataframe()
+    df.loc[0, "load"] = 99.0
+    assert result.arrays[0][0] == 1.0
+
+
+def test_head_shares_the_arrays():
+    result = ColumnarResult.from_rows(["n"], [(i,) for i in range(10)])
+    assert len(result.head(3)) == 3
+    assert result.head(20) is result
+
+
+def test_wire_format_encodes_with_orjson():
+    result = ColumnarResult.from_dataframe(pd.DataFrame({
+        "date_time": pd.to_datetime(["2025-01-01 01:00", "2025-01-01 02:00"]),
+        "load": [1.25, np.nan],
+    }))
+    assert json.loads(dumps_json(result.to_wire())) == {
+        "format": "columnar",
+        "columns": ["date_time", "load"],
+        "values": [["2025-01-01T01:00:00", "2025-01-01T02:00:00"], [1.25, 0.0]],
+        "row_count": 2,
+    }
+
+
+def test_render_response_json_rows_and_columnar():
+    df = pd.DataFrame({"meter_id": [1001, 1002], "load": [1.5, 2.5]})
+    response = {"type": "data", "content": "ok", "intent": "SQL_QUERY", "sql": "SELECT 1"}
+
+    rows = json.loads(ChatService.render_response_json(response, df))
+    columnar = json.loads(ChatService.render_response_json(response, df, "columnar"))
+
+    assert rows["data"] == {"rows": [{"meter_id": 1001, "load": 1.5}, {"meter_id": 1002, "load": 2.5}]}
+    assert columnar["data"]["values"] == [[1001, 1002], [1.5, 2.5]]
+    assert rows["role"] == "assistant" and rows["sql"] == "SELECT 1"
@@ -0,0 +1,105 @@
+import threading
+import time
+
+import pytest
+
+from modules.db.pool import PoolTimeoutError, ThreadSafeConnectionPool
+
+
+class FakeConn:
+    def __init__(self):
+        self.closed = False
+
+    def close(self):
+        self.closed = True
+
+
+def make_pool(**kwargs):
+    created = []
+
+    def connect():
+        conn = FakeConn()
+        created.append(conn)
+        return conn
+
+    kwargs.setdefault("acquire_timeout", 1.0)
+    return ThreadSafeConnectionPool(connect, **kwargs), created
+
+
+def test_prefills_and_reuses_idle_connections():
+    pool, created = make_pool(minconn=2, maxconn=4)
+    with pool.connection() as first:
+        pass
+    with pool.connection() as second:
+        pass
+    assert len(created) == 2
+    assert first is second
+    assert pool.stats()["in_use"] == 0
+
+
+def test_rejects_invalid_bounds():
+    with pytest.raises(ValueError):
+        make_pool(minconn=3, maxconn=2)
+
+
+def test_blocks_until_a_connection_is_returned():
+    pool, created = make_pool(minconn=0, maxconn=1)
+    conn = pool.getconn()
+    threading.Timer(0.1, pool.putconn, args=(conn,)).start()
+
+    assert pool.getconn(timeout=2) is conn
+    assert len(created) == 1
+    assert pool.stats()["max_wait_seconds"] >= 0.05
+
+
+def test_times_out_when_exhausted():
+    pool, _ = make_pool(minconn=0, maxconn=1)
+    pool.getconn()
+    start = time.monotonic()
+    with pytest.raises(PoolTimeoutError):
+        pool.getconn(timeout=0.1)
+    assert time.monotonic() - start >= 0.1
+    assert pool.stats()["timeouts"] == 1
+
+
+def test_stale_connections_failing_validation_are_replaced():
+    pool, created = make_pool(minconn=1, maxconn=2, validate_after=0, validate=lambda conn: False)
+    conn = pool.getconn()
+    assert conn is created[1]
+    assert created[0].closed
+    assert pool.stats()["validation_failures"] == 1
+
+
+def test_broken_connections_are_discarded_on_return():
+    pool, created = make_pool(minconn=0, maxconn=2)
+    with pytest.raises(RuntimeError):
+        with pool.connection() as conn:
+            conn.close()
+            raise RuntimeError("server closed the connection")
+    stats = pool.stats()
+    assert (stats["size"], stats["discarded"]) == (0, 1)
+
+
+def test_reset_failures_discard_the_connection():
+    def reset(conn):
+        raise RuntimeError("rollback failed")
+
+    pool, _ = make_pool(minconn=0, maxconn=1, reset=reset)
+    conn = pool.getconn()
+    pool.putconn(conn)
+    assert conn.closed
+    assert pool.stats()["size"] == 0
+
+
+def test_foreign_connections_are_refused():
+    pool, _ = make_pool(minconn=0, maxconn=1)
+    with pytest.raises(ValueError):
+        pool.putconn(FakeConn())
+
+
+def test_closeall_closes_idle_connections_and_refuses_new_acquires():
+    pool, created = make_pool(minconn=2, maxconn=2)
+    pool.closeall()
+    assert all(conn.closed for conn in created)
+    with pytest.raises(Exception, match="closed"):
+        pool.getconn()
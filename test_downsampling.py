@@ -0,0 +1,122 @@
+import json
+
+import numpy as np
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import chat as chat_router
+from modules import db_manager, downsampling, llm_router, query_planner
+from modules.downsampling import downsample_dataframe, downsample_in_sql, lttb_indices, minmax_indices, target_points
+from modules.single_flight import single_flight
+
+
+def series(n=5000, spike=1234):
+    x = np.arange(n, dtype=np.float64)
+    y = np.sin(x / 200)
+    y[spike] = 50.0
+    return x, y
+
+
+def test_target_points_follow_the_chart_width(monkeypatch):
+    monkeypatch.setattr(downsampling, "DOWNSAMPLE_POINTS_PER_PIXEL", 0.5)
+    assert target_points(800) == 400
+    assert target_points(10) == downsampling.MIN_POINTS
+
+
+def test_lttb_keeps_endpoints_and_spikes():
+    x, y = series()
+    idx = lttb_indices(x, y, 300)
+    assert len(idx) == 300
+    assert idx[0] == 0 and idx[-1] == len(x) - 1
+    assert np.all(np.diff(idx) > 0)
+    assert 1234 in idx
+
+
+def test_lttb_leaves_short_series_alone():
+    x, y = series(100, spike=10)
+    np.testing.assert_array_equal(lttb_indices(x, y, 200), np.arange(100))
+
+
+def test_minmax_keeps_every_bucket_extreme():
+    _, y = series()
+    idx = minmax_indices(y, 100)
+    assert len(idx) <= 100
+    assert 1234 in idx
+    assert y[idx].min() == y.min()
+
+
+def test_downsample_dataframe_sorts_and_reports():
+    df = pd.DataFrame({
+        "date_time": pd.date_range("2025-01-01", periods=3000, freq="h")[::-1],
+        "load": np.arange(3000, dtype=np.float64),
+    })
+    out, info = downsample_dataframe(df, "date_time", "load", width_px=200)
+    assert info == {"method": "lttb", "original_points": 3000, "returned_points": 200, "target_points": 200}
+    assert out["date_time"].is_monotonic_increasing
+
+
+def test_downsample_dataframe_skips_non_numeric_or_short_data():
+    df = pd.DataFrame({"date_time": pd.date_range("2025-01-01", periods=500, freq="h"), "label": ["a"] * 500})
+    assert downsample_dataframe(df, "date_time", "label", width_px=100)[1] is None
+    assert downsample_dataframe(df.head(50), "date_time", "missing", width_px=100)[1] is None
+
+
+def test_sql_pushdown_buckets_the_full_result(seeded_db):
+    sql = "SELECT date_time, forecasted_load FROM meter_loads WHERE meter_id = 1001 ORDER BY date_time"
+    df, info = downsample_in_sql(sql, "date_time", "forecasted_load", width_px=100)
+    # 500 hourly readings bucketed by day
+    assert info["method"] == "sql_day_avg"
+    assert info["original_points"] == 500
+    assert len(df) == info["returned_points"] <= 100
+
+
+@pytest.fixture
+def legacy_chat(monkeypatch):
+    df = pd.DataFrame({"date_time": pd.date_range("2025-01-01", periods=2000, freq="h"),
+                       "total_load": np.random.default_rng(0).random(2000)})
+
+    async def classify(*args, **kwargs):
+        return "SQL_QUERY"
+
+    async def generate(*args, **kwargs):
+        return "SELECT date_time, total_load FROM t", ""
+
+    async def run_select(*args, **kwargs):
+        return df, False
+
+    async def analyze(*args, **kwargs):
+        return {"summary": "Load varies.", "visualization_type": "line",
+                "x_column": "date_time", "y_column": "total_load"}
+
+    monkeypatch.setattr(query_planner, "PLANNER_ENABLED", False)
+    monkeypatch.setattr(single_flight, "enabled", False)
+    monkeypatch.setattr(downsampling, "DOWNSAMPLE_SQL_PUSHDOWN", False)
+    monkeypatch.setattr(llm_router, "classify_intent_async", classify)
+    monkeypatch.setattr(llm_router, "generate_sql_async", generate)
+    monkeypatch.setattr(llm_router, "analyze_data_async", analyze)
+    monkeypatch.setattr(db_manager, "run_select_limited_async", run_select)
+
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    client = TestClient(app)
+
+    def post(**body):
+        response = client.post("/chat", json={"conversation_id": "c1", "message": "total load", **body})
+        return json.loads(response.json()["content"])
+
+    return post
+
+
+def test_legacy_chat_returns_every_row_without_a_chart_width(legacy_chat):
+    content = legacy_chat()
+    assert len(content["data"]) == 2000
+    assert "downsampling" not in content["extras"]
+
+
+def test_legacy_chat_downsamples_on_request(legacy_chat):
+    content = legacy_chat(chart_width=300)
+    assert len(content["data"]) == 300
+    assert content["extras"]["downsampling"]["original_points"] == 2000
+    assert content["extras"]["downsampling"]["full_resolution"].startswith("/api/chat/results/")
@@ -0,0 +1,88 @@
+import numpy as np
+
+from modules import forecasting_engine
+from modules.forecasting_engine import parse_target_dates, predict_revenue_for_dates
+
+
+def test_parse_single_date():
+    assert parse_target_dates("2025-03-04") == (["2025-03-04"], "")
+
+
+def test_parse_range_is_inclusive():
+    dates, error = parse_target_dates("2025-01-30 to 2025-02-02")
+    assert error == ""
+    assert dates == ["2025-01-30", "2025-01-31", "2025-02-01", "2025-02-02"]
+
+
+def test_parse_reversed_range_is_sorted():
+    dates, _ = parse_target_dates("2025-02-02 to 2025-01-31")
+    assert dates == ["2025-01-31", "2025-02-01", "2025-02-02"]
+
+
+def test_parse_list_deduplicates_in_order():
+    dates, _ = parse_target_dates("2025-05-03, 2025-05-01, 2025-05-03")
+    assert dates == ["2025-05-01", "2025-05-03"]
+
+
+def test_parse_rejects_ranges_over_the_limit(monkeypatch):
+    monkeypatch.setattr(forecasting_engine, "MAX_FORECAST_DAYS", 7)
+    dates, error = parse_target_dates("2025-01-01 to 2025-01-31")
+    assert dates == []
+    assert "exceeds 7 days" in error
+
+
+
+def test_parse_rejects_lists_over_the_limit(monkeypatch):
+    monkeypatch.setattr(forecasting_engine, "MAX_FORECAST_DAYS", 2)
+    dates, error = parse_target_dates("2025-01-01, 2025-01-05, 2025-01-09")
+    assert dates == []
+    assert "3 dates" in error and "limit of 2" in error
+    assert parse_target_dates("2025-01-01, 2025-01-05") == (["2025-01-01", "2025-01-05"], "")
+
+def test_parse_without_dates_reports_the_answer():
+    dates, error = parse_target_dates("I am not sure")
+    assert dates == []
+    assert "I am not sure" in error
+
+
+def test_parse_invalid_calendar_date():
+    dates, error = parse_target_dates("2025-02-30")
+    assert dates == []
+    assert error
+
+
+class FakeModel:
+    def __init__(self):
+        self.calls = []
+
+    def model_exists(self):
+        return True
+
+    def predict(self, features):
+        self.calls.append(np.asarray(features))
+        return np.asarray(features)[:, :1] * 2.0
+
+
+def test_predict_batches_all_dates_in_one_model_call(monkeypatch):
+    model = FakeModel()
+    monkeypatch.setattr(forecasting_engine, "revenue_model", model)
+    monkeypatch.setattr(forecasting_engine, "get_forecasted_loads_from_db",
+                        lambda dates: {"2025-01-06": 10.0, "2025-01-07": 20.0})
+
+    df, msg = predict_revenue_for_dates(["2025-01-06", "2025-01-07", "2025-01-08"])
+
+    assert len(model.calls) == 1
+    # [load, month, weekday] per available day; 2025-01-06 is a Monday
+    np.testing.assert_array_equal(model.calls[0], [[10.0, 1, 0], [20.0, 1, 1]])
+    assert df["date"].tolist() == ["2025-01-06", "2025-01-07"]
+    assert df["predicted_revenue"].tolist() == [20.0, 40.0]
+    assert "total $60.0" in msg
+    assert "no load data for 1 day(s): 2025-01-08" in msg
+
+
+def test_predict_without_load_data(monkeypatch):
+    monkeypatch.setattr(forecasting_engine, "revenue_model", FakeModel())
+    monkeypatch.setattr(forecasting_engine, "get_forecasted_loads_from_db", lambda dates: {})
+    df, msg = predict_revenue_for_dates(["2025-01-06"])
+    assert df.empty
+    assert "No forecasted load data" in msg
@@ -0,0 +1,58 @@
+from datetime import datetime
+
+import pytest
+
+from modules import intent_rules, llm_router
+from modules.intent_rules import decide, pre_classify
+
+NOW = datetime(2025, 6, 15, 12, 0)
+
+
+@pytest.mark.parametrize("query, intent, rule", [
+    ("show load for meter 1001", "SQL_QUERY", "no_revenue_terms"),
+    ("revenue impact of peak load", "SQL_QUERY", "revenue_with_load_terms"),
+    ("revenue for 2025-07-01", "REVENUE_FORECAST", "revenue_future_iso_date"),
+    ("revenue on 2025-01-01", "SQL_QUERY", "revenue_past_iso_date"),
+    ("predict revenue for tomorrow", "REVENUE_FORECAST", "revenue_future_terms"),
+    ("how much revenue did we make yesterday", "SQL_QUERY", "revenue_past_terms"),
+    ("revenue on the 25th", None, "revenue_ambiguous"),
+])
+def test_pre_classify(query, intent, rule):
+    decision = pre_classify(query, now=NOW)
+    assert (decision.intent, decision.rule) == (intent, rule)
+
+
+def test_mixed_iso_dates_fall_back_to_terms():
+    assert pre_classify("revenue from 2025-01-01 to 2025-12-31", now=NOW).intent is None
+
+
+def test_decide_drops_decisions_below_the_threshold(monkeypatch):
+    monkeypatch.setattr(intent_rules, "INTENT_RULES_MIN_CONFIDENCE", 0.9)
+    decision = decide("what revenue did we earn last month")
+    assert decision.intent is None
+    assert decision.rule == "revenue_past_terms"
+
+
+def test_decide_when_disabled(monkeypatch):
+    monkeypatch.setattr(intent_rules, "INTENT_RULES_ENABLED", False)
+    assert decide("show load") == (None, 0.0, "rules_disabled")
+
+
+def test_confident_rules_skip_the_llm(monkeypatch):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called")
+
+    monkeypatch.setattr(llm_router, "call_llm", no_llm)
+    assert llm_router.classify_intent("show load for meter 1001") == "SQL_QUERY"
+
+
+def test_ambiguous_queries_ask_the_llm(monkeypatch):
+    prompts = []
+
+    def fake_llm(prompt, *args, **kwargs):
+        prompts.append(prompt)
+        return '{"intent": "REVENUE_FORECAST"}'
+
+    monkeypatch.setattr(llm_router, "call_llm", fake_llm)
+    assert llm_router.classify_intent("revenue on the 25th") == "REVENUE_FORECAST"
+    assert len(prompts) == 1
@@ -0,0 +1,66 @@
+import asyncio
+import socket
+
+import pytest
+
+from modules.llm_client import AsyncOllamaClient, LLMUnavailableError, OllamaClient
+from modules.llm_scheduler import LLMScheduler
+
+INTENT_PROMPT = "You are an intent classifier.\nQuery: show load"
+
+
+def unused_port():
+    with socket.socket() as s:
+        s.bind(("127.0.0.1", 0))
+        return s.getsockname()[1]
+
+
+def test_sync_client_reuses_one_keep_alive_connection(fake_ollama):
+    client = OllamaClient(fake_ollama.url, scheduler=LLMScheduler())
+    try:
+        for _ in range(3):
+            assert client.generate_text(INTENT_PROMPT) == '{"intent": "SQL_QUERY"}'
+        pools = client.session.get_adapter(fake_ollama.url).poolmanager.pools
+        assert [pools[key].num_connections for key in pools.keys()] == [1]
+    finally:
+        client.close()
+    assert fake_ollama.calls["intent"] == 3
+
+
+def test_sync_client_wraps_connection_failures():
+    client = OllamaClient(f"http://127.0.0.1:{unused_port()}/api/generate", connect_timeout=0.5,
+                          max_retries=1, retry_backoff=0, scheduler=LLMScheduler())
+    try:
+        with pytest.raises(LLMUnavailableError):
+            client.generate(INTENT_PROMPT)
+    finally:
+        client.close()
+
+
+def test_async_client_generates_on_a_shared_client(fake_ollama):
+    client = AsyncOllamaClient(fake_ollama.url, scheduler=LLMScheduler())
+
+    async def run():
+        try:
+            texts = await asyncio.gather(*(client.generate_text(INTENT_PROMPT) for _ in range(4)))
+            return texts, client._get_client()
+        finally:
+            await client.aclose()
+
+    texts, http_client = asyncio.run(run())
+    assert texts == ['{"intent": "SQL_QUERY"}'] * 4
+    assert http_client.is_closed
+
+
+def test_async_client_retries_then_reports_connection_failures():
+    client = AsyncOllamaClient(f"http://127.0.0.1:{unused_port()}/api/generate", connect_timeout=0.5,
+                               max_retries=2, retry_backoff=0, scheduler=LLMScheduler())
+
+    async def run():
+        try:
+            await client.generate(INTENT_PROMPT)
+        finally:
+            await client.aclose()
+
+    with pytest.raises(LLMUnavailableError):
+        asyncio.run(run())
@@ -0,0 +1,135 @@
+import asyncio
+import threading
+import time
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import chat as chat_router
+from modules.cancellation import CancellationToken, OperationCancelled
+from modules.llm_scheduler import (
+    PRIORITY_BACKGROUND, PRIORITY_INTERACTIVE, PRIORITY_NORMAL, LLMQueueFull, LLMScheduler, user_scope
+)
+
+
+def run_order(scheduler, holders, waiters, gap=0.0):
+    """
+    Fills the slots with `holders` (users), queues `waiters` ((name, priority, user), in order),
+    then frees one holder slot at a time. Returns the order in which the waiters got a slot.
+    """
+    order = []
+
+    async def hold(user, release):
+        with user_scope(user):
+            async with scheduler.slot_async(PRIORITY_NORMAL):
+                await release.wait()
+
+    async def wait(name, priority, user):
+        with user_scope(user):
+            async with scheduler.slot_async(priority):
+                order.append(name)
+
+    async def main():
+        releases = [asyncio.Event() for _ in holders]
+        held = [asyncio.ensure_future(hold(user, release)) for user, release in zip(holders, releases)]
+        await asyncio.sleep(0)
+        queued = []
+        for waiter in waiters:
+            queued.append(asyncio.ensure_future(wait(*waiter)))
+            await asyncio.sleep(gap)
+        await asyncio.sleep(0)
+        for release in reversed(releases):
+            release.set()
+        await asyncio.gather(*held, *queued)
+
+    asyncio.run(main())
+    return order
+
+
+def test_higher_priority_classes_go_first():
+    order = run_order(LLMScheduler(max_concurrency=1, aging_seconds=0), ["u"], [
+        ("summary", PRIORITY_BACKGROUND, "u"), ("sql", PRIORITY_NORMAL, "u"), ("intent", PRIORITY_INTERACTIVE, "u"),
+    ])
+    assert order == ["intent", "sql", "summary"]
+
+
+def test_users_with_fewer_running_calls_go_first_within_a_class():
+    # "a" still holds a slot when the other one frees up, so "b" is served before a's second call
+    order = run_order(LLMScheduler(max_concurrency=2, aging_seconds=0), ["a", "x"], [
+        ("a2", PRIORITY_NORMAL, "a"), ("b1", PRIORITY_NORMAL, "b"),
+    ])
+    assert order == ["b1", "a2"]
+
+
+def test_waiting_background_calls_age_into_higher_classes():
+    order = run_order(LLMScheduler(max_concurrency=1, aging_seconds=0.05), ["u"], [
+        ("summary", PRIORITY_BACKGROUND, "u"), ("intent", PRIORITY_INTERACTIVE, "u"),
+    ], gap=0.15)
+    assert order == ["summary", "intent"]
+
+
+def queue_one(scheduler):
+    """Queues a call behind the held slot from another thread; it runs once the slot frees up."""
+    def call():
+        with scheduler.slot():
+            pass
+
+    waiter = threading.Thread(target=call)
+    waiter.start()
+    while scheduler.stats()["queued"] == 0:
+        time.sleep(0.001)
+    return waiter
+
+
+def test_full_queue_rejects_at_once_with_retry_after():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=1, queue_timeout=5)
+    with scheduler.slot():
+        waiter = queue_one(scheduler)
+        with pytest.raises(LLMQueueFull) as rejected:
+            with scheduler.slot():
+                pass
+    waiter.join()
+    assert rejected.value.retry_after >= 1
+    assert scheduler.stats()["rejected"] == 1
+
+
+def test_per_user_queue_share():
+    scheduler = LLMScheduler(max_concurrency=1, max_queue_per_user=0)
+    with scheduler.slot():
+        with user_scope("greedy"), pytest.raises(LLMQueueFull):
+            scheduler.check_admission()
+        scheduler.check_admission(user=None)
+
+
+def test_wait_times_out():
+    scheduler = LLMScheduler(max_concurrency=1, queue_timeout=0.1)
+    with scheduler.slot():
+        with pytest.raises(LLMQueueFull):
+            with scheduler.slot():
+                pass
+    stats = scheduler.stats()
+    assert (stats["timeouts"], stats["queued"], stats["running"]) == (1, 0, 0)
+
+
+def test_cancelled_waiter_leaves_the_queue():
+    scheduler = LLMScheduler(max_concurrency=1, queue_timeout=5)
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+    with scheduler.slot():
+        with pytest.raises(OperationCancelled):
+            with scheduler.slot(cancel_event=token):
+                pass
+    assert scheduler.stats()["queued"] == 0
+
+
+def test_stream_route_answers_429_when_the_queue_is_full(monkeypatch):
+    scheduler = LLMScheduler(max_concurrency=1, max_queue=0)
+    monkeypatch.setattr(chat_router, "llm_scheduler", scheduler)
+    app = FastAPI()
+    app.include_router(chat_router.router)
+
+    with scheduler.slot():
+        response = TestClient(app).post("/api/chat/stream", json={"message": "load", "model_type": "local", "user_role": "admin"})
+    assert response.status_code == 429
+    assert int(response.headers["Retry-After"]) >= 1
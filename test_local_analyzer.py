@@ -0,0 +1,99 @@
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.services.chat import ChatService
+from modules import llm_router, local_analyzer
+from modules.local_analyzer import classify, decide
+
+HOURS = pd.date_range("2025-01-01", periods=4, freq="h")
+
+
+def test_single_series_is_a_line_with_a_trend():
+    df = pd.DataFrame({"date_time": HOURS, "total_load": [10.0, 20.0, 30.0, 40.0]})
+    decision = classify(df, "total load over time")
+    assert decision.rule == "time_series"
+    insight = decision.insight
+    assert (insight["visualization_type"], insight["x_column"], insight["y_column"]) == \
+        ("line", "date_time", "total_load")
+    assert insight["summary"] == (
+        "Total load ranged from 10 to 40 (mean 25) over 4 points from 2025-01-01 to 2025-01-01 03:00, "
+        "trending up 120.0%; the peak of 40 was at 2025-01-01 03:00."
+    )
+
+
+def test_series_crossing_zero_report_an_absolute_change():
+    df = pd.DataFrame({"date_time": HOURS, "net_load": [-3.0, -1.0, 1.0, 3.0]})
+    assert "trending up by 6" in classify(df).insight["summary"]
+
+
+def test_flat_series():
+    df = pd.DataFrame({"date_time": HOURS, "load": [1.0, 5.0, 5.0, 1.0]})
+    assert "roughly flat" in classify(df).insight["summary"]
+
+
+def test_string_dates_and_numeric_hours_are_time_axes():
+    assert classify(pd.DataFrame({"day": ["2025-01-01", "2025-01-02"], "load": [1, 2]})).rule == "time_series"
+    assert classify(pd.DataFrame({"hour": [0, 1, 2], "load": [1, 2, 3]})).rule == "time_series"
+    # "counts" is not a time word
+    assert classify(pd.DataFrame({"counts": [1, 2], "load": [1, 2]})).rule == "several_measures"
+
+
+def test_varying_id_column_means_several_series():
+    df = pd.DataFrame({"date_time": list(HOURS[:2]) * 2, "meter_id": [1001, 1001, 1002, 1002], "load": [1.0] * 4})
+    assert classify(df) == (None, "multi_series")
+
+
+def test_constant_id_column_is_still_one_series():
+    df = pd.DataFrame({"date_time": HOURS, "meter_id": [1001] * 4, "load": [1.0, 2.0, 3.0, 4.0]})
+    assert classify(df).rule == "time_series"
+
+
+def test_one_row_per_category_is_a_bar_chart():
+    df = pd.DataFrame({"username": ["alice", "bob", "carol"], "total_load": [5.0, 9.0, 1.0]})
+    insight = classify(df).insight
+    assert insight["visualization_type"] == "bar"
+    assert insight["summary"].startswith("bob has the highest total load (9) and carol the lowest (1)")
+
+
+def test_repeated_categories_are_ambiguous():
+    df = pd.DataFrame({"username": ["alice", "alice"], "load": [1.0, 2.0]})
+    assert classify(df) == (None, "category_not_unique")
+
+
+def test_tables_for_single_rows_and_missing_measures():
+    assert classify(pd.DataFrame({"meter_id": [1001], "load": [2.5]})).insight == \
+        {"summary": "Load: 2.50.", "visualization_type": "table"}
+    assert classify(pd.DataFrame({"username": ["a", "b"]})).rule == "no_measure"
+
+
+def test_query_words_pick_between_measures():
+    df = pd.DataFrame({"date_time": HOURS[:2], "avg_load": [1.0, 2.0], "max_load": [3.0, 4.0]})
+    assert classify(df, "show the max load").insight["y_column"] == "max_load"
+    assert classify(df, "show load") == (None, "several_measures")
+
+
+def test_decide_when_disabled(monkeypatch):
+    monkeypatch.setattr(local_analyzer, "LOCAL_ANALYZER_ENABLED", False)
+    assert decide(pd.DataFrame({"a": [1]})) == (None, "analyzer_disabled")
+
+
+def test_deterministic_shapes_skip_the_llm(monkeypatch):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called")
+
+    monkeypatch.setattr(llm_router, "call_llm", no_llm)
+    df = pd.DataFrame({"date_time": HOURS, "total_load": [1.0, 2.0, 3.0, 4.0]})
+    assert llm_router.analyze_data(df, "total load")["visualization_type"] == "line"
+
+
+def test_rows_encoded_during_analysis_are_reused_for_the_same_frame(monkeypatch):
+    df = pd.DataFrame({"load": [1.0, np.nan]})
+    frame, result, values = ChatService._preencode(df)
+    response = {"_encoded": (frame, result, values)}
+
+    assert ChatService._encoded(response, df) == (result, values)
+    # A replaced (e.g. downsampled) frame is encoded again
+    other = df.copy()
+    assert ChatService._encoded(response, other)[0] is not result
+    assert ChatService.encode_rows(response, df) == [{"load": 1.0}, {"load": 0.0}]
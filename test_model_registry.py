@@ -0,0 +1,152 @@
+import os
+import time
+
+import numpy as np
+import pytest
+
+from modules import model_registry
+from modules.model_registry import RevenueModelRegistry
+from modules.numpy_model import NumpyRevenueModel, source_digest
+
+
+def write_npz(path, scale=1.0, digest=None):
+    # One linear dense layer: revenue = scale * sum(scaled features)
+    extra = {} if digest is None else {"source_sha256": np.array(digest)}
+    np.savez_compressed(
+        path,
+        **extra,
+        n_layers=np.array(1),
+        activations=np.array(["linear"]),
+        x_min=np.zeros(3), x_scale=np.ones(3),
+        y_min=np.zeros(1), y_scale=np.ones(1),
+        W0=np.full((3, 1), scale, dtype=np.float32), b0=np.zeros(1, dtype=np.float32),
+    )
+
+
+def set_mtime(path, age_seconds):
+    ts = time.time() - age_seconds
+    os.utime(path, (ts, ts))
+
+
+@pytest.fixture
+def artifacts(tmp_path):
+    paths = {name: str(tmp_path / name) for name in ("revenue_model.keras", "scaler.pkl", "revenue_model.npz")}
+    for name in ("revenue_model.keras", "scaler.pkl"):
+        overwrite(paths[name], b"placeholder")
+        set_mtime(paths[name], 200)
+    write_npz(paths["revenue_model.npz"], digest=source_digest(paths["revenue_model.keras"], paths["scaler.pkl"]))
+    set_mtime(paths["revenue_model.npz"], 100)
+    return paths
+
+
+def overwrite(path, content):
+    with open(path, "wb") as f:
+        f.write(content)
+
+
+def digest_of(paths):
+    return source_digest(paths["revenue_model.keras"], paths["scaler.pkl"])
+
+
+def registry(paths, backend="auto"):
+    return RevenueModelRegistry(paths["revenue_model.keras"], paths["scaler.pkl"], paths["revenue_model.npz"], backend)
+
+
+def test_numpy_model_forward_pass(artifacts):
+    model = NumpyRevenueModel(artifacts["revenue_model.npz"])
+    np.testing.assert_allclose(model.predict([[1.0, 2, 3], [0.5, 1, 0]]), [[6.0], [1.5]])
+
+
+def test_model_stays_resident_between_predictions(artifacts):
+    reg = registry(artifacts)
+    reg.predict([[1.0, 1, 0]])
+    reg.predict([[2.0, 1, 0]])
+    stats = reg.stats()
+    assert stats["active_backend"] == "numpy"
+    assert stats["loads"] == 1
+    assert stats["inferences"] == 2
+
+
+def test_reloads_when_the_export_changes(artifacts):
+    reg = registry(artifacts)
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == pytest.approx(3.0)
+    write_npz(artifacts["revenue_model.npz"], scale=2.0, digest=digest_of(artifacts))
+    set_mtime(artifacts["revenue_model.npz"], 50)
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == pytest.approx(6.0)
+    assert reg.stats()["loads"] == 2
+
+
+def test_outdated_export_is_regenerated_from_retrained_sources(artifacts, monkeypatch):
+    exported = []
+
+    def fake_export(model_path, scaler_path, npz_path):
+        exported.append(npz_path)
+        write_npz(npz_path, scale=3.0, digest=source_digest(model_path, scaler_path))
+
+    monkeypatch.setattr(model_registry, "export_keras_model", fake_export)
+    reg = registry(artifacts)
+    reg.predict([[1.0, 1, 1]])
+    assert exported == []
+
+    overwrite(artifacts["scaler.pkl"], b"retrained")
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == pytest.approx(9.0)
+    assert exported == [artifacts["revenue_model.npz"]]
+    assert reg.stats()["active_backend"] == "numpy"
+    reg.predict([[1.0, 1, 1]])
+    assert len(exported) == 1
+
+
+def test_fresh_checkout_mtimes_do_not_invalidate_the_export(artifacts, monkeypatch):
+    monkeypatch.setattr(model_registry, "export_keras_model", lambda *args: pytest.fail("re-exported"))
+    # A clone writes files in arbitrary order, leaving the sources newer than the export
+    set_mtime(artifacts["revenue_model.npz"], 300)
+    set_mtime(artifacts["revenue_model.keras"], 0)
+    reg = registry(artifacts)
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == pytest.approx(3.0)
+    assert reg.stats()["active_backend"] == "numpy"
+
+
+def test_export_without_digest_is_regenerated(artifacts, monkeypatch):
+    exported = []
+
+    def fake_export(model_path, scaler_path, npz_path):
+        exported.append(npz_path)
+        write_npz(npz_path, scale=2.0, digest=source_digest(model_path, scaler_path))
+
+    monkeypatch.setattr(model_registry, "export_keras_model", fake_export)
+    write_npz(artifacts["revenue_model.npz"])
+    reg = registry(artifacts)
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == pytest.approx(6.0)
+    assert exported == [artifacts["revenue_model.npz"]]
+
+
+def test_falls_back_to_keras_when_reexport_fails(artifacts, monkeypatch):
+    def failing_export(*args):
+        raise RuntimeError("no h5py")
+
+    loaded = []
+
+    class FakeKeras:
+        def __init__(self, model_path, scaler_path):
+            loaded.append(model_path)
+
+        def predict(self, features_raw):
+            return np.array([[42.0]])
+
+    monkeypatch.setattr(model_registry, "export_keras_model", failing_export)
+    monkeypatch.setattr(model_registry, "KerasRevenueModel", FakeKeras)
+    overwrite(artifacts["revenue_model.keras"], b"retrained")
+
+    reg = registry(artifacts)
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == 42.0
+    assert reg.predict([[1.0, 1, 1]])[0, 0] == 42.0
+    assert reg.stats()["active_backend"] == "keras"
+    # The failed export is not retried until the sources change again
+    assert loaded == [artifacts["revenue_model.keras"]]
+
+
+def test_numpy_backend_without_export_falls_back_to_keras(artifacts):
+    os.remove(artifacts["revenue_model.npz"])
+    reg = registry(artifacts, backend="numpy")
+    assert reg._resolve_backend() == "keras"
+    assert reg.model_exists()
@@ -0,0 +1,73 @@
+import json
+
+import pytest
+
+from modules import llm_router, query_planner
+from modules.query_planner import PlanValidationError, plan_query, validate_plan
+from modules.sql_cache import SQLGenerationCache
+
+SQL = "SELECT date_time, SUM(forecasted_load) as total_load FROM meter_loads GROUP BY date_time ORDER BY date_time"
+
+
+@pytest.fixture(autouse=True)
+def fresh_sql_cache(monkeypatch):
+    cache = SQLGenerationCache(enabled=True)
+    monkeypatch.setattr(query_planner, "sql_cache", cache)
+    return cache
+
+
+def test_sql_plan_is_normalized():
+    plan = validate_plan({
+        "intent": "SQL_QUERY",
+        "sql": f"```sql\n{SQL}\n```",
+        "visualization": {"type": "Line", "x_column": "date_time", "y_column": "total_load"},
+    }, "total load")
+    assert plan == {
+        "intent": "SQL_QUERY",
+        "sql": SQL,
+        "dates": [],
+        "visualization": {"visualization_type": "line", "x_column": "date_time", "y_column": "total_load"},
+    }
+
+
+def test_forecast_plan_expands_date_ranges():
+    plan = validate_plan({"intent": "REVENUE_FORECAST", "dates": "2025-01-01 to 2025-01-03"}, "revenue next days")
+    assert plan["dates"] == ["2025-01-01", "2025-01-02", "2025-01-03"]
+    assert plan["visualization"] is None
+
+
+@pytest.mark.parametrize("data, query", [
+    ([], "load"),
+    ({"intent": "OTHER"}, "load"),
+    ({"intent": "REVENUE_FORECAST", "dates": ["2025-01-01"]}, "revenue from peak load tomorrow"),
+    ({"intent": "SQL_QUERY", "sql": "DELETE FROM meter_loads"}, "load"),
+    ({"intent": "SQL_QUERY", "sql": None}, "load"),
+    ({"intent": "REVENUE_FORECAST", "dates": "soon"}, "revenue"),
+])
+def test_invalid_plans_are_rejected(data, query):
+    with pytest.raises(PlanValidationError):
+        validate_plan(data, query)
+
+
+def test_plan_query_parses_the_llm_answer_and_caches_the_sql(monkeypatch, fresh_sql_cache):
+    answer = "Here is the plan: " + json.dumps({"intent": "SQL_QUERY", "sql": SQL})
+    monkeypatch.setattr(llm_router, "call_llm", lambda *a, **k: answer)
+
+    plan = plan_query("total load by hour")
+
+    assert plan["sql"] == SQL
+    assert fresh_sql_cache.get("total load by hour", llm_router.SQL_PROMPT_VERSION) == (SQL, answer)
+
+
+def test_plan_query_falls_back_on_malformed_output(monkeypatch):
+    monkeypatch.setattr(llm_router, "call_llm", lambda *a, **k: "I cannot help with that")
+    assert plan_query("total load by hour") is None
+
+
+def test_rules_and_cached_sql_skip_the_llm(monkeypatch, fresh_sql_cache):
+    def no_llm(*args, **kwargs):
+        raise AssertionError("LLM called")
+
+    fresh_sql_cache.put("total load by hour", llm_router.SQL_PROMPT_VERSION, SQL, "raw")
+    monkeypatch.setattr(llm_router, "call_llm", no_llm)
+    assert plan_query("total load by hour") == {"intent": "SQL_QUERY", "sql": SQL, "dates": [], "visualization": None}
@@ -0,0 +1,100 @@
+import pandas as pd
+import pytest
+
+from modules import db_manager
+from modules.db.columnar import ColumnarResult
+from modules.result_cache import ResultCache, normalize_sql, referenced_tables, written_table
+
+
+def result(rows):
+    return ColumnarResult.from_dataframe(pd.DataFrame({"meter_id": range(rows), "load": [1.5] * rows}))
+
+
+@pytest.fixture
+def cache():
+    return ResultCache(max_bytes=10 * result(100).nbytes, ttl_seconds=60, enabled=True)
+
+
+def test_table_references():
+    assert referenced_tables('SELECT * FROM meter_loads l JOIN public."meter_users" u ON u.meter_id = l.meter_id') == \
+        {"meter_loads", "meter_users"}
+    assert written_table("INSERT INTO Meter_Loads VALUES (1, '2025-01-01', 2.0)") == "meter_loads"
+    assert written_table("DROP TABLE IF EXISTS meter_users") == "meter_users"
+    assert written_table("VACUUM") is None
+    assert normalize_sql("SELECT  1\n FROM t;") == "SELECT 1 FROM t"
+
+
+def test_hit_ignores_whitespace_but_not_params(cache):
+    cache.put_result("SELECT * FROM meter_loads WHERE meter_id = ?", (1,), result(3))
+    assert cache.get_result("SELECT *\n  FROM meter_loads WHERE meter_id = ?;", (1,)) is not None
+    assert cache.get_result("SELECT * FROM meter_loads WHERE meter_id = ?", (2,)) is None
+
+
+def test_evicts_least_recently_used_by_bytes(cache):
+    for i in range(10):
+        cache.put_result(f"SELECT {i} FROM meter_loads", None, result(100))
+    cache.get_result("SELECT 0 FROM meter_loads")  # refresh the oldest entry
+    cache.put_result("SELECT 10 FROM meter_loads", None, result(100))
+
+    stats = cache.stats()
+    assert stats["bytes"] <= cache.max_bytes
+    assert stats["evictions"] == 1
+    assert cache.get_result("SELECT 0 FROM meter_loads") is not None
+    assert cache.get_result("SELECT 1 FROM meter_loads") is None
+
+
+def test_rejects_results_over_a_quarter_of_the_budget(cache):
+    cache.put_result("SELECT * FROM meter_loads", None, result(300))
+    assert cache.stats()["rejected_too_large"] == 1
+    assert cache.stats()["entries"] == 0
+
+
+def test_invalidates_only_entries_reading_the_table(cache):
+    cache.put_result("SELECT * FROM meter_loads", None, result(1))
+    cache.put_result("SELECT * FROM meter_users", None, result(1))
+    cache.put_result("SELECT 1", None, result(1))  # unknown tables are always invalidated
+
+    assert cache.invalidate_for_write("UPDATE meter_loads SET forecasted_load = 0") == 2
+    assert cache.get_result("SELECT * FROM meter_users") is not None
+    assert cache.invalidate() == 1
+    assert cache.stats()["bytes"] == 0
+
+
+def test_entries_expire_after_the_ttl(cache):
+    cache.put_result("SELECT * FROM meter_loads", None, result(1))
+    cache.ttl_seconds = -1
+    assert cache.get_result("SELECT * FROM meter_loads") is None
+    assert cache.stats()["entries"] == 0
+
+
+def test_writes_through_db_manager_invalidate_cached_reads(seeded_db, monkeypatch):
+    cache = ResultCache(enabled=True)
+    monkeypatch.setattr(db_manager, "result_cache", cache)
+    sql = "SELECT COUNT(*) AS n FROM meter_users"
+
+    assert db_manager.run_select_query(sql)["n"].tolist() == [4]
+    db_manager.execute_query("INSERT INTO meter_users VALUES (?, ?)", ("user2000", 2000))
+
+    assert db_manager.run_select_query(sql)["n"].tolist() == [5]
+    assert cache.stats()["invalidations"] == 1
+
+
+def test_admin_endpoints_require_admin_credentials(cache, monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.routers import admin
+
+    monkeypatch.setattr(admin, "result_cache", cache)
+    cache.put_result("SELECT * FROM meter_loads", None, result(3))
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+
+    assert client.get("/api/admin/result-cache").status_code == 401
+    assert client.delete("/api/admin/result-cache", auth=(settings.EMP_USER, settings.EMP_PASS)).status_code == 401
+    assert cache.stats()["entries"] == 1
+
+    response = client.delete("/api/admin/result-cache", auth=(settings.ADMIN_USER, settings.ADMIN_PASS))
+    assert response.status_code == 200
+    assert response.json()["removed"] == 1
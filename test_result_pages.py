@@ -0,0 +1,108 @@
+import json
+
+import pandas as pd
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.routers import chat as chat_router
+from modules import db_manager, llm_router, query_planner
+from modules.compatibility_layer import LegacyResponseFormatter
+from modules.result_pages import ContinuationRegistry, continuation_registry, paged_sql
+from modules.single_flight import single_flight
+
+SQL = "SELECT meter_id, date_time, forecasted_load FROM meter_loads ORDER BY meter_id, date_time"
+
+
+@pytest.fixture
+def client():
+    app = FastAPI()
+    app.include_router(chat_router.router)
+    return TestClient(app)
+
+
+def test_paged_sql_wraps_the_query():
+    assert paged_sql("SELECT *  FROM meter_loads;", 10, 20) == \
+        "SELECT * FROM (SELECT * FROM meter_loads) AS _page LIMIT 10 OFFSET 20"
+
+
+def test_tokens_expire_and_are_capped():
+    registry = ContinuationRegistry(ttl_seconds=60, max_entries=2)
+    first, second, third = (registry.register(f"SELECT {i}") for i in range(3))
+    assert registry.get(first) is None
+    assert registry.get(third).sql == "SELECT 2"
+
+    registry.ttl_seconds = -1
+    assert registry.get(second) is None
+    assert registry.stats()["tokens"] == 1
+
+
+def test_result_pages_follow_next_page_links(seeded_db, client):
+    token = continuation_registry.register(SQL)
+    rows, url = [], f"/api/chat/results/{token}?offset=0&limit=800"
+    while url:
+        body = client.get(url).json()
+        rows.extend(body["data"]["rows"])
+        url = body["next_page"]
+    assert len(rows) == 2000
+    assert rows[0]["meter_id"] == 1001 and rows[-1]["meter_id"] == 1004
+
+    columnar = client.get(f"/api/chat/results/{token}?offset=1990&response_format=columnar").json()
+    assert columnar["data"]["row_count"] == 10
+    assert columnar["has_more"] is False
+
+
+def test_export_streams_every_row_as_ndjson(seeded_db, client):
+    token = continuation_registry.register(SQL)
+    response = client.get(f"/api/chat/results/{token}/export")
+    lines = response.text.splitlines()
+    assert response.headers["content-type"] == "application/x-ndjson"
+    assert len(lines) == 2000
+    assert set(json.loads(lines[0])) == {"meter_id", "date_time", "forecasted_load"}
+
+
+def test_export_respects_the_row_cap(seeded_db, client, monkeypatch):
+    monkeypatch.setattr(chat_router, "MAX_EXPORT_ROWS", 25)
+    token = continuation_registry.register(SQL)
+    assert len(client.get(f"/api/chat/results/{token}/export").text.splitlines()) == 25
+
+
+def test_unknown_tokens_are_404(client):
+    assert client.get("/api/chat/results/missing").status_code == 404
+    assert client.get("/api/chat/results/missing/export").status_code == 404
+
+
+def test_legacy_chat_passes_pagination_in_extras(client, monkeypatch):
+    df = pd.DataFrame({"meter_id": [1001, 1002], "forecasted_load": [1.0, 2.0]})
+
+    async def classify(*args, **kwargs):
+        return "SQL_QUERY"
+
+    async def generate(*args, **kwargs):
+        return SQL, SQL
+
+    async def run_select(*args, **kwargs):
+        return df, True
+
+    async def analyze(*args, **kwargs):
+        return {"summary": "Two meters.", "visualization_type": "table"}
+
+    monkeypatch.setattr(query_planner, "PLANNER_ENABLED", False)
+    monkeypatch.setattr(single_flight, "enabled", False)
+    monkeypatch.setattr(llm_router, "classify_intent_async", classify)
+    monkeypatch.setattr(llm_router, "generate_sql_async", generate)
+    monkeypatch.setattr(llm_router, "analyze_data_async", analyze)
+    monkeypatch.setattr(db_manager, "run_select_limited_async", run_select)
+
+    content = json.loads(client.post("/chat", json={"conversation_id": "c1", "message": "all loads"}).json()["content"])
+
+    pagination = content["extras"]["pagination"]
+    assert len(content["data"]) == 2
+    assert pagination["returned_rows"] == 2 and pagination["has_more"] is True
+    assert continuation_registry.get(pagination["continuation_token"]).sql == SQL
+
+
+def test_legacy_extras_only_carry_pagination_with_data():
+    pagination = {"continuation_token": "t", "has_more": True}
+    empty = LegacyResponseFormatter.convert_to_legacy_format("no rows", "SQL_QUERY", data=[], pagination=pagination)
+    assert "pagination" not in json.loads(empty["content"])["extras"]
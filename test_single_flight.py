@@ -0,0 +1,111 @@
+import asyncio
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import pytest
+
+from modules.cancellation import CancellationToken, OperationCancelled
+from modules.single_flight import SingleFlight, request_key
+
+KEY = request_key("Total load today?", "admin", None)
+
+
+def test_request_key_normalizes_the_question():
+    assert request_key("total  LOAD today", "admin", None) == KEY
+    assert request_key("total load today", "viewer", None) != KEY
+
+
+def slow(calls, seconds=0.2, result="done"):
+    def fn(token):
+        calls.append(token)
+        time.sleep(seconds)
+        return result
+    return fn
+
+
+def test_identical_concurrent_calls_share_one_execution():
+    group, calls = SingleFlight(enabled=True), []
+    with ThreadPoolExecutor(5) as pool:
+        results = list(pool.map(lambda _: group.do(KEY, slow(calls)), range(5)))
+    assert results == ["done"] * 5
+    assert len(calls) == 1
+    assert group.stats() == {"enabled": True, "in_flight": 0, "executions": 1, "coalesced": 4, "abandoned": 0}
+
+
+def test_errors_reach_every_participant():
+    group = SingleFlight(enabled=True)
+
+    def failing(token):
+        time.sleep(0.1)
+        raise RuntimeError("ollama down")
+
+    with ThreadPoolExecutor(3) as pool:
+        futures = [pool.submit(group.do, KEY, failing) for _ in range(3)]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="ollama down"):
+            future.result()
+
+
+def test_cancelled_starter_leaves_while_others_keep_the_result():
+    group, calls = SingleFlight(enabled=True), []
+    starter_token = CancellationToken()
+    threading.Timer(0.1, starter_token.cancel).start()
+
+    with ThreadPoolExecutor(2) as pool:
+        starter = pool.submit(group.do, KEY, slow(calls, seconds=0.5), starter_token)
+        time.sleep(0.05)
+        follower = pool.submit(group.do, KEY, slow(calls))
+        start = time.perf_counter()
+        with pytest.raises(OperationCancelled):
+            starter.result()
+        assert time.perf_counter() - start < 0.3
+        assert follower.result() == "done"
+
+    assert len(calls) == 1
+    assert not calls[0].is_set()
+
+
+def test_execution_is_cancelled_once_everyone_left():
+    group, calls = SingleFlight(enabled=True), []
+    token = CancellationToken()
+    threading.Timer(0.1, token.cancel).start()
+
+    with pytest.raises(OperationCancelled):
+        group.do(KEY, slow(calls, seconds=0.3), token)
+    assert calls[0].is_set()
+    assert group.stats()["abandoned"] == 1
+
+    # An abandoned execution still winding down is not joined
+    assert group.do(KEY, slow(calls, seconds=0, result="fresh")) == "fresh"
+    assert len(calls) == 2
+
+
+def test_async_participants_share_a_task_and_can_leave():
+    group, calls = SingleFlight(enabled=True), []
+
+    async def fn(token):
+        calls.append(token)
+        await asyncio.sleep(0.2)
+        return "done"
+
+    async def run():
+        leaving = CancellationToken()
+        asyncio.get_running_loop().call_later(0.05, leaving.cancel)
+        return await asyncio.gather(
+            group.do_async(KEY, fn), group.do_async(KEY, fn, leaving), group.do_async(KEY, fn),
+            return_exceptions=True,
+        )
+
+    first, left, third = asyncio.run(run())
+    assert (first, third) == ("done", "done")
+    assert isinstance(left, OperationCancelled)
+    assert len(calls) == 1 and not calls[0].is_set()
+
+
+def test_disabled_group_runs_every_call():
+    group, calls = SingleFlight(enabled=False), []
+    token = CancellationToken()
+    group.do(KEY, slow(calls, seconds=0), token)
+    group.do(KEY, slow(calls, seconds=0), token)
+    assert calls == [token, token]
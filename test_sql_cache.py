@@ -0,0 +1,121 @@
+from datetime import datetime
+
+import pytest
+
+from modules.sql_cache import SQLGenerationCache, literal_tokens, normalize_query, validity_scope
+
+V = "v1"
+
+
+@pytest.fixture
+def cache():
+    return SQLGenerationCache(max_entries=8, ttl_seconds=60, similarity_threshold=0.85, enabled=True)
+
+
+def test_exact_hit_ignores_case_and_punctuation(cache):
+    cache.put("Total load by meter?", V, "SELECT 1", "raw")
+    assert cache.get("total LOAD by meter", V) == ("SELECT 1", "raw")
+    assert cache.stats()["hits"] == 1
+
+
+def test_prompt_version_is_part_of_the_key(cache):
+    cache.put("total load by meter", V, "SELECT 1", "raw")
+    assert cache.get("total load by meter", "v2") is None
+
+
+def test_near_duplicate_reuses_the_translation(cache):
+    cache.put("show total load per meter", V, "SELECT 1", "raw")
+    assert cache.get("give me the total load per meter please", V) == ("SELECT 1", "raw")
+    assert cache.stats()["near_hits"] == 1
+
+
+def test_numbers_and_aggregations_must_match(cache):
+    cache.put("total load for meter 1001", V, "SELECT 1", "raw")
+    cache.put("peak load per meter", V, "SELECT 2", "raw")
+    assert cache.get("show total load for meter 1002", V) is None
+    assert cache.get("show average load per meter", V) is None
+
+
+def test_literal_filter_values_must_match(cache):
+    cache.put("show the total consumption recorded across all meters for user alice", V, "SELECT 1", "raw")
+    assert cache.get("show me the total consumption recorded across all meters for user bob", V) is None
+    assert cache.get("show me the total consumption recorded across all meters for user alice", V) == ("SELECT 1", "raw")
+
+
+def test_literal_tokens():
+    assert literal_tokens("load where role = 'Field Ops'") >= {"field ops"}
+    assert literal_tokens("readings for Alice from meter_x") == {"alice", "meter_x"}
+    assert literal_tokens("what's the user's load today") == frozenset()
+
+
+def test_lru_eviction(cache):
+    cache.max_entries = 2
+    for i, query in enumerate(["hourly load", "daily load", "weekly load"]):
+        cache.put(query, V, f"SELECT {i}", "raw")
+    assert cache.get("hourly load", V) is None
+    assert cache.get("weekly load", V) == ("SELECT 2", "raw")
+    assert cache.stats()["evictions"] == 1
+
+
+def test_expired_entries_are_dropped(cache):
+    cache.put("load by meter", V, "SELECT 1", "raw")
+    cache.ttl_seconds = -1
+    assert cache.get("load by meter", V) is None
+    assert cache.stats()["expirations"] == 1
+
+
+def test_relative_dates_are_scoped_to_the_day_or_hour():
+    now = datetime(2025, 3, 4, 15, 30)
+    assert validity_scope(normalize_query("load right now"), now) == "2025-03-04 15"
+    assert validity_scope(normalize_query("load today"), now) == "2025-03-04"
+    assert validity_scope(normalize_query("load in 2024"), now) == "static"
+
+
+def test_disabled_cache_stores_nothing():
+    cache = SQLGenerationCache(enabled=False)
+    cache.put("load", V, "SELECT 1", "raw")
+    assert cache.get("load", V) is None
+    assert cache.stats()["size"] == 0
+
+
+@pytest.mark.parametrize("cached, asked", [
+    ("above", "below"),
+    ("greater than", "less than"),
+    ("in ascending order", "in descending order"),
+    ("before 2025", "after 2025"),
+])
+def test_comparison_words_must_match(cache, cached, asked):
+    template = ("show meters in the north zone with consumption {} the average per premise "
+                "grouped by feeder substation region excluding vacant premises")
+    cache.put(template.format(cached), V, "SELECT 1", "raw")
+    assert cache.get(template.format(asked), V) is None
+    # The same comparison still near-hits
+    assert cache.get("please " + template.format(cached), V) == ("SELECT 1", "raw")
+
+
+def test_comparison_symbols_are_not_stripped(cache):
+    cache.put("meters with load > 5", V, "SELECT 1", "raw")
+    assert cache.get("meters with load < 5", V) is None
+    assert cache.get("meters with load >= 5", V) is None
+    assert cache.get("meters with load>5", V) == ("SELECT 1", "raw")
+
+
+def test_admin_endpoints_require_admin_credentials(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.core.config import settings
+    from app.routers import admin
+
+    monkeypatch.setattr(admin, "sql_cache", SQLGenerationCache(max_entries=8, ttl_seconds=60, enabled=True))
+    admin.sql_cache.put("revenue of alice", V, "SELECT 1", "raw")
+    app = FastAPI()
+    app.include_router(admin.router)
+    client = TestClient(app)
+
+    assert client.get("/api/admin/sql-cache").status_code == 401
+    assert client.delete("/api/admin/sql-cache", auth=(settings.EMP_USER, settings.EMP_PASS)).status_code == 401
+    assert client.get("/api/admin/sql-cache", auth=(settings.ADMIN_USER, "wrong")).status_code == 401
+
+    response = client.get("/api/admin/sql-cache", auth=(settings.ADMIN_USER, settings.ADMIN_PASS))
+    assert response.status_code == 200
+    assert len(response.json()["entries"]) == 1
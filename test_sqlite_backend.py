@@ -0,0 +1,81 @@
+import threading
+
+import pytest
+
+from modules.db import close_database, config, create_database, get_database
+from modules.db.sqlite_db import SQLiteDatabase
+
+
+@pytest.fixture
+def db(tmp_path):
+    database = SQLiteDatabase(str(tmp_path / "nested" / "test.db"))
+    database.initialize_schema()
+    try:
+        yield database
+    finally:
+        database.close()
+
+
+def test_reuses_one_connection_per_thread(db):
+    assert db.get_connection() is db.get_connection()
+    other = []
+    thread = threading.Thread(target=lambda: other.append(db.get_connection()))
+    thread.start()
+    thread.join()
+    assert other[0] is not db.get_connection()
+    assert db.pool_stats()["connections"] == 2
+
+
+def test_connections_use_wal(db):
+    assert db.get_connection().execute("PRAGMA journal_mode").fetchone()[0] == "wal"
+
+
+def test_writes_and_reads(db):
+    assert db.execute_query("INSERT INTO meter_users VALUES (?, ?)", ("alice", 1001)) == 1
+    df = db.run_select_query("SELECT username, meter_id FROM meter_users")
+    assert df.to_dict("records") == [{"username": "alice", "meter_id": 1001}]
+    assert len(db.run_select_columnar("SELECT * FROM meter_users WHERE meter_id = ?", (1001,))) == 1
+
+
+def test_errors_are_reported_and_rolled_back(db):
+    with pytest.raises(Exception, match="SQLite execute failed"):
+        db.execute_query("INSERT INTO missing_table VALUES (1)")
+    with pytest.raises(Exception, match="SQLite query failed"):
+        db.run_select_columnar("SELECT * FROM missing_table")
+
+
+def test_stream_select_yields_batches_with_columns(db):
+    for i in range(5):
+        db.execute_query("INSERT INTO meter_users VALUES (?, ?)", (f"user{i}", i))
+    batches = list(db.stream_select("SELECT meter_id FROM meter_users ORDER BY meter_id", fetch_size=2))
+    assert [columns for columns, _ in batches] == [["meter_id"]] * 3
+    assert [row[0] for _, rows in batches for row in rows] == [0, 1, 2, 3, 4]
+    assert list(db.stream_select("SELECT meter_id FROM meter_users WHERE 0")) == [(["meter_id"], [])]
+
+
+
+def test_stream_select_reuses_the_thread_connection_unless_dedicated(db, monkeypatch):
+    db.get_connection()
+    opened = []
+    connect = db._connect
+    monkeypatch.setattr(db, "_connect", lambda: opened.append(1) or connect())
+
+    assert list(db.stream_select("SELECT 1 AS one")) == [(["one"], [(1,)])]
+    assert opened == []
+    assert db.run_select_columnar("SELECT 2 AS two").columns == ["two"]
+
+    assert list(db.stream_select("SELECT 1 AS one", dedicated=True)) == [(["one"], [(1,)])]
+    assert opened == [1]
+    assert db.pool_stats()["connections"] == 1
+
+def test_factory_builds_the_configured_backend(tmp_path, monkeypatch):
+    monkeypatch.setattr(config, "SQLITE_DB_PATH", str(tmp_path / "factory.db"))
+    close_database()
+    try:
+        assert isinstance(create_database("sqlite"), SQLiteDatabase)
+        assert get_database() is get_database()
+        assert get_database().dialect == "sqlite"
+        with pytest.raises(ValueError):
+            create_database("oracle")
+    finally:
+        close_database()
@@ -0,0 +1,149 @@
+import asyncio
+from types import SimpleNamespace
+
+import numpy as np
+import pandas as pd
+import pytest
+
+from app.core.config import settings
+from app.services import transcription
+from app.services.transcription import SAMPLING_RATE, StreamingTranscriber, _WhisperState
+
+
+class SecondsModel:
+    """Model double: one segment per full second of audio, numbered by the second's absolute position."""
+
+    def __init__(self, stream):
+        self.stream = stream
+        self.beam_sizes = []
+
+    def transcribe(self, audio, beam_size, vad_filter):
+        self.beam_sizes.append(beam_size)
+        offset = int(self.stream._window_start)
+        segments = [SimpleNamespace(start=float(i), end=float(i + 1), text=f" w{offset + i} ")
+                    for i in range(len(audio) // SAMPLING_RATE)]
+        return iter(segments), None
+
+
+@pytest.fixture
+def whisper(monkeypatch):
+    state = _WhisperState()
+    monkeypatch.setattr(transcription, "_whisper", state)
+    monkeypatch.setattr(settings, "WHISPER_STREAM_STEP_SECONDS", 1.0)
+    monkeypatch.setattr(settings, "WHISPER_STREAM_WINDOW_SECONDS", 3.0)
+    try:
+        yield state
+    finally:
+        state.shutdown()
+
+
+def pcm16(seconds, rate=SAMPLING_RATE):
+    return (np.full(int(seconds * rate), 16384, dtype="<i2")).tobytes()
+
+
+def test_feed_converts_and_buffers_partial_samples():
+    stream = StreamingTranscriber()
+    data = pcm16(0.5)
+    assert stream.feed(data[:-1]) is False
+    assert stream.feed(data[-1:] + pcm16(0.5)) is True
+    assert stream.duration == 1.0
+    np.testing.assert_allclose(stream._window[:3], 0.5)
+
+
+def test_feed_resamples_to_16_khz():
+    stream = StreamingTranscriber(sample_rate=8000)
+    stream.feed(pcm16(1, rate=8000))
+    assert len(stream._window) == SAMPLING_RATE
+
+
+def test_float_encoding_and_unknown_encodings():
+    stream = StreamingTranscriber(encoding="pcm_f32le")
+    stream.feed(np.full(SAMPLING_RATE, 0.25, dtype="<f4").tobytes())
+    np.testing.assert_allclose(stream._window, 0.25)
+    with pytest.raises(ValueError):
+        StreamingTranscriber(encoding="mp3")
+
+
+def test_partials_commit_stable_segments_and_slide_the_window(whisper):
+    stream = StreamingTranscriber()
+    model = whisper.model = SecondsModel(stream)
+
+    async def run():
+        events = []
+        for _ in range(5):
+            if stream.feed(pcm16(1)):
+                events.append(await stream.partial())
+        return events, await stream.finish()
+
+    events, final = asyncio.run(run())
+
+    assert [e["text"] for e in events] == ["w0", "w0 w1", "w0 w1 w2", "w0 w1 w2 w3", "w0 w1 w2 w3 w4"]
+    # The window passed 3 s at the fourth partial: w0-w2 became final
+    assert [s["text"] for s in events[3]["committed"]] == ["w0", "w1", "w2"]
+    assert final["text"] == "w0 w1 w2 w3 w4"
+    assert final["duration"] == 5.0
+    assert [s["start"] for s in final["segments"]] == [0.0, 1.0, 2.0, 3.0, 4.0]
+    # Greedy partial passes, full beam for the final one
+    assert model.beam_sizes == [1] * 5 + [settings.WHISPER_BEAM_SIZE]
+
+
+class FinalOnly:
+    """Stands in for StreamingTranscriber: every stream transcribes to the same text."""
+
+    duration = 0.0
+
+    def __init__(self, sample_rate, encoding):
+        pass
+
+    def feed(self, data):
+        return False
+
+    async def finish(self):
+        return {"type": "final", "text": "revenue tomorrow"}
+
+
+@pytest.fixture
+def stream_client(monkeypatch):
+    from fastapi import FastAPI
+    from fastapi.testclient import TestClient
+    from app.routers import audio
+
+    monkeypatch.setattr(audio.TranscriptionService, "is_available", staticmethod(lambda: True))
+    monkeypatch.setattr(audio, "StreamingTranscriber", FinalOnly)
+    app = FastAPI()
+    app.include_router(audio.router)
+    return TestClient(app)
+
+
+def test_streamed_chat_uses_the_handshake_role_and_can_be_stopped(stream_client, monkeypatch):
+    from app.routers import audio
+    from modules.cancellation import cancellation_registry
+
+    calls = []
+
+    async def fake_chat(text, model_type, user_role, cancel_event=None, **kwargs):
+        # What POST /stop does for this conversation while the turn runs
+        stopped = cancellation_registry.cancel("voice-1")
+        calls.append((text, user_role, stopped, cancel_event.is_set()))
+        return {"type": "cancelled", "content": "Cancelled", "intent": ""}, pd.DataFrame()
+
+    monkeypatch.setattr(audio.ChatService, "process_chat_async", fake_chat)
+    url = "/api/transcribe/stream?chat=true&model_type=local&user_role=employee&conversation_id=voice-1"
+    with stream_client.websocket_connect(url) as ws:
+        ws.send_bytes(b"\0\0")
+        ws.send_text('{"type": "stop"}')
+        assert ws.receive_json()["text"] == "revenue tomorrow"
+        assert ws.receive_json()["type"] == "chat"
+
+    assert calls == [("revenue tomorrow", "employee", True, True)]
+    assert cancellation_registry.stats()["active"] == 0
+
+
+def test_streamed_chat_requires_a_role(stream_client):
+    from starlette.websockets import WebSocketDisconnect
+
+    with stream_client.websocket_connect("/api/transcribe/stream?chat=true") as ws:
+        assert "user_role" in ws.receive_json()["detail"]
+        with pytest.raises(WebSocketDisconnect) as closed:
+            ws.receive_json()
+    assert closed.value.code == 1008
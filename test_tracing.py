@@ -0,0 +1,93 @@
+import asyncio
+
+import pytest
+
+from modules import tracing
+from modules.cancellation import OperationCancelled
+from modules.tracing import Counter, Histogram, record_llm_call, render_prometheus, server_timing, stage, traced
+
+
+def stage_count(name):
+    return tracing.STAGE_SECONDS.snapshot().get((name,), {}).get("count", 0)
+
+
+def test_histogram_buckets_are_cumulative():
+    h = Histogram("t_seconds", "Test.", ["stage"], buckets=(0.1, 1.0))
+    h.observe(0.05, "a")
+    h.observe(0.5, "a")
+    lines = h.render()
+    assert 't_seconds_bucket{stage="a",le="0.1"} 1' in lines
+    assert 't_seconds_bucket{stage="a",le="1"} 2' in lines
+    assert 't_seconds_bucket{stage="a",le="+Inf"} 2' in lines
+    assert 't_seconds_count{stage="a"} 2' in lines
+
+
+def test_counter_escapes_label_values():
+    c = Counter("t_total", "Test.", ["route"])
+    c.inc('/a"b', amount=2)
+    assert c.render()[-1] == 't_total{route="/a\\"b"} 2'
+
+
+def test_stage_errors_and_cancellations_are_counted_apart():
+    with pytest.raises(ValueError):
+        with stage("t_error"):
+            raise ValueError("bad sql")
+    with pytest.raises(OperationCancelled):
+        with stage("t_stop"):
+            raise OperationCancelled("stop")
+
+    async def disconnected():
+        with stage("t_disconnect"):
+            raise asyncio.CancelledError()
+
+    with pytest.raises(asyncio.CancelledError):
+        asyncio.run(disconnected())
+
+    assert tracing.STAGE_ERRORS._values[("t_error",)] == 1.0
+    assert ("t_stop",) not in tracing.STAGE_ERRORS._values
+    assert tracing.STAGE_CANCELLED._values[("t_stop",)] == 1.0
+    assert tracing.STAGE_CANCELLED._values[("t_disconnect",)] == 1.0
+    assert stage_count("t_error") == stage_count("t_stop") == 1
+
+
+def test_traced_generators_are_timed_once_and_count_cancellation():
+    @traced("t_gen")
+    def tokens(cancel_at=None):
+        for i in range(3):
+            if i == cancel_at:
+                raise OperationCancelled("stop")
+            yield i
+
+    assert list(tokens()) == [0, 1, 2]
+    with pytest.raises(OperationCancelled):
+        list(tokens(cancel_at=1))
+    assert stage_count("t_gen") == 2
+    assert tracing.STAGE_CANCELLED._values[("t_gen",)] == 1.0
+    assert ("t_gen",) not in tracing.STAGE_ERRORS._values
+
+
+def test_llm_calls_are_labelled_with_the_stage_and_traced():
+    token = tracing.start_trace()
+    try:
+        with stage("t_llm"):
+            record_llm_call(0.2, {"prompt_eval_count": 10, "eval_count": 4, "eval_duration": 5e8})
+        trace = tracing.current_trace()
+    finally:
+        tracing.end_trace(token)
+
+    assert [name for name, _, _ in trace] == ["llm_t_llm", "t_llm"]
+    assert trace[0][2] == "10 prompt + 4 eval tokens"
+    assert tracing.LLM_TOKENS._values[("t_llm", "eval")] == 4
+    assert tracing.LLM_EVAL_SECONDS.snapshot()[("t_llm",)]["sum"] == 0.5
+
+
+def test_server_timing_header():
+    assert server_timing([("sql", 0.0123, ""), ("llm_sql", 0.5, 'a "b"')]) == \
+        '0-sql;dur=12.3, 1-llm_sql;dur=500.0;desc="a \\"b\\""'
+
+
+def test_prometheus_exposition_lists_every_metric():
+    text = render_prometheus()
+    for metric in tracing.REGISTRY:
+        assert f"# TYPE {metric.name} " in text
+    assert text.endswith("\n")
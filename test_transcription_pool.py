@@ -0,0 +1,67 @@
+import asyncio
+import threading
+
+import pytest
+from fastapi import FastAPI
+from fastapi.testclient import TestClient
+
+from app.core.config import settings
+from app.routers import audio
+from app.services import transcription
+from app.services.transcription import TranscriptionQueueFull, _WhisperState
+
+
+@pytest.fixture
+def state(monkeypatch):
+    monkeypatch.setattr(settings, "WHISPER_WORKERS", 1)
+    monkeypatch.setattr(settings, "WHISPER_QUEUE_SIZE", 1)
+    whisper = _WhisperState()
+    try:
+        yield whisper
+    finally:
+        whisper.shutdown()
+
+
+def test_model_is_not_loaded_up_front(state):
+    assert state.model is None
+    assert state.stats()["status"] in ("not_loaded", "unavailable")
+
+
+def test_submit_runs_on_the_worker_pool(state):
+    result = asyncio.run(state.submit(threading.current_thread))
+    assert result.name.startswith("stt-worker")
+    stats = state.stats()
+    assert (stats["completed"], stats["active"], stats["queue_depth"]) == (1, 0, 0)
+
+
+def test_rejects_requests_past_workers_plus_queue(state):
+    release = threading.Event()
+
+    async def run():
+        first = asyncio.ensure_future(state.submit(release.wait))
+        second = asyncio.ensure_future(state.submit(release.wait))
+        await asyncio.sleep(0.05)
+        with pytest.raises(TranscriptionQueueFull):
+            await state.submit(release.wait)
+        release.set()
+        return await asyncio.gather(first, second)
+
+    assert asyncio.run(run()) == [True, True]
+    assert state.stats()["rejected"] == 1
+    assert state.stats()["completed"] == 2
+
+
+def test_failures_free_their_slot(state):
+    with pytest.raises(ZeroDivisionError):
+        asyncio.run(state.submit(lambda: 1 / 0))
+    stats = state.stats()
+    assert stats["failed"] == 1
+    assert stats["queue_depth"] == 0
+
+
+@pytest.mark.skipif(transcription.WHISPER_INSTALLED, reason="faster_whisper is installed")
+def test_upload_endpoint_reports_unavailable_without_faster_whisper():
+    app = FastAPI()
+    app.include_router(audio.router)
+    response = TestClient(app).post("/api/transcribe", files={"file": ("a.wav", b"RIFF", "audio/wav")})
+    assert response.status_code == 503
@@ -0,0 +1,60 @@
+import io
+
+import pytest
+
+from app.core.config import settings
+from app.services.transcription import STAGES, AudioTooLarge, _buffer_upload, _WhisperState
+
+
+class Pipe(io.RawIOBase):
+    """A non-seekable upload body."""
+
+    def __init__(self, data):
+        self._data = io.BytesIO(data)
+
+    def readable(self):
+        return True
+
+    def readinto(self, buffer):
+        return self._data.readinto(buffer)
+
+
+def test_seekable_uploads_are_used_in_place():
+    upload = io.BytesIO(b"x" * 100)
+    upload.seek(50)
+    assert _buffer_upload(upload, max_bytes=100) is upload
+    assert upload.tell() == 0
+
+
+def test_seekable_uploads_over_the_limit_are_rejected():
+    with pytest.raises(AudioTooLarge):
+        _buffer_upload(io.BytesIO(b"x" * 101), max_bytes=100)
+
+
+def test_streams_are_spooled_in_memory(monkeypatch):
+    monkeypatch.setattr(settings, "WHISPER_SPOOL_MAX_BYTES", 1024)
+    buffer = _buffer_upload(Pipe(b"abc" * 100), max_bytes=1000)
+    try:
+        assert buffer.read() == b"abc" * 100
+        assert not buffer._rolled  # still in memory, no temp file
+    finally:
+        buffer.close()
+
+
+def test_streams_over_the_limit_are_rejected():
+    with pytest.raises(AudioTooLarge):
+        _buffer_upload(Pipe(b"x" * 200_000), max_bytes=100_000)
+
+
+def test_stage_timings_feed_the_real_time_factor():
+    state = _WhisperState()
+    try:
+        state.record_stages({"decode_audio": 0.1, "vad": 0.2, "beam_search": 0.7}, audio_seconds=4.0)
+        state._counters["completed"] = 1
+        stats = state.stats()
+    finally:
+        state.shutdown()
+    assert set(stats["avg_stage_seconds"]) == set(STAGES)
+    assert stats["avg_stage_seconds"]["beam_search"] == 0.7
+    assert stats["audio_seconds"] == 4.0
+    assert stats["real_time_factor"] == 0.25